@@ -1,48 +1,279 @@
-from fastapi import FastAPI, HTTPException, Depends
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Depends, Query, Request
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
 from sqlalchemy.orm import Session
-from database import get_db, Base, engine
-from services.weather_service import get_weather_from_wttr, save_weather_data, get_history_stats
+from database import get_db, init_db
+from services.weather_service import (
+    get_weather_from_wttr, get_rich_weather_data, save_weather_data, get_history_stats, extract_record_fields,
+    circuit_breakers, get_weather_for_coords, nearest_location, cache_expires_in, cache_key,
+)
+from services.query_profiles import PROFILES
+from services.cache_warmer import local_warmer
+from services.forecast_table import to_builtins
+from services import fast_json, gazetteer, history_query, http_cache, metrics
+from config import (
+    HISTORY_PAGE_SIZE, HISTORY_MAX_PAGE_SIZE, HTTP_HISTORY_MAX_AGE, GZIP_MIN_SIZE, WEATHER_CACHE_TTL, STREAM_MAX_CITIES,
+    WARMER_MAX_REGISTER, TRAIN_MAX_EPOCHS, TRAIN_MAX_CITIES,
+)
 from ml.train import predict_next_day
+from ml.jobs import training_queue
+from services.write_behind import write_queue
+from services.subscriptions import subscription_hub, event_stream
+from pydantic import BaseModel, Field
+from starlette.background import BackgroundTask
 from typing import List, Optional
+from itertools import islice
 import pandas as pd
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+warmer = local_warmer()
 
-app = FastAPI(title="WeatherNow API", description="API for WeatherNow")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create tables on startup, not on import (tests import the app freely)
+    init_db()
+    # Background workers live for the lifetime of the server process
+    warmer.start()
+    subscription_hub.start()
+    yield
+    warmer.stop()
+    subscription_hub.stop()
+    training_queue.stop()
+    # Commit history still buffered in the write-behind queue
+    write_queue.stop()
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered by the fastest available encoder (orjson when installed)."""
+
+    def render(self, content) -> bytes:
+        return fast_json.dumps(content)
+
+app = FastAPI(
+    title="WeatherNow API", description="API for WeatherNow",
+    lifespan=lifespan, default_response_class=FastJSONResponse
+)
+
+try:
+    # Brotli for clients that accept it, gzip for the rest
+    from brotli_asgi import BrotliMiddleware as CompressionMiddleware
+except ImportError:
+    from starlette.middleware.gzip import GZipMiddleware as CompressionMiddleware
+app.add_middleware(CompressionMiddleware, minimum_size=GZIP_MIN_SIZE)
+
+def not_modified(request: Request, etag: str, cache_control: str) -> Optional[Response]:
+    """304 response when the client's If-None-Match already names `etag`."""
+    if not http_cache.etag_matches(request.headers.get("if-none-match"), etag):
+        return None
+    route = getattr(request.scope.get("route"), "path", request.url.path)
+    metrics.registry.inc(metrics.HTTP_NOT_MODIFIED, route=route)
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+def cached_json(request: Request, content, cache_control: str) -> Response:
+    """JSON response tagged with a hash of its body (304 when the client already has it)."""
+    body = fast_json.dumps(content)
+    etag = http_cache.etag(body)
+    return not_modified(request, etag, cache_control) or Response(
+        body, media_type="application/json", headers={"ETag": etag, "Cache-Control": cache_control}
+    )
+
+def weather_cache_control(city: str, profile: str, data) -> str:
+    """Fresh for as long as the upstream payload stays in `weather_cache`; never cache stale fallbacks."""
+    if data.get("stale"):
+        return http_cache.NO_CACHE
+    return http_cache.cache_control(cache_expires_in(city, profile), WEATHER_CACHE_TTL)
 
 @app.get("/")
 def read_root():
     return {"message": "Welcome to WeatherNow API"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def read_metrics():
+    """Prometheus text exposition of stage timings, cache and upstream counters."""
+    for host, state in circuit_breakers.states().items():
+        metrics.registry.set_gauge(metrics.BREAKER_OPEN, int(state != "closed"), host=host)
+    metrics.registry.set_gauge(metrics.WRITE_QUEUE_DEPTH, write_queue.depth())
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
 @app.get("/weather/{city}")
-def read_current_weather(city: str, db: Session = Depends(get_db)):
+def read_current_weather(city: str, request: Request):
     data = get_weather_from_wttr(city)
     if not data:
         raise HTTPException(status_code=404, detail="City not found or API error")
     
-    save_weather_data(db, city, data)
+    # Recorded by the write-behind writer; the response never waits on the database
+    save_weather_data(None, city, data, skip_unchanged=True, defer=True)
     
     try:
-        curr = data['current_condition'][0]
-        return {
+        fields = extract_record_fields(data)
+        return cached_json(request, {
             "city": city,
-            "temp_c": float(curr['temp_C']),
-            "temp_f": float(curr['temp_F']),
-            "condition": curr['weatherDesc'][0]['value'],
-            "humidity": float(curr['humidity']),
-            "wind_speed": float(curr['windspeedKmph'])
-        }
+            "temp_c": fields['temp_c'],
+            "temp_f": fields['temp_f'],
+            "condition": fields['condition_text'],
+            "humidity": fields['humidity'],
+            "wind_speed": fields['wind_speed_kmph']
+        }, weather_cache_control(city, "current", data))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/weather/{city}/{profile}")
+def read_weather_profile(city: str, profile: str, request: Request):
+    """
+    Unified payload for a query profile: "full" (current, daily, hourly,
+    minutely, AQI) as used by the dashboard, or "current", "48h", "7day".
+    """
+    if profile not in PROFILES:
+        raise HTTPException(status_code=404, detail=f"Unknown profile '{profile}' (expected one of: {', '.join(PROFILES)})")
+    data = get_rich_weather_data(city, profile)
+    if not data:
+        raise HTTPException(status_code=404, detail="City not found or API error")
+    return cached_json(request, to_builtins(data), weather_cache_control(city, profile, data))
+
+@app.get("/coords/weather")
+def read_weather_at(lat: float, lon: float, request: Request, profile: str = "full"):
+    """Unified payload for a position. Nearby requests share one cache entry and skip geocoding."""
+    if profile not in PROFILES:
+        raise HTTPException(status_code=404, detail=f"Unknown profile '{profile}' (expected one of: {', '.join(PROFILES)})")
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise HTTPException(status_code=422, detail="Coordinates out of range")
+    data = get_weather_for_coords(lat, lon, profile)
+    if not data:
+        raise HTTPException(status_code=404, detail="Weather unavailable for these coordinates")
+    return cached_json(request, to_builtins(data), weather_cache_control(data.get('city', ""), profile, data))
+
+@app.get("/coords/nearest")
+def read_nearest_location(lat: float, lon: float):
+    """Closest already geocoded location within GEO_SNAP_KM, so clients can skip reverse geocoding."""
+    location = nearest_location(lat, lon)
+    if location is None:
+        raise HTTPException(status_code=404, detail="No known location nearby")
+    return {"name": location['name'], "country": location.get('country'),
+            "latitude": location['latitude'], "longitude": location['longitude']}
+
+@app.get("/stream")
+async def stream_weather(cities: List[str] = Query(...)):
+    """
+    Server-sent events with live conditions for `cities` (repeated or
+    comma-separated). The first event per city carries every field, later
+    ones only the fields that changed. All clients share one poller.
+    """
+    names = [name.strip() for value in cities for name in value.split(",") if name.strip()]
+    if not names or len(names) > STREAM_MAX_CITIES:
+        raise HTTPException(status_code=422, detail=f"Subscribe to between 1 and {STREAM_MAX_CITIES} cities")
+    subscription = subscription_hub.subscribe(names, asyncio.get_running_loop())
+    if subscription is None:
+        raise HTTPException(status_code=503, detail="Too many live subscriptions, try again later")
+    return StreamingResponse(
+        event_stream(subscription_hub, subscription), media_type="text/event-stream",
+        # Unsubscribe even if the client leaves before the first event
+        background=BackgroundTask(subscription_hub.unsubscribe, subscription),
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/cities/search")
+def search_cities(q: str, request: Request, limit: int = 10):
+    """Autocomplete from the offline gazetteer: exact, prefix, then one-typo matches (no upstream call)."""
+    if not 1 <= limit <= 50:
+        raise HTTPException(status_code=422, detail="limit must be between 1 and 50")
+    # The gazetteer only changes when the server restarts with a new file
+    return cached_json(request, gazetteer.search_cities(q, limit), http_cache.cache_control(3600))
+
+@app.post("/warm")
+def add_warm_cities(cities: List[str]):
+    """Register cities (e.g. dashboard favorites) with the background cache warmer."""
+    names = [city.strip() for city in cities if city.strip()]
+    if not names or len(names) > WARMER_MAX_REGISTER:
+        raise HTTPException(status_code=422, detail=f"Register between 1 and {WARMER_MAX_REGISTER} cities")
+    if any(len(name) > 100 for name in names):
+        raise HTTPException(status_code=422, detail="City names are at most 100 characters")
+    warmer.add_favorites(names)
+    return {"cities": warmer.priority()}
+
 @app.get("/history/{city}")
-def read_history(city: str, days: int = 7, db: Session = Depends(get_db)):
-    records = get_history_stats(db, city, days)
-    return records
+def read_history(
+    city: str, request: Request, days: int = 7, fields: Optional[str] = None, resample: Optional[str] = None,
+    order: str = "desc", cursor: Optional[str] = None, limit: Optional[int] = None,
+    format: str = "json", db: Session = Depends(get_db),
+):
+    """
+    Weather history, newest first unless order=asc. `fields` picks columns
+    (comma-separated), `resample` (hourly, daily) averages each bucket.
+    JSON responses are pages of `limit` items: pass `next_cursor` back as
+    `cursor` for the next one. format=ndjson or csv streams every item after
+    `cursor` (or the first `limit`) straight from a database cursor.
+    """
+    cache_control = http_cache.cache_control(HTTP_HISTORY_MAX_AGE, HTTP_HISTORY_MAX_AGE)
+    if format not in ("json", "ndjson", "csv"):
+        raise HTTPException(status_code=422, detail=f"Unknown format '{format}' (expected json, ndjson or csv)")
+    if limit is not None and not 1 <= limit <= HISTORY_MAX_PAGE_SIZE:
+        raise HTTPException(status_code=422, detail=f"limit must be between 1 and {HISTORY_MAX_PAGE_SIZE}")
+    try:
+        selected = history_query.parse_fields(fields)
+        query = dict(days=days, fields=selected, resample=resample, order=order, cursor=cursor,
+                     since=history_query.window_start(days))
+        if format == "json":
+            page = history_query.history_page(db, city, limit or HISTORY_PAGE_SIZE, **query)
+            return cached_json(request, {"city": city, "items": page.items, "next_cursor": page.next_cursor},
+                               cache_control)
+        pairs = history_query.iter_history(db, city, **query)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    # Streams are tagged before their bytes exist: by the query (including the
+    # window's start, which moves with time) and the newest record it could include
+    from services.analytics_engine import latest_record_id
+    etag = http_cache.version_etag(cache_key(city), sorted(query.items()), limit, format,
+                                   latest_record_id(db, city))
+    cached = not_modified(request, etag, cache_control)
+    if cached is not None:
+        pairs.close()
+        return cached
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+
+    items = (item for item, _ in pairs)
+    if limit is not None:
+        items = islice(items, limit)
+    if format == "ndjson":
+        return StreamingResponse(history_query.ndjson_chunks(items), media_type="application/x-ndjson",
+                                 headers=headers)
+    header = history_query.columns(selected, resample)
+    headers["Content-Disposition"] = f'attachment; filename="{city}-history.csv"'
+    return StreamingResponse(history_query.csv_chunks(items, header), media_type="text/csv", headers=headers)
+
+@app.get("/charts/{city}", response_class=FileResponse)
+def read_chart(city: str, days: int = 30, db: Session = Depends(get_db)):
+    """Temperature trend chart (PNG), re-rendered only when the underlying history changes."""
+    from services.analytics_service import generate_temperature_trend
+    path = generate_temperature_trend(db, city, days)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"No history for {city} in the last {days} days")
+    return FileResponse(path, media_type="image/png")
+
+class TrainRequest(BaseModel):
+    cities: Optional[List[str]] = None  # default: every city with history
+    epochs: int = Field(100, ge=1, le=TRAIN_MAX_EPOCHS)
+    force: bool = False  # retrain even if the data is unchanged
+
+@app.post("/train", status_code=202)
+def queue_training(request: TrainRequest):
+    """Queue a retraining job; poll GET /train/{job_id} for its results."""
+    if request.cities is not None and not 1 <= len(request.cities) <= TRAIN_MAX_CITIES:
+        raise HTTPException(status_code=422, detail=f"Name between 1 and {TRAIN_MAX_CITIES} cities (or none for all)")
+    return training_queue.submit(request.cities, request.epochs, request.force)
+
+@app.get("/train")
+def list_training_jobs():
+    return training_queue.jobs()
+
+@app.get("/train/{job_id}")
+def read_training_job(job_id: str):
+    job = training_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown training job '{job_id}'")
+    return job
 
 @app.get("/predict/{city}")
-def predict_weather(city: str, db: Session = Depends(get_db)):
+def predict_weather(city: str, request: Request, db: Session = Depends(get_db)):
     # 1. Get recent history
     records = get_history_stats(db, city, days=5)
     if len(records) < 3:
@@ -55,6 +286,8 @@ def predict_weather(city: str, db: Session = Depends(get_db)):
     prediction = predict_next_day(city, temps)
     
     if prediction is None:
-         raise HTTPException(status_code=404, detail="Model not found. Please train model using CLI first.")
+         raise HTTPException(status_code=404, detail="Model not found. Train it with the CLI or POST /train first.")
          
-    return {"city": city, "predicted_temp_c": prediction}
+    # Inputs only change when a new observation is saved, at most once per forecast refresh
+    return cached_json(request, {"city": city, "predicted_temp_c": prediction},
+                       http_cache.cache_control(WEATHER_CACHE_TTL, WEATHER_CACHE_TTL))
@@ -0,0 +1,80 @@
+"""
+LSTM prediction latency: eager checkpoint vs exported TorchScript/int8 artifacts.
+
+    python benchmarks/bench_inference.py [--seconds 1.0] [--threads 1]
+
+Uses a freshly initialised model in a temporary directory, so no training
+data is needed. "reload" is the old per-call path (torch.load + eager model
+on every prediction); the other rows keep the model loaded (see
+ml/inference.py). Batches of 1 and 64 sequences.
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+import torch
+
+from ml.inference import _load_checkpoint, export_model, load_predictor
+from ml.model import WeatherLSTM
+from ml.train import SEQ_LENGTH, model_path
+
+CITY = "benchmark"
+BATCHES = (1, 64)
+
+def measure(fn, seconds: float) -> float:
+    """Mean seconds per call of `fn` over roughly `seconds` of wall time."""
+    fn()  # warm up (TorchScript profiles the first calls)
+    fn()
+    n, start = 0, time.perf_counter()
+    deadline = start + seconds
+    while True:
+        for _ in range(10):
+            fn()
+        n += 10
+        now = time.perf_counter()
+        if now >= deadline:
+            return (now - start) / n
+
+def main(argv):
+    seconds = float(argv[argv.index("--seconds") + 1]) if "--seconds" in argv else 1.0
+    if "--threads" in argv:
+        torch.set_num_threads(int(argv[argv.index("--threads") + 1]))
+
+    with tempfile.TemporaryDirectory() as model_dir:
+        torch.manual_seed(0)
+        torch.save({'model_state': WeatherLSTM().state_dict(), 'mean': 15.0, 'std': 5.0, 'data_hash': ""},
+                   model_path(CITY, model_dir))
+        eager = load_predictor(CITY, model_dir, backend="eager")
+        export_model(CITY, quantize=False, model_dir=model_dir)
+        script = load_predictor(CITY, model_dir)
+        export_model(CITY, quantize=True, model_dir=model_dir)
+        int8 = load_predictor(CITY, model_dir)
+
+        rnd = np.random.default_rng(0)
+        print(f"torch {torch.__version__}, {torch.get_num_threads()} thread(s)")
+        print(f"{'backend':<10}{'batch':>6}{'us/call':>12}{'us/seq':>10}{'vs reload':>11}{'max |diff| °C':>15}")
+        for batch in BATCHES:
+            sequences = rnd.normal(15, 5, size=(batch, SEQ_LENGTH)).tolist()
+            reference = eager.predict(sequences)
+            rows = {
+                "reload": lambda: _load_checkpoint(eager.path).predict(sequences),
+                "eager": lambda: eager.predict(sequences),
+                "script": lambda: script.predict(sequences),
+                "int8": lambda: int8.predict(sequences),
+            }
+            predictors = {"reload": eager, "eager": eager, "script": script, "int8": int8}
+            baseline = None
+            for name, fn in rows.items():
+                per_call = measure(fn, seconds)
+                baseline = baseline or per_call
+                diff = float(np.max(np.abs(predictors[name].predict(sequences) - reference)))
+                print(f"{name:<10}{batch:>6}{per_call * 1e6:>12.1f}{per_call * 1e6 / batch:>10.1f}"
+                      f"{baseline / per_call:>10.1f}x{diff:>15.3f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,88 @@
+"""
+JSON decode/encode throughput on recorded Open-Meteo payloads.
+
+    python benchmarks/bench_json.py [--seconds 1.0]
+
+Compares stdlib json, orjson and msgspec (untyped and schema-typed) on the
+fixtures in benchmarks/fixtures/ (see record_fixtures.py). Backends that
+are not installed are skipped.
+"""
+import glob
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services.openmeteo_schema import GeocodingResponse, ForecastResponse, AirQualityResponse
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+SCHEMAS = {"geocoding": GeocodingResponse, "forecast": ForecastResponse, "air_quality": AirQualityResponse}
+
+def load_fixtures():
+    fixtures = []
+    for path in sorted(glob.glob(os.path.join(FIXTURE_DIR, "*.json"))):
+        kind = os.path.basename(path).rsplit("_", 1)[0]
+        with open(path, "rb") as f:
+            fixtures.append((os.path.basename(path), SCHEMAS.get(kind), f.read()))
+    return fixtures
+
+def backends():
+    decoders = {"json": lambda raw, schema: json.loads(raw)}
+    encoders = {"json": lambda obj: json.dumps(obj, separators=(",", ":")).encode()}
+    try:
+        import orjson
+        decoders["orjson"] = lambda raw, schema: orjson.loads(raw)
+        encoders["orjson"] = orjson.dumps
+    except ImportError:
+        pass
+    try:
+        import msgspec
+        typed = {schema: msgspec.json.Decoder(schema) for schema in SCHEMAS.values()}
+        decoders["msgspec"] = lambda raw, schema: msgspec.json.decode(raw)
+        decoders["msgspec+schema"] = lambda raw, schema: typed[schema].decode(raw)
+        encoders["msgspec"] = msgspec.json.encode
+    except ImportError:
+        pass
+    return decoders, encoders
+
+def measure(fn, seconds: float) -> float:
+    """Calls per second of `fn` over roughly `seconds` of wall time."""
+    fn()  # warm up caches/decoders
+    n, start = 0, time.perf_counter()
+    deadline = start + seconds
+    while True:
+        for _ in range(10):
+            fn()
+        n += 10
+        now = time.perf_counter()
+        if now >= deadline:
+            return n / (now - start)
+
+def main(argv):
+    seconds = float(argv[argv.index("--seconds") + 1]) if "--seconds" in argv else 1.0
+    fixtures = load_fixtures()
+    if not fixtures:
+        print("No fixtures found. Run benchmarks/record_fixtures.py first.")
+        return 1
+
+    decoders, encoders = backends()
+    print(f"{'payload':<28}{'op':<8}{'backend':<16}{'ops/s':>12}{'MB/s':>10}{'vs json':>9}")
+    for name, schema, raw in fixtures:
+        obj = json.loads(raw)
+        for op, impls, call in (
+            ("decode", decoders, lambda impl: (lambda: impl(raw, schema))),
+            ("encode", encoders, lambda impl: (lambda: impl(obj))),
+        ):
+            baseline = None
+            for backend, impl in impls.items():
+                if backend == "msgspec+schema" and schema is None:
+                    continue
+                rate = measure(call(impl), seconds)
+                baseline = baseline or rate
+                print(f"{name:<28}{op:<8}{backend:<16}{rate:>12,.0f}{rate * len(raw) / 1e6:>10.1f}{rate / baseline:>8.1f}x")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,102 @@
+"""
+CLI startup budget based on `python -X importtime`.
+
+    python benchmarks/bench_startup.py [--budget-ms 500] [--run-budget-ms 1000] [--runs 5]
+
+Two passes for the hot commands:
+
+- `weather.py <command> --help` loads the CLI and parses arguments without
+  touching the network: the startup every invocation pays.
+- `weather.py <command> London` against benchmarks/openmeteo_stub.py (and a
+  throwaway database) also pays for the imports the command body makes
+  lazily (e.g. the database layer for `current`) and for the request itself.
+
+Each pass sums the top-level cumulative import times and fails when the
+median exceeds its budget, or when a heavy dependency the command does not
+need gets imported.
+"""
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from benchmarks.openmeteo_stub import StubServer
+
+COMMANDS = ["current", "forecast"]
+# Must only be imported by the commands that need them
+HEAVY_MODULES = ["pandas", "matplotlib", "seaborn", "torch", "apscheduler", "sqlalchemy"]
+# Heavy modules a real invocation legitimately needs (`current` saves to history)
+RUN_ALLOWED = {"current": {"sqlalchemy"}, "forecast": set()}
+RUN_CITY = "London"
+
+def parse_importtime(stderr: str):
+    """Return ({top-level module: cumulative us}, set of all imported modules)."""
+    top_level, imported = {}, set()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue  # header line
+        module = name.strip()
+        imported.add(module)
+        if not name.startswith("  "):
+            top_level[module] = int(cumulative)
+    return top_level, imported
+
+def run_once(args, env=None):
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "weather.py", *args],
+        cwd=ROOT, capture_output=True, text=True, env=env,
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(f"`weather.py {' '.join(args)}` failed:\n{proc.stderr[-2000:]}")
+    top_level, imported = parse_importtime(proc.stderr)
+    return sum(top_level.values()) / 1000, wall_ms, top_level, imported
+
+def report(label: str, samples, budget_ms: float, allowed=frozenset()) -> bool:
+    import_ms = statistics.median(s[0] for s in samples)
+    wall_ms = statistics.median(s[1] for s in samples)
+    _, _, top_level, imported = samples[-1]
+
+    heavy = sorted(m for m in HEAVY_MODULES if m in imported and m not in allowed)
+    ok = import_ms <= budget_ms and not heavy
+    print(f"{label:<18} imports {import_ms:7.1f} ms  wall {wall_ms:7.1f} ms  "
+          f"budget {budget_ms:.0f} ms  {'OK' if ok else 'FAIL'}")
+    for module, us in sorted(top_level.items(), key=lambda kv: -kv[1])[:5]:
+        print(f"    {us / 1000:7.1f} ms  {module}")
+    if heavy:
+        print(f"    heavy modules imported: {', '.join(heavy)}")
+    return ok
+
+def main(argv):
+    budget_ms = float(argv[argv.index("--budget-ms") + 1]) if "--budget-ms" in argv else 500.0
+    run_budget_ms = float(argv[argv.index("--run-budget-ms") + 1]) if "--run-budget-ms" in argv else 1000.0
+    runs = int(argv[argv.index("--runs") + 1]) if "--runs" in argv else 5
+    failed = False
+
+    for command in COMMANDS:
+        samples = [run_once([command, "--help"]) for _ in range(runs)]
+        failed = not report(f"{command} --help", samples, budget_ms) or failed
+
+    workdir = tempfile.mkdtemp(prefix="weathernow-startup-")
+    with StubServer() as stub:
+        env = dict(os.environ, **stub.env(), WEATHER_DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+        for command in COMMANDS:
+            stub.reset_counters()
+            samples = [run_once([command, RUN_CITY], env) for _ in range(runs)]
+            if not stub.calls:
+                raise RuntimeError(f"`weather.py {command} {RUN_CITY}` never reached the stub server")
+            failed = not report(f"{command} {RUN_CITY}", samples, run_budget_ms, RUN_ALLOWED[command]) or failed
+
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
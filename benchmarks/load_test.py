@@ -0,0 +1,185 @@
+"""
+End-to-end load benchmarks against the local Open-Meteo stand-in.
+
+    python benchmarks/load_test.py [--concurrency 1,8,32] [--requests 200]
+                                   [--latency-ms 20] [--error-rate 0] [--rate-limit 0] [--etags]
+                                   [--scenarios rich,api-current,api-full,compare,batch]
+                                   [--json results.json]
+
+Every scenario runs at each concurrency level against a fresh cache and
+reports throughput, p50/p95/p99 latency, errors and upstream calls
+(counted by benchmarks/openmeteo_stub.py). Nothing touches the real APIs
+or data/weather_data.db.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from benchmarks.openmeteo_stub import StubServer
+
+SCENARIOS = ["rich", "api-current", "api-full", "compare", "batch"]
+
+def percentile(samples, q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    idx = min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[idx]
+
+def run_load(op, n_ops: int, concurrency: int):
+    """Run `op(i)` n_ops times on `concurrency` threads. Returns (latencies_s, errors, wall_s)."""
+    latencies, errors = [], 0
+    lock = threading.Lock()
+
+    def timed(i):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            ok = op(i)
+        except Exception:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            if not ok:
+                errors += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(timed, range(n_ops)))
+    return latencies, errors, time.perf_counter() - start
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+class ApiServer:
+    """uvicorn serving api.main:app on a background thread."""
+
+    def __init__(self):
+        import uvicorn
+        from api.main import app
+        self.port = free_port()
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.05)
+        return f"http://127.0.0.1:{self.port}"
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,8,32")
+    parser.add_argument("--requests", type=int, default=200, help="operations per in-process scenario and level")
+    parser.add_argument("--cli-runs", type=int, default=8, help="CLI invocations per CLI scenario and level")
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=0.0)
+    parser.add_argument("--etags", action="store_true", help="stub sends ETags and answers 304s")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--json", dest="json_path", help="also write results to this file")
+    args = parser.parse_args(argv)
+
+    levels = [int(c) for c in args.concurrency.split(",")]
+    scenarios = [s for s in args.scenarios.split(",") if s]
+    workdir = tempfile.mkdtemp(prefix="weathernow-bench-")
+
+    stub = StubServer(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                      error_rate=args.error_rate, rate_limit=args.rate_limit, etags=args.etags).start()
+    # Must be set before the app modules read config
+    # (warming is disabled so it does not add background upstream traffic)
+    env = dict(os.environ, **stub.env(), WARMER_BUDGET="0",
+               WEATHER_DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+    os.environ.update(env)
+
+    from services import weather_service
+    from services.city_catalog import ALL_CITIES
+
+    def city(i: int) -> str:
+        return ALL_CITIES[i % len(ALL_CITIES)]
+
+    def cli(*cli_args):
+        proc = subprocess.run([sys.executable, "weather.py", *cli_args], cwd=ROOT, env=env,
+                              capture_output=True, text=True, timeout=600)
+        return proc.returncode == 0
+
+    batch_file = os.path.join(workdir, "cities.txt")
+    with open(batch_file, "w") as f:
+        f.write("\n".join(ALL_CITIES[:4]))
+
+    results = []
+    api = None
+    try:
+        if any(s.startswith("api") for s in scenarios):
+            api = ApiServer()
+            api_url = api.__enter__()
+            import requests
+            http = requests.Session()
+            http.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=max(levels)))
+
+        ops = {
+            "rich": (args.requests, lambda i: weather_service.get_rich_weather_data(city(i)) is not None),
+            "api-current": (args.requests, lambda i: http.get(f"{api_url}/weather/{city(i)}", timeout=60).status_code == 200),
+            "api-full": (args.requests, lambda i: http.get(f"{api_url}/weather/{city(i)}/full", timeout=60).status_code == 200),
+            "compare": (args.cli_runs, lambda i: cli("compare", city(3 * i), city(3 * i + 1), city(3 * i + 2))),
+            "batch": (args.cli_runs, lambda i: cli("batch", batch_file, "--output", os.path.join(workdir, f"report_{i}.csv"))),
+        }
+
+        print(f"{'scenario':<12}{'conc':>5}{'ops':>6}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+              f"{'errors':>7}{'upstream':>9}{'up/op':>7}")
+        for scenario in scenarios:
+            n_ops, op = ops[scenario]
+            for concurrency in levels:
+                # Same starting point for every level: empty cache, zeroed counters
+                # (the API runs in this process, so this clears its cache too)
+                weather_service.weather_cache.clear()
+                stub.reset_counters()
+
+                latencies, errors, wall = run_load(op, n_ops, concurrency)
+                upstream = sum(stub.calls.values())
+                row = {
+                    "scenario": scenario, "concurrency": concurrency, "ops": n_ops,
+                    "rps": n_ops / wall if wall else 0.0,
+                    "p50_ms": percentile(latencies, 50) * 1000,
+                    "p95_ms": percentile(latencies, 95) * 1000,
+                    "p99_ms": percentile(latencies, 99) * 1000,
+                    "mean_ms": statistics.mean(latencies) * 1000 if latencies else 0.0,
+                    "errors": errors, "upstream_calls": upstream,
+                    "upstream_by_endpoint": dict(stub.calls),
+                    "upstream_status": {str(k): v for k, v in stub.responses.items()},
+                    "upstream_bytes": sum(stub.bytes_sent.values()),
+                }
+                results.append(row)
+                print(f"{scenario:<12}{concurrency:>5}{n_ops:>6}{row['rps']:>9.1f}{row['p50_ms']:>9.1f}"
+                      f"{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}{errors:>7}{upstream:>9}{upstream / n_ops:>7.2f}")
+    finally:
+        if api is not None:
+            api.__exit__(None, None, None)
+        stub.stop()
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"settings": vars(args), "results": results}, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
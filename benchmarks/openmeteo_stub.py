@@ -0,0 +1,350 @@
+"""
+Local stand-in for the Open-Meteo geocoding, forecast and air-quality APIs.
+
+Replays the payloads in benchmarks/fixtures/ (see record_fixtures.py) with
+configurable latency, error rate and rate limiting, and counts every call
+so benchmarks can report upstream traffic.
+
+    python benchmarks/openmeteo_stub.py --port 8900 --latency-ms 50 --error-rate 0.01 --rate-limit 200
+
+then point the app at it:
+
+    export OPEN_METEO_GEOCODING_URL=http://127.0.0.1:8900/v1/search
+    export OPEN_METEO_FORECAST_URL=http://127.0.0.1:8900/v1/forecast
+    export OPEN_METEO_AIR_QUALITY_URL=http://127.0.0.1:8900/v1/air-quality
+    export OPEN_METEO_ARCHIVE_URL=http://127.0.0.1:8900/v1/archive
+
+The archive endpoint has no fixtures: it synthesises a deterministic hourly
+series for any coordinates and date range.
+"""
+import argparse
+import copy
+import glob
+import gzip
+import hashlib
+import json
+import math
+import os
+import random
+import socket
+import threading
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+ENDPOINTS = {
+    "/v1/search": "geocoding",
+    "/v1/forecast": "forecast",
+    "/v1/air-quality": "air_quality",
+    "/v1/archive": "archive",
+}
+
+def load_fixtures(fixture_dir: str = FIXTURE_DIR):
+    """{kind: {city slug: payload}} for every fixture file."""
+    fixtures = {}
+    for path in glob.glob(os.path.join(fixture_dir, "*.json")):
+        name = os.path.basename(path)[:-len(".json")]
+        for kind in ENDPOINTS.values():
+            if name.startswith(kind + "_"):
+                with open(path, encoding="utf-8") as f:
+                    fixtures.setdefault(kind, {})[name[len(kind) + 1:]] = json.load(f)
+    if not fixtures.get("geocoding") or not fixtures.get("forecast"):
+        raise RuntimeError(f"No fixtures in {fixture_dir}; run benchmarks/record_fixtures.py first")
+    return fixtures
+
+FORECAST_SECTIONS = ("current", "hourly", "daily", "minutely_15")
+# Forecast section -> query parameter limiting its number of timesteps
+HORIZONS = {"hourly": "forecast_hours", "minutely_15": "forecast_minutely_15"}
+STEPS_PER_DAY = {"hourly": 24, "minutely_15": 96, "daily": 1}
+
+def trim_forecast(payload: dict, query: dict) -> dict:
+    """Keep only the sections, variables and horizons the query asked for, like the real API."""
+    section_keys = set(FORECAST_SECTIONS) | {f"{section}_units" for section in FORECAST_SECTIONS}
+    out = {key: value for key, value in payload.items() if key not in section_keys}
+    days = int(query.get("forecast_days", ["7"])[0])
+    for section in FORECAST_SECTIONS:
+        if section not in query or section not in payload:
+            continue
+        wanted = set(query[section][0].split(",")) | {"time", "interval"}
+        block = {key: value for key, value in payload[section].items() if key in wanted}
+        if section != "current":
+            steps = int(query.get(HORIZONS.get(section, ""), [days * STEPS_PER_DAY[section]])[0])
+            block = {key: value[:steps] for key, value in block.items()}
+        out[section] = block
+        if f"{section}_units" in payload:
+            out[f"{section}_units"] = {key: value for key, value in payload[f"{section}_units"].items() if key in wanted}
+    return out
+
+class TokenBucket:
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self) -> bool:
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+class StubServer:
+    """
+    Threaded HTTP server replaying recorded Open-Meteo payloads.
+
+    latency_ms/jitter_ms: added per request; error_rate: fraction of requests
+    answered with HTTP 500; rate_limit: requests per second before HTTP 429
+    (0 disables); not_found: city names geocoding returns no results for;
+    etags: send ETags and answer matching If-None-Match with 304 (the real API
+    does not, so clients fall back to comparing bodies). Bodies are gzipped
+    when the client accepts it, and `generationtime_ms` varies per response
+    as it does upstream.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 error_rate: float = 0.0, rate_limit: float = 0.0, not_found=("nowhere",), etags: bool = False,
+                 fixture_dir: str = FIXTURE_DIR):
+        self.fixtures = load_fixtures(fixture_dir)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.bucket = TokenBucket(rate_limit) if rate_limit else None
+        self.not_found = {name.lower() for name in not_found}
+        self.etags = etags
+        self.calls = Counter()
+        self.responses = Counter()
+        self.bytes_sent = Counter()
+        self._coords = {}
+        self._connections = set()
+        self._lock = threading.Lock()
+        self._rnd = random.Random(0)
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self) -> dict:
+        """Environment variables that point the app's config at this server."""
+        return {
+            "OPEN_METEO_GEOCODING_URL": f"{self.base_url}/v1/search",
+            "OPEN_METEO_FORECAST_URL": f"{self.base_url}/v1/forecast",
+            "OPEN_METEO_AIR_QUALITY_URL": f"{self.base_url}/v1/air-quality",
+            "OPEN_METEO_ARCHIVE_URL": f"{self.base_url}/v1/archive",
+        }
+
+    def start(self) -> "StubServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="openmeteo-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        # Keep-alive handler threads outlive shutdown(); drop their connections so
+        # pooled clients don't keep talking to a stopped server
+        with self._lock:
+            connections, self._connections = self._connections, set()
+        for conn in connections:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def reset_counters(self):
+        with self._lock:
+            self.calls.clear()
+            self.responses.clear()
+            self.bytes_sent.clear()
+
+    # --- payloads -------------------------------------------------------
+
+    def _pick(self, kind: str, key: str):
+        fixtures = self.fixtures.get(kind) or {}
+        if key in fixtures:
+            return fixtures[key]
+        ordered = sorted(fixtures)
+        digest = int(hashlib.md5(key.encode()).hexdigest(), 16)
+        return fixtures[ordered[digest % len(ordered)]]
+
+    def geocoding(self, query: dict):
+        name = query.get("name", [""])[0].strip()
+        if not name or name.lower() in self.not_found:
+            return {"generationtime_ms": 0.2}
+        slug = name.lower().replace(" ", "_")
+        payload = copy.deepcopy(self._pick("geocoding", slug))
+        result = payload["results"][0]
+        if slug not in self.fixtures["geocoding"]:
+            # Unknown cities get stable, distinct coordinates
+            digest = int(hashlib.md5(slug.encode()).hexdigest(), 16)
+            result["name"] = name.title()
+            result["latitude"] = round((digest % 12000) / 100 - 60, 4)
+            result["longitude"] = round((digest // 12000 % 36000) / 100 - 180, 4)
+        with self._lock:
+            self._coords[(str(result["latitude"]), str(result["longitude"]))] = slug
+        return payload
+
+    def _for_coords(self, kind: str, query: dict):
+        lat = query.get("latitude", ["0"])[0]
+        lon = query.get("longitude", ["0"])[0]
+        slug = self._coords.get((lat, lon), f"{lat},{lon}")
+        payload = dict(self._pick(kind, slug))
+        payload["latitude"], payload["longitude"] = float(lat), float(lon)
+        if kind == "forecast":
+            payload = trim_forecast(payload, query)
+        return payload
+
+    def archive(self, query: dict):
+        """Hourly history for start_date..end_date (inclusive): a smooth daily/seasonal cycle per location."""
+        try:
+            lat = float(query["latitude"][0])
+            lon = float(query["longitude"][0])
+            start = date.fromisoformat(query["start_date"][0])
+            end = date.fromisoformat(query["end_date"][0])
+        except (KeyError, ValueError):
+            return None
+        variables = query.get("hourly", ["temperature_2m"])[0].split(",")
+        base = 25 - abs(lat) * 0.4
+        first = datetime(start.year, start.month, start.day)
+        hours = ((end - start).days + 1) * 24
+        times, series = [], {name: [] for name in variables}
+        for step in range(max(0, hours)):
+            stamp = first + timedelta(hours=step)
+            season = math.cos(2 * math.pi * (stamp.timetuple().tm_yday - 200) / 365.25) * (1 if lat >= 0 else -1)
+            daily = math.sin(2 * math.pi * (stamp.hour + lon / 15 - 9) / 24)
+            temp = round(base + 8 * season + 4 * daily, 1)
+            times.append(stamp.strftime("%Y-%m-%dT%H:%M"))
+            values = {
+                "temperature_2m": temp,
+                "relative_humidity_2m": int(60 - 2 * daily * 10),
+                "wind_speed_10m": round(10 + 5 * abs(math.sin(step / 17)), 1),
+                "weather_code": (0, 1, 2, 3, 61)[(step // 6) % 5],
+            }
+            for name in variables:
+                series[name].append(values.get(name))
+        return {"latitude": lat, "longitude": lon, "generationtime_ms": 1.0, "timezone": "GMT",
+                "hourly": {"time": times, **series}}
+
+    # --- HTTP -------------------------------------------------------------
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                # Headers and body are written separately; avoid Nagle/delayed-ACK stalls
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                with stub._lock:
+                    stub._connections.add(self.connection)
+
+            def finish(self):
+                with stub._lock:
+                    stub._connections.discard(self.connection)
+                super().finish()
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, payload, headers=None, kind: str = "other"):
+                headers = dict(headers or {})
+                body = json.dumps(payload, separators=(",", ":")).encode()
+                if status == 200 and stub.etags:
+                    etag = '"' + hashlib.md5(body).hexdigest() + '"'
+                    headers["ETag"] = etag
+                    if self.headers.get("If-None-Match") == etag:
+                        status, body = 304, b""
+                if status == 200 and isinstance(payload, dict) and "generationtime_ms" in payload:
+                    # Differs on every real response even when the data does not
+                    payload = dict(payload, generationtime_ms=round(stub._rnd.uniform(0.05, 2.0), 3))
+                    body = json.dumps(payload, separators=(",", ":")).encode()
+                if body and "gzip" in self.headers.get("Accept-Encoding", ""):
+                    body = gzip.compress(body, compresslevel=5)
+                    headers["Content-Encoding"] = "gzip"
+                # Count before replying so clients never observe stale counters
+                with stub._lock:
+                    stub.responses[status] += 1
+                    stub.bytes_sent[kind] += len(body)
+                self.send_response(status)
+                if status != 304:
+                    self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                kind = ENDPOINTS.get(url.path)
+                if kind is None:
+                    return self._send(404, {"error": True, "reason": "Not Found"})
+                with stub._lock:
+                    stub.calls[kind] += 1
+                    fail = stub._rnd.random() < stub.error_rate
+                    delay = stub.latency_ms + (stub._rnd.uniform(0, stub.jitter_ms) if stub.jitter_ms else 0)
+
+                if stub.bucket is not None and not stub.bucket.take():
+                    return self._send(429, {"error": True, "reason": "Too many requests"}, {"Retry-After": "1"})
+                if delay:
+                    time.sleep(delay / 1000)
+                if fail:
+                    return self._send(500, {"error": True, "reason": "Injected stub failure"})
+
+                query = parse_qs(url.query)
+                if kind == "geocoding":
+                    return self._send(200, stub.geocoding(query), kind=kind)
+                if kind == "archive":
+                    payload = stub.archive(query)
+                    if payload is None:
+                        return self._send(400, {"error": True, "reason": "Invalid archive query"})
+                    return self._send(200, payload, kind=kind)
+                if kind not in stub.fixtures:
+                    return self._send(404, {"error": True, "reason": f"No {kind} fixtures recorded"})
+                return self._send(200, stub._for_coords(kind, query), kind=kind)
+
+        return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="requests/second before HTTP 429 (0 = unlimited)")
+    parser.add_argument("--etags", action="store_true", help="send ETags and honour If-None-Match")
+    args = parser.parse_args()
+
+    server = StubServer(args.host, args.port, args.latency_ms, args.jitter_ms, args.error_rate, args.rate_limit,
+                        etags=args.etags)
+    for key, value in server.env().items():
+        print(f"export {key}={value}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"calls: {dict(server.calls)}  responses: {dict(server.responses)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Record Open-Meteo responses used by the benchmarks.
+
+    python benchmarks/record_fixtures.py London Tokyo       # live API
+    python benchmarks/record_fixtures.py --synthetic London  # offline, same schema
+
+Each city produces geocoding_<city>.json, forecast_<city>.json and
+air_quality_<city>.json in benchmarks/fixtures/. Queries match the ones
+issued by services.weather_service.get_rich_weather_data.
+"""
+import json
+import math
+import os
+import random
+import sys
+from datetime import date, datetime, timedelta
+from urllib.parse import quote
+
+import requests
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+GEO_URL = "https://geocoding-api.open-meteo.com/v1/search?name={city}&count=1&language=en&format=json"
+FORECAST_URL = (
+    "https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}"
+    "&current=temperature_2m,relative_humidity_2m,apparent_temperature,is_day,weather_code,wind_speed_10m,uv_index,precipitation"
+    "&hourly=temperature_2m,weather_code,uv_index,precipitation_probability,apparent_temperature"
+    "&daily=weather_code,temperature_2m_max,temperature_2m_min,sunrise,sunset,uv_index_max,precipitation_sum"
+    "&minutely_15=precipitation&forecast_days=8&timezone={tz}"
+)
+AQI_URL = "https://air-quality-api.open-meteo.com/v1/air-quality?latitude={lat}&longitude={lon}&current=us_aqi"
+
+def slug(city: str) -> str:
+    return city.strip().lower().replace(" ", "_")
+
+def record_live(city: str):
+    geo = requests.get(GEO_URL.format(city=quote(city)), timeout=10).json()
+    loc = geo["results"][0]
+    lat, lon, tz = loc["latitude"], loc["longitude"], loc.get("timezone", "auto")
+    forecast = requests.get(FORECAST_URL.format(lat=lat, lon=lon, tz=tz), timeout=10).json()
+    aqi = requests.get(AQI_URL.format(lat=lat, lon=lon), timeout=10).json()
+    return geo, forecast, aqi
+
+def record_synthetic(city: str, days: int = 8):
+    """Deterministic payloads with the same keys, units and array lengths as the live API."""
+    rnd = random.Random(slug(city))
+    lat, lon = round(rnd.uniform(-60, 70), 4), round(rnd.uniform(-180, 180), 4)
+    base = rnd.uniform(-5, 30)
+    start = datetime.combine(date(2026, 1, 1), datetime.min.time())
+
+    hours = [start + timedelta(hours=i) for i in range(24 * days)]
+    hourly_temp = [round(base + 6 * math.sin((h.hour - 9) / 24 * 2 * math.pi) + rnd.gauss(0, 1), 1) for h in hours]
+    quarters = [start + timedelta(minutes=15 * i) for i in range(96 * days)]
+    codes = [0, 1, 2, 3, 45, 51, 61, 63, 80, 95]
+
+    geo = {
+        "results": [{
+            "id": rnd.randint(10**6, 10**7), "name": city.title(), "latitude": lat, "longitude": lon,
+            "elevation": round(rnd.uniform(0, 500), 1), "feature_code": "PPLC", "country_code": "XX",
+            "timezone": "UTC", "population": rnd.randint(10**5, 10**7), "country": "Testland", "admin1": "Region"
+        }],
+        "generationtime_ms": 0.9
+    }
+    forecast = {
+        "latitude": lat, "longitude": lon, "generationtime_ms": 1.2, "utc_offset_seconds": 0,
+        "timezone": "UTC", "timezone_abbreviation": "UTC", "elevation": geo["results"][0]["elevation"],
+        "current_units": {"time": "iso8601", "interval": "seconds", "temperature_2m": "°C", "relative_humidity_2m": "%",
+                          "apparent_temperature": "°C", "is_day": "", "weather_code": "wmo code",
+                          "wind_speed_10m": "km/h", "uv_index": "", "precipitation": "mm"},
+        "current": {"time": "2026-01-01T12:00", "interval": 900, "temperature_2m": hourly_temp[12],
+                    "relative_humidity_2m": rnd.randint(30, 95), "apparent_temperature": round(hourly_temp[12] - 1.5, 1),
+                    "is_day": 1, "weather_code": rnd.choice(codes), "wind_speed_10m": round(rnd.uniform(0, 30), 1),
+                    "uv_index": round(rnd.uniform(0, 8), 2), "precipitation": 0.0},
+        "hourly_units": {"time": "iso8601", "temperature_2m": "°C", "weather_code": "wmo code", "uv_index": "",
+                         "precipitation_probability": "%", "apparent_temperature": "°C"},
+        "hourly": {
+            "time": [h.strftime("%Y-%m-%dT%H:%M") for h in hours],
+            "temperature_2m": hourly_temp,
+            "weather_code": [rnd.choice(codes) for _ in hours],
+            "uv_index": [round(max(0.0, 6 * math.sin((h.hour - 6) / 12 * math.pi)), 2) if 6 <= h.hour <= 18 else 0.0 for h in hours],
+            "precipitation_probability": [rnd.randint(0, 100) for _ in hours],
+            "apparent_temperature": [round(t - rnd.uniform(0, 3), 1) for t in hourly_temp],
+        },
+        "daily_units": {"time": "iso8601", "weather_code": "wmo code", "temperature_2m_max": "°C",
+                        "temperature_2m_min": "°C", "sunrise": "iso8601", "sunset": "iso8601",
+                        "uv_index_max": "", "precipitation_sum": "mm"},
+        "daily": {
+            "time": [(start + timedelta(days=d)).strftime("%Y-%m-%d") for d in range(days)],
+            "weather_code": [rnd.choice(codes) for _ in range(days)],
+            "temperature_2m_max": [max(hourly_temp[d * 24:(d + 1) * 24]) for d in range(days)],
+            "temperature_2m_min": [min(hourly_temp[d * 24:(d + 1) * 24]) for d in range(days)],
+            "sunrise": [(start + timedelta(days=d, hours=7, minutes=rnd.randint(0, 59))).strftime("%Y-%m-%dT%H:%M") for d in range(days)],
+            "sunset": [(start + timedelta(days=d, hours=17, minutes=rnd.randint(0, 59))).strftime("%Y-%m-%dT%H:%M") for d in range(days)],
+            "uv_index_max": [round(rnd.uniform(1, 9), 2) for _ in range(days)],
+            "precipitation_sum": [round(max(0.0, rnd.gauss(1, 2)), 1) for _ in range(days)],
+        },
+        "minutely_15_units": {"time": "iso8601", "precipitation": "mm"},
+        "minutely_15": {
+            "time": [q.strftime("%Y-%m-%dT%H:%M") for q in quarters],
+            "precipitation": [round(max(0.0, rnd.gauss(0, 0.3)), 1) for _ in quarters],
+        },
+    }
+    aqi = {
+        "latitude": lat, "longitude": lon, "generationtime_ms": 0.4, "utc_offset_seconds": 0,
+        "timezone": "GMT", "timezone_abbreviation": "GMT", "elevation": geo["results"][0]["elevation"],
+        "current_units": {"time": "iso8601", "interval": "seconds", "us_aqi": "USAQI"},
+        "current": {"time": "2026-01-01T12:00", "interval": 3600, "us_aqi": rnd.randint(5, 150)},
+    }
+    return geo, forecast, aqi
+
+def main(argv):
+    synthetic = "--synthetic" in argv
+    cities = [a for a in argv if not a.startswith("--")] or ["London"]
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    for city in cities:
+        payloads = record_synthetic(city) if synthetic else record_live(city)
+        for kind, payload in zip(("geocoding", "forecast", "air_quality"), payloads):
+            path = os.path.join(FIXTURE_DIR, f"{kind}_{slug(city)}.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+            print(f"wrote {path} ({os.path.getsize(path)} bytes)")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -6,4 +6,104 @@ DATA_DIR = os.path.join(BASE_DIR, "data")
 os.makedirs(DATA_DIR, exist_ok=True)
 
 # Database URL
-DATABASE_URL = f"sqlite:///{os.path.join(DATA_DIR, 'weather_data.db')}"
+DATABASE_URL = os.getenv("WEATHER_DATABASE_URL", f"sqlite:///{os.path.join(DATA_DIR, 'weather_data.db')}")
+
+# Open-Meteo endpoints (override to point at a mirror or benchmarks/openmeteo_stub.py)
+GEOCODING_URL = os.getenv("OPEN_METEO_GEOCODING_URL", "https://geocoding-api.open-meteo.com/v1/search")
+FORECAST_URL = os.getenv("OPEN_METEO_FORECAST_URL", "https://api.open-meteo.com/v1/forecast")
+AIR_QUALITY_URL = os.getenv("OPEN_METEO_AIR_QUALITY_URL", "https://air-quality-api.open-meteo.com/v1/air-quality")
+ARCHIVE_URL = os.getenv("OPEN_METEO_ARCHIVE_URL", "https://archive-api.open-meteo.com/v1/archive")
+
+# Coordinate lookups: grid cells about one forecast-model cell wide; a known
+# location within GEO_SNAP_KM answers a coordinate request without geocoding
+GEO_CELL_DEG = float(os.getenv("GEO_CELL_DEG", "0.1"))
+GEO_SNAP_KM = float(os.getenv("GEO_SNAP_KM", "5"))
+
+# Offline city gazetteer (services/gazetteer.py): the GeoNames extract written by
+# `weather.py gazetteer --download` when present, else the bundled city list
+GEONAMES_URL = os.getenv("GEONAMES_URL", "https://download.geonames.org/export/dump")
+GAZETTEER_DOWNLOAD_PATH = os.path.join(DATA_DIR, "cities15000.tsv")
+GAZETTEER_PATH = os.getenv("GAZETTEER_PATH") or (
+    GAZETTEER_DOWNLOAD_PATH if os.path.exists(GAZETTEER_DOWNLOAD_PATH) else os.path.join(DATA_DIR, "gazetteer.tsv")
+)
+# Resolve names found in the gazetteer without calling the geocoding API ("0" to disable)
+GEOCODE_LOCAL_FIRST = os.getenv("GEOCODE_LOCAL_FIRST", "1") != "0"
+
+# Write-behind history buffer (services/write_behind.py)
+WRITE_QUEUE_SIZE = int(os.getenv("WRITE_QUEUE_SIZE", "10000"))  # records; more are dropped
+WRITE_FLUSH_INTERVAL = float(os.getenv("WRITE_FLUSH_INTERVAL", "0.5"))  # seconds a batch may collect records
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", "500"))  # records per transaction
+
+# History API (services/history_query.py)
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "500"))  # rows (or buckets) per JSON page
+HISTORY_MAX_PAGE_SIZE = int(os.getenv("HISTORY_MAX_PAGE_SIZE", "5000"))
+HISTORY_STREAM_BATCH = int(os.getenv("HISTORY_STREAM_BATCH", "1000"))  # rows fetched per cursor round trip
+
+# HTTP caching on the API: /weather and /predict follow WEATHER_CACHE_TTL, history pages this
+HTTP_HISTORY_MAX_AGE = int(os.getenv("HTTP_HISTORY_MAX_AGE", "60"))  # seconds
+GZIP_MIN_SIZE = int(os.getenv("GZIP_MIN_SIZE", "1000"))  # bytes; smaller responses are sent as is
+
+# Historical backfill from the archive API
+BACKFILL_CHUNK_DAYS = int(os.getenv("BACKFILL_CHUNK_DAYS", "92"))  # days per archive request
+BACKFILL_CONCURRENCY = int(os.getenv("BACKFILL_CONCURRENCY", "4"))
+BACKFILL_RATE_LIMIT = float(os.getenv("BACKFILL_RATE_LIMIT", "5"))  # archive requests/second
+BACKFILL_BATCH_SIZE = int(os.getenv("BACKFILL_BATCH_SIZE", "5000"))  # rows per INSERT batch
+BACKFILL_LAG_DAYS = int(os.getenv("BACKFILL_LAG_DAYS", "5"))  # the archive trails real time by a few days
+
+# History analytics (services/analytics_engine.py): full-history frames kept in memory
+ANALYTICS_MAX_FRAMES = int(os.getenv("ANALYTICS_MAX_FRAMES", "32"))  # cities; least recently used are dropped
+ANALYTICS_FRAME_TTL = int(os.getenv("ANALYTICS_FRAME_TTL", "3600"))  # seconds an unused frame is kept
+
+# Rendered analytics charts (content-addressed PNGs)
+CHARTS_DIR = os.getenv("WEATHER_CHARTS_DIR", "plots")
+CHART_WORKERS = int(os.getenv("CHART_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Superseded renders are deleted once the newer one is this old, so requests still serving them finish
+CHART_PRUNE_GRACE = int(os.getenv("CHART_PRUNE_GRACE", "60"))  # seconds
+
+# Per-city LSTM checkpoints (ml/train.py)
+MODEL_DIR = os.getenv("WEATHER_MODEL_DIR", os.path.join("ml", "models"))
+TRAIN_WORKERS = int(os.getenv("TRAIN_WORKERS", str(os.cpu_count() or 1)))  # training processes for train-all
+# Torch threads for training inside the calling process (workers=1, e.g. the API's queue), so it
+# leaves cores to request threads; process-pool workers split the cores between them instead
+TRAIN_THREADS = int(os.getenv("TRAIN_THREADS", str(max(1, (os.cpu_count() or 1) // 2))))
+TRAIN_STOP_TIMEOUT = float(os.getenv("TRAIN_STOP_TIMEOUT", "10"))  # seconds shutdown waits for a running job
+TRAIN_MAX_EPOCHS = int(os.getenv("TRAIN_MAX_EPOCHS", "1000"))  # per POST /train job
+TRAIN_MAX_CITIES = int(os.getenv("TRAIN_MAX_CITIES", "50"))  # cities named in one POST /train job
+# "auto" serves exported TorchScript/int8 artifacts when present (see ml/inference.py), "eager" never does
+INFERENCE_BACKEND = os.getenv("WEATHER_INFERENCE_BACKEND", "auto")
+
+# Upstream (Open-Meteo) response cache
+WEATHER_CACHE_TTL = int(os.getenv("WEATHER_CACHE_TTL", "600"))  # seconds
+UPSTREAM_POOL_SIZE = int(os.getenv("UPSTREAM_POOL_SIZE", "20"))
+# How long ETag/body-digest validators of upstream responses are kept
+UPSTREAM_VALIDATOR_TTL = int(os.getenv("UPSTREAM_VALIDATOR_TTL", "86400"))  # seconds
+
+# Upstream retries: full-jitter backoff bounded by a per-call time budget
+UPSTREAM_BACKOFF_BASE = float(os.getenv("UPSTREAM_BACKOFF_BASE", "0.5"))  # seconds
+UPSTREAM_BACKOFF_CAP = float(os.getenv("UPSTREAM_BACKOFF_CAP", "4"))  # seconds
+UPSTREAM_RETRY_BUDGET = float(os.getenv("UPSTREAM_RETRY_BUDGET", "8"))  # seconds, all attempts
+# Per-host circuit breaker
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))  # seconds
+
+# Dashboard data source: "direct" calls Open-Meteo from the Streamlit process,
+# "api" reads everything through the FastAPI service (see docker-compose.yml).
+DASHBOARD_DATA_SOURCE = os.getenv("WEATHER_DATA_SOURCE", "direct")
+API_BASE_URL = os.getenv("WEATHER_API_URL", "http://localhost:8000")
+API_POOL_SIZE = int(os.getenv("WEATHER_API_POOL_SIZE", "10"))
+
+# Live subscriptions (GET /stream, services/subscriptions.py)
+STREAM_POLL_INTERVAL = int(os.getenv("STREAM_POLL_INTERVAL", "60"))  # seconds between polls of each city
+STREAM_HEARTBEAT = int(os.getenv("STREAM_HEARTBEAT", "15"))  # seconds; keeps idle connections open through proxies
+STREAM_MAX_SUBSCRIBERS = int(os.getenv("STREAM_MAX_SUBSCRIBERS", "10000"))
+STREAM_MAX_CITIES = int(os.getenv("STREAM_MAX_CITIES", "20"))  # per subscription
+
+# Background cache warmer (favorites + most-viewed curated cities)
+WARMER_INTERVAL = int(os.getenv("WARMER_INTERVAL", "300"))  # seconds between cycles
+WARMER_BUDGET = int(os.getenv("WARMER_BUDGET", "10"))  # max upstream refreshes per cycle
+WARMER_TOP_VIEWED = int(os.getenv("WARMER_TOP_VIEWED", "20"))
+WARMER_MAX_FAVORITES = int(os.getenv("WARMER_MAX_FAVORITES", "100"))  # least recently requested are dropped first
+WARMER_FAVORITE_TTL = int(os.getenv("WARMER_FAVORITE_TTL", "86400"))  # seconds a favorite stays without being registered or viewed
+WARMER_MAX_REGISTER = int(os.getenv("WARMER_MAX_REGISTER", "20"))  # cities per POST /warm
+WARMER_MAX_VIEWED = int(os.getenv("WARMER_MAX_VIEWED", "10000"))  # cities with a view count; least recently viewed are forgotten
+DEFAULT_FAVORITES = ["New Delhi", "New York", "London"]
@@ -13,14 +13,38 @@ st.set_page_config(page_title="WeatherNow", page_icon="🌤️", layout="wide")
 
 # Safe Import
 try:
-    from services.weather_service import get_rich_weather_data
+    from config import DASHBOARD_DATA_SOURCE, DEFAULT_FAVORITES
+    from services.city_catalog import ALL_CITIES
+    if DASHBOARD_DATA_SOURCE == "api":
+        # Read through the API tier so caching is shared across dashboard replicas
+        from services.api_client import get_rich_weather_data, add_warm_cities, nearest_location, search_cities
+    else:
+        from services.weather_service import get_rich_weather_data, nearest_location
+        from services.gazetteer import search_cities
+        from services.cache_warmer import local_warmer
+    from config import GEO_SNAP_KM
+    from services.geo_index import haversine_km
 except ImportError:
     st.error("Service Error. Please check deployment.")
     st.stop()
 
 # Initialize Session State
 if 'selected_city' not in st.session_state: st.session_state.selected_city = "New Delhi"
-if 'favorites' not in st.session_state: st.session_state.favorites = ["New Delhi", "New York", "London"]
+if 'favorites' not in st.session_state: st.session_state.favorites = list(DEFAULT_FAVORITES)
+
+# --- CACHE WARMING ---
+@st.cache_resource
+def get_cache_warmer():
+    """One background warmer per dashboard process (direct mode only)."""
+    return local_warmer().start()
+
+# Keep favorites prefetched so switching between them renders from cache
+if st.session_state.get('warmed_favorites') != st.session_state.favorites:
+    if DASHBOARD_DATA_SOURCE == "api":
+        add_warm_cities(st.session_state.favorites)
+    else:
+        get_cache_warmer().add_favorites(st.session_state.favorites)
+    st.session_state.warmed_favorites = list(st.session_state.favorites)
 
 # --- DYNAMIC GRADIENT LOGIC ---
 def get_weather_gradient(code, is_day):
@@ -104,9 +128,19 @@ with st.sidebar:
         if loc:
             try:
                 lat, lon = loc['coords']['latitude'], loc['coords']['longitude']
-                rev = requests.get(f"https://nominatim.openstreetmap.org/reverse?format=json&lat={lat}&lon={lon}", headers={'User-Agent': 'WN/1.0'}, timeout=3).json()
-                addr = rev.get('address', {})
-                name = addr.get('city') or addr.get('town') or addr.get('village') or addr.get('county')
+                fix = st.session_state.get('geo_fix')
+                if fix and haversine_km(lat, lon, fix[0], fix[1]) <= GEO_SNAP_KM:
+                    # Same position as the last rerun: already resolved
+                    name = fix[2]
+                else:
+                    # A known location nearby needs neither reverse nor forward geocoding
+                    known = nearest_location(lat, lon)
+                    name = known['name'] if known else None
+                    if name is None:
+                        rev = requests.get(f"https://nominatim.openstreetmap.org/reverse?format=json&lat={lat}&lon={lon}", headers={'User-Agent': 'WN/1.0'}, timeout=3).json()
+                        addr = rev.get('address', {})
+                        name = addr.get('city') or addr.get('town') or addr.get('village') or addr.get('county')
+                    st.session_state.geo_fix = (lat, lon, name)
                 if name and name != st.session_state.selected_city:
                     st.session_state.selected_city = name
                     st.rerun()
@@ -115,28 +149,7 @@ with st.sidebar:
     st.markdown("---")
     
     # 3.2 UNIFIED CITY SEARCH
-    # Consolidated List
-    ALL_CITIES = sorted(list(set([
-        # India
-        "New Delhi", "Mumbai", "Bangalore", "Hyderabad", "Chennai", "Kolkata", "Pune", "Ahmedabad", "Jaipur", "Surat", 
-        "Lucknow", "Chandigarh", "Goa", "Kochi", "Indore", "Nagpur", "Bhopal", "Visakhapatnam", "Patna", "Vadodara",
-        "Ludhiana", "Agra", "Nashik", "Ranchi", "Raipur", "Meerut", "Rajkot", "Varanasi", "Srinagar", "Aurangabad", 
-        "Amritsar", "Navi Mumbai", "Allahabad", "Howrah", "Jabalpur", "Gwalior", "Vijayawada", "Jodhpur", "Madurai",
-        # USA
-        "New York", "Los Angeles", "Chicago", "Houston", "Phoenix", "Philadelphia", "San Antonio", "San Diego", "Dallas", "San Jose", 
-        "Austin", "Seattle", "Denver", "Boston", "Las Vegas", "Miami", "San Francisco", "Atlanta", "Detroit", "Washington DC",
-        "Nashville", "Portland", "Oklahoma City", "Baltimore", "Louisville", "Milwaukee", "Albuquerque", "Tucson", "Fresno",
-        "Sacramento", "Kansas City", "Mesa", "Charlotte", "Raleigh", "Omaha", "Minneapolis", "Tampa", "New Orleans",
-        # Europe
-        "London", "Paris", "Berlin", "Madrid", "Rome", "Amsterdam", "Vienna", "Lisbon", "Warsaw", "Prague", 
-        "Budapest", "Stockholm", "Oslo", "Copenhagen", "Zurich", "Athens", "Dublin", "Brussels", "Helsinki", "Barcelona", 
-        "Munich", "Milan", "Hamburg", "Naples", "Turin", "Valencia", "Seville", "Frankfurt", "Stuttgart", "Dusseldorf",
-        "Lyon", "Marseille", "Manchester", "Birmingham", "Edinburgh", "Glasgow", "Krakow", "Gdańsk", "Sofia", "Bucharest",
-        # Global
-        "Tokyo", "Dubai", "Singapore", "Sydney", "Beijing", "Seoul", "Bangkok", "Istanbul", "São Paulo", "Toronto", 
-        "Moscow", "Cairo", "Cape Town", "Rio de Janeiro", "Mexico City", "Buenos Aires", "Hong Kong", "Kuala Lumpur",
-        "Manila", "Jakarta", "Ho Chi Minh City", "Shanghai", "Melbourne", "Auckland", "Bora Bora", "Maldives", "Santorini"
-    ])))
+    # Consolidated List (built once at import, see services/city_catalog.py)
     
     # Enable "Custom" entry by using a text input logic mixed with selectbox? 
     # Streamlit doesn't support "Combobox" directly yet. 
@@ -153,7 +166,16 @@ with st.sidebar:
     st.markdown("**OR**")
     custom_city = st.text_input("Type any city name", placeholder="e.g. Smallville")
     if custom_city:
-        st.session_state.selected_city = custom_city
+        # Offline gazetteer suggestions: fix typos before they cost an upstream lookup
+        suggestions = search_cities(custom_city, limit=5)
+        exact = suggestions and suggestions[0]['name'].casefold() == custom_city.strip().casefold()
+        if suggestions and not exact:
+            names = [custom_city] + [s['name'] for s in suggestions]
+            labels = [f"{custom_city} (as typed)"] + [f"{s['name']}, {s['country']}" for s in suggestions]
+            picked = st.radio("Did you mean", range(len(names)), index=1, format_func=lambda i: labels[i])
+            st.session_state.selected_city = names[picked]
+        else:
+            st.session_state.selected_city = custom_city
 
     st.markdown("---")
     st.caption("Saved Places")
@@ -193,7 +215,7 @@ st.markdown("<br>", unsafe_allow_html=True)
 t1, t2, t3 = st.tabs(["📅 Forecast", "🗺️ Radar", "ℹ️ Details"])
 
 with t1:
-    hourly_df = pd.DataFrame(data['hourly'])
+    hourly_df = data['hourly'].to_frame()
     fig = go.Figure()
     fig.add_trace(go.Scatter(
         x=hourly_df['time'], y=hourly_df['temp'],
@@ -7,6 +7,20 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+_initialized = False
+
+def init_db():
+    """Create missing tables. Only the first call per process touches the database."""
+    global _initialized
+    if _initialized:
+        return
+    import models  # noqa: F401 - registers the ORM tables on Base.metadata
+    Base.metadata.create_all(bind=engine)
+    # create_all skips tables that already exist: add indexes introduced since
+    for index in models.WeatherRecord.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+    _initialized = True
+
 def get_db():
     db = SessionLocal()
     try:
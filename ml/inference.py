@@ -0,0 +1,131 @@
+"""
+Low-latency CPU inference for the per-city LSTM.
+
+`export_model` turns a training checkpoint into a TorchScript artifact,
+optionally with dynamic int8 quantization of the LSTM and Linear layers.
+`load_predictor` picks the best artifact for a city (int8, then TorchScript,
+then the eager checkpoint; artifacts older than the checkpoint are ignored)
+and keeps it loaded until the file changes, so a prediction is one forward
+pass under `torch.inference_mode`.
+"""
+import json
+import os
+import threading
+import warnings
+from typing import Dict, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from config import INFERENCE_BACKEND
+from ml.model import WeatherLSTM
+from ml.train import model_path
+
+# Artifact kind -> file suffix replacing "_lstm.pth"
+ARTIFACTS = {"int8": "_lstm.int8.ts", "script": "_lstm.ts"}
+
+class Predictor(NamedTuple):
+    kind: str                  # "int8", "script" or "eager"
+    module: torch.nn.Module
+    mean: float
+    std: float
+    path: str
+
+    def predict(self, sequences: Sequence[Sequence[float]]) -> np.ndarray:
+        """Next-value predictions (°C) for a batch of equal-length temperature sequences."""
+        batch = (np.asarray(sequences, dtype=np.float32) - self.mean) / self.std
+        with torch.inference_mode():
+            out = self.module(torch.from_numpy(batch).unsqueeze(2))
+        return out.numpy()[:, 0].astype(np.float64) * self.std + self.mean
+
+def artifact_path(city: str, kind: str, model_dir: Optional[str] = None) -> str:
+    return model_path(city, model_dir)[:-len("_lstm.pth")] + ARTIFACTS[kind]
+
+def _eager_model(checkpoint: dict) -> WeatherLSTM:
+    model = WeatherLSTM()
+    model.load_state_dict(checkpoint['model_state'])
+    return model.eval()
+
+def export_model(city: str, quantize: bool = True, model_dir: Optional[str] = None) -> Optional[str]:
+    """Write the TorchScript artifact for a trained city. Returns its path, or None without a checkpoint."""
+    source = model_path(city, model_dir)
+    if not os.path.exists(source):
+        return None
+    checkpoint = torch.load(source, map_location="cpu", weights_only=True)
+    model = _eager_model(checkpoint)
+    kind = "int8" if quantize else "script"
+    meta = {key: checkpoint.get(key) for key in ("mean", "std", "data_hash")}
+
+    path = artifact_path(city, kind, model_dir)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with warnings.catch_warnings():
+        # TorchScript and eager-mode quantization are deprecated upstream but still
+        # give the lowest per-call overhead on CPU
+        warnings.simplefilter("ignore", FutureWarning)
+        warnings.simplefilter("ignore", UserWarning)
+        warnings.simplefilter("ignore", DeprecationWarning)
+        if quantize:
+            model = torch.ao.quantization.quantize_dynamic(model, {nn.LSTM, nn.Linear}, dtype=torch.qint8)
+        scripted = torch.jit.freeze(torch.jit.script(model))
+        torch.jit.save(scripted, tmp_path, _extra_files={"meta.json": json.dumps(meta)})
+    os.replace(tmp_path, path)
+    return path
+
+def _load_artifact(path: str, kind: str) -> Predictor:
+    extra = {"meta.json": ""}
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", FutureWarning)
+        module = torch.jit.load(path, map_location="cpu", _extra_files=extra)
+    meta = json.loads(extra["meta.json"])
+    return Predictor(kind, module, meta["mean"], meta["std"], path)
+
+def _load_checkpoint(path: str) -> Predictor:
+    checkpoint = torch.load(path, map_location="cpu", weights_only=True)
+    return Predictor("eager", _eager_model(checkpoint), checkpoint['mean'], checkpoint['std'], path)
+
+def _mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+# (checkpoint path, backend) -> ((loaded file, its mtime), Predictor)
+_loaded: Dict[Tuple[str, str], Tuple[Tuple[str, int], Predictor]] = {}
+_loaded_lock = threading.Lock()
+
+def clear_cache():
+    with _loaded_lock:
+        _loaded.clear()
+
+def load_predictor(city: str, model_dir: Optional[str] = None, backend: Optional[str] = None) -> Optional[Predictor]:
+    """
+    Loaded model for a city, or None if it has not been trained.
+    `backend` ("auto" or "eager", default INFERENCE_BACKEND) selects whether
+    exported artifacts are used.
+    """
+    backend = backend or INFERENCE_BACKEND
+    checkpoint = model_path(city, model_dir)
+    checkpoint_mtime = _mtime(checkpoint)
+    if checkpoint_mtime is None:
+        return None
+    chosen = (checkpoint, "eager", checkpoint_mtime)
+    if backend != "eager":
+        for kind in ARTIFACTS:
+            path = artifact_path(city, kind, model_dir)
+            mtime = _mtime(path)
+            # An artifact exported before the last training run is stale
+            if mtime is not None and mtime >= checkpoint_mtime:
+                chosen = (path, kind, mtime)
+                break
+
+    path, kind, mtime = chosen
+    key = (checkpoint, backend)
+    with _loaded_lock:
+        cached = _loaded.get(key)
+    if cached is not None and cached[0] == (path, mtime):
+        return cached[1]
+    predictor = _load_checkpoint(path) if kind == "eager" else _load_artifact(path, kind)
+    with _loaded_lock:
+        _loaded[key] = ((path, mtime), predictor)
+    return predictor
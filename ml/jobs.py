@@ -0,0 +1,141 @@
+"""
+Retraining queue for the API.
+
+Jobs (a list of cities, or every city with history) are queued and run one
+at a time by a background thread; each job trains its cities in parallel via
+`train_all`. Job state is kept in memory for the most recent jobs.
+Stopping cancels queued jobs and interrupts the running one, waiting at most
+TRAIN_STOP_TIMEOUT seconds, so shutting the API down never waits on a
+training run.
+"""
+import itertools
+import queue
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, List, Optional
+from rich.console import Console
+from config import TRAIN_WORKERS, TRAIN_STOP_TIMEOUT
+from database import SessionLocal
+
+console = Console()
+
+class TrainingQueue:
+    def __init__(self, session_factory: Callable = SessionLocal, workers: int = TRAIN_WORKERS,
+                 model_dir: Optional[str] = None, keep: int = 50):
+        self.session_factory = session_factory
+        self.workers = workers
+        self.model_dir = model_dir
+        self.keep = keep
+        self._jobs: "OrderedDict[str, dict]" = OrderedDict()
+        self._queue = queue.Queue()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._thread = None
+
+    def submit(self, cities: Optional[List[str]] = None, epochs: int = 100, force: bool = False) -> dict:
+        """Queue a job (an identical job still waiting is reused). Returns its state."""
+        with self._lock:
+            for job in self._jobs.values():
+                if job["status"] == "queued" and (job["cities"], job["epochs"], job["force"]) == (cities, epochs, force):
+                    return dict(job)
+            job = {
+                "id": str(next(self._ids)), "status": "queued", "cities": cities, "epochs": epochs, "force": force,
+                "submitted_at": time.time(), "started_at": None, "finished_at": None, "results": None, "error": None,
+            }
+            self._jobs[job["id"]] = job
+            while len(self._jobs) > self.keep:
+                oldest = next(iter(self._jobs))
+                if self._jobs[oldest]["status"] in ("queued", "running"):
+                    break
+                self._jobs.popitem(last=False)
+        self._queue.put(job["id"])
+        self.start()
+        return dict(job)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def jobs(self) -> List[dict]:
+        """Known jobs, newest first."""
+        with self._lock:
+            return [dict(job) for job in reversed(self._jobs.values())]
+
+    def _update(self, job_id: str, **fields):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def _run(self, job_id: str, cancel: threading.Event):
+        from ml.train import TrainingCancelled, train_all
+        job = self.get(job_id)
+        self._update(job_id, status="running", started_at=time.time())
+        db = self.session_factory()
+        try:
+            results = train_all(db, job["cities"], epochs=job["epochs"], workers=self.workers,
+                                force=job["force"], model_dir=self.model_dir, cancel=cancel)
+            summary = {city: {"status": r.status, "message": r.message} for city, r in results.items()}
+            self._update(job_id, status="done", results=summary, finished_at=time.time())
+        except TrainingCancelled:
+            self._update(job_id, status="failed", error="interrupted by shutdown", finished_at=time.time())
+        except Exception as e:
+            console.print(f"[red]Training job {job_id} failed: {e}[/red]")
+            self._update(job_id, status="failed", error=str(e), finished_at=time.time())
+        finally:
+            db.close()
+
+    def _loop(self, cancel: threading.Event):
+        while True:
+            job_id = self._queue.get()
+            if job_id is None:
+                return
+            self._run(job_id, cancel)
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                # A fresh event per thread: one abandoned by `stop` stays cancelled
+                self._cancel = threading.Event()
+                self._thread = threading.Thread(target=self._loop, args=(self._cancel,),
+                                                name="training-queue", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float = TRAIN_STOP_TIMEOUT):
+        """
+        Cancel queued jobs and interrupt the running one (marked failed),
+        waiting at most `timeout` seconds for it to let go.
+        """
+        self._cancel.set()
+        while True:
+            try:
+                job_id = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job_id is not None:
+                self._update(job_id, status="cancelled", finished_at=time.time())
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            thread.join(timeout)
+            if thread.is_alive():
+                # Still busy (e.g. reading data): abandon it, the thread is a daemon
+                with self._lock:
+                    for job in self._jobs.values():
+                        if job["status"] == "running":
+                            job.update(status="failed", error="abandoned at shutdown", finished_at=time.time())
+        self._thread = None
+
+    def wait(self, job_id: str, timeout: float = 60.0) -> Optional[dict]:
+        """Block until a job has finished (or `timeout`); returns its state."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            job = self.get(job_id)
+            if job is None or job["status"] in ("done", "failed", "cancelled"):
+                return job
+            time.sleep(0.05)
+        return self.get(job_id)
+
+training_queue = TrainingQueue()
@@ -11,10 +11,8 @@ class WeatherLSTM(nn.Module):
         self.fc = nn.Linear(hidden_size, output_size)
 
     def forward(self, x):
-        h0 = torch.zeros(self.num_layers, x.size(0), self.hidden_size).to(x.device)
-        c0 = torch.zeros(self.num_layers, x.size(0), self.hidden_size).to(x.device)
-        
-        out, _ = self.lstm(x, (h0, c0))
+        # Without an explicit state the LSTM starts from zeros, allocated on x's device
+        out, _ = self.lstm(x)
         # out: batch_size, seq_len, hidden_size
         out = self.fc(out[:, -1, :])
         return out
@@ -2,80 +2,203 @@ import torch
 import torch.nn as nn
 import torch.optim as optim
 import numpy as np
-from services.weather_service import get_history_stats
 from ml.model import WeatherLSTM
+from models import Location, WeatherRecord
+from services.weather_service import cache_key
+from services.metrics import timed_stage
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+import hashlib
+import multiprocessing
 import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
 
-def train_model(db: Session, city: str, epochs=100):
-    # 1. Prepare Data
-    records = get_history_stats(db, city, days=365)
-    if len(records) < 10:
-        return None, "Not enough data to train (need at least 10 records)"
+from config import MODEL_DIR, TRAIN_WORKERS, TRAIN_THREADS
+
+SEQ_LENGTH = 3
+HISTORY_DAYS = 365
+MIN_RECORDS = 10
+# Bump when training changes so existing checkpoints are retrained
+TRAINING_VERSION = "2"
+
+class TrainingCancelled(Exception):
+    """Raised by `train_all` when its cancel event is set."""
+
+class TrainResult(NamedTuple):
+    city: str
+    status: str                 # "trained", "skipped" (data unchanged), "insufficient" or "failed"
+    path: Optional[str] = None
+    message: str = ""
+
+def model_path(city: str, model_dir: Optional[str] = None) -> str:
+    return os.path.join(model_dir or MODEL_DIR, f"{cache_key(city)}_lstm.pth")
+
+def load_temperatures(db: Session, city: str, days: int = HISTORY_DAYS) -> np.ndarray:
+    """Temperatures from the last `days` days, oldest first."""
+    since = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=days)
+    stmt = (
+        select(WeatherRecord.temp_c)
+        .join(Location, WeatherRecord.location_id == Location.id)
+        .where(Location.city == cache_key(city), WeatherRecord.timestamp >= since, WeatherRecord.temp_c.isnot(None))
+        .order_by(WeatherRecord.timestamp, WeatherRecord.id)
+    )
+    return np.fromiter(db.execute(stmt).scalars(), dtype=np.float64)
+
+def data_fingerprint(temps: np.ndarray, epochs: int) -> str:
+    """Identifies the training input; a checkpoint with the same fingerprint needs no retraining."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{TRAINING_VERSION}:{SEQ_LENGTH}:{epochs}:".encode())
+    digest.update(np.ascontiguousarray(temps, dtype=np.float64).tobytes())
+    return digest.hexdigest()
 
-    temps = [r.temp_c for r in records]
-    temps.reverse() # Oldest first
-    
+def checkpoint_fingerprint(path: str) -> Optional[str]:
+    if not os.path.exists(path):
+        return None
+    try:
+        return torch.load(path, map_location="cpu", weights_only=True).get("data_hash")
+    except Exception:
+        return None
+
+def _fit(temps: np.ndarray, epochs: int, path: str, data_hash: str,
+         should_stop: Optional[Callable[[], bool]] = None) -> Tuple[str, float]:
+    """Train on `temps` and atomically write the checkpoint. Returns (path, final loss)."""
     # Normalize
-    mean_temp = np.mean(temps)
-    std_temp = np.std(temps)
+    mean_temp = float(np.mean(temps))
+    std_temp = float(np.std(temps)) or 1.0
     temps_norm = (temps - mean_temp) / std_temp
-    
-    # Create sequences
-    seq_length = 3
-    X, y = [], []
-    for i in range(len(temps_norm) - seq_length):
-        X.append(temps_norm[i:i+seq_length])
-        y.append(temps_norm[i+seq_length])
-        
-    X = torch.tensor(X, dtype=torch.float32).unsqueeze(2) # (batch, seq, feature)
-    y = torch.tensor(y, dtype=torch.float32).unsqueeze(1)
-    
-    # 2. Train
+
+    # Sliding windows of SEQ_LENGTH readings -> the next reading
+    windows = np.lib.stride_tricks.sliding_window_view(temps_norm[:-1], SEQ_LENGTH)
+    X = torch.tensor(windows, dtype=torch.float32).unsqueeze(2) # (batch, seq, feature)
+    y = torch.tensor(temps_norm[SEQ_LENGTH:], dtype=torch.float32).unsqueeze(1)
+
+    # Same data -> same model, whichever worker trains it
+    torch.manual_seed(0)
     model = WeatherLSTM()
     criterion = nn.MSELoss()
     optimizer = optim.Adam(model.parameters(), lr=0.01)
-    
+
     model.train()
     for epoch in range(epochs):
+        if should_stop is not None and should_stop():
+            raise TrainingCancelled("training cancelled")
         outputs = model(X)
         loss = criterion(outputs, y)
-        
+
         optimizer.zero_grad()
         loss.backward()
         optimizer.step()
-        
-    # 3. Save Model
-    os.makedirs("ml/models", exist_ok=True)
-    model_path = f"ml/models/{city.lower()}_lstm.pth"
+
+    # Write next to the target and rename, so readers never see a partial file
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
     torch.save({
         'model_state': model.state_dict(),
         'mean': mean_temp,
-        'std': std_temp
-    }, model_path)
-    
-    return model_path, f"Training complete. Loss: {loss.item():.4f}"
+        'std': std_temp,
+        'data_hash': data_hash,
+    }, tmp_path)
+    os.replace(tmp_path, path)
+    return path, loss.item()
+
+def _train_job(city: str, temps: np.ndarray, epochs: int, path: str, data_hash: str,
+               should_stop: Optional[Callable[[], bool]] = None) -> TrainResult:
+    try:
+        path, loss = _fit(temps, epochs, path, data_hash, should_stop)
+    except TrainingCancelled:
+        raise
+    except Exception as e:
+        return TrainResult(city, "failed", message=str(e))
+    return TrainResult(city, "trained", path, f"Training complete. Loss: {loss:.4f}")
+
+def _init_worker(threads: int):
+    # Each process gets its share of the cores instead of one torch thread per core
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+
+@contextmanager
+def _thread_limit(threads: int):
+    """Cap torch's intra-op threads in this process for the duration (restored afterwards)."""
+    previous = torch.get_num_threads()
+    torch.set_num_threads(max(1, min(threads, previous)))
+    try:
+        yield
+    finally:
+        torch.set_num_threads(previous)
+
+def train_model(db: Session, city: str, epochs=100, model_dir: Optional[str] = None):
+    """Train (always) and save the model for one city. Returns (path, message); path is None on failure."""
+    temps = load_temperatures(db, city)
+    if len(temps) < MIN_RECORDS:
+        return None, "Not enough data to train (need at least 10 records)"
+    result = _train_job(city, temps, epochs, model_path(city, model_dir), data_fingerprint(temps, epochs))
+    return result.path, result.message
+
+def list_trainable_cities(db: Session) -> List[str]:
+    """Cities with any recorded history."""
+    stmt = select(Location.city).where(Location.id.in_(select(WeatherRecord.location_id).distinct())).order_by(Location.city)
+    return list(db.execute(stmt).scalars())
+
+def train_all(db: Session, cities: Optional[Iterable[str]] = None, epochs: int = 100, workers: int = TRAIN_WORKERS,
+              force: bool = False, model_dir: Optional[str] = None,
+              cancel: Optional[threading.Event] = None) -> Dict[str, TrainResult]:
+    """
+    Train models for many cities (default: every city with history).
 
+    Data is read here; cities whose checkpoint was trained on identical data
+    are skipped unless `force`. The rest train in a process pool with the
+    cores split evenly between workers (torch threads per process), or in
+    this process with at most TRAIN_THREADS torch threads when `workers` is 1.
+    Setting `cancel` stops training within about an epoch (pool workers are
+    terminated) and raises TrainingCancelled.
+    """
+    if epochs < 1:
+        raise ValueError("epochs must be at least 1")
+    cities = list(cities) if cities is not None else list_trainable_cities(db)
+    results, jobs = {}, []
+    for city in cities:
+        temps = load_temperatures(db, city)
+        if len(temps) < MIN_RECORDS:
+            results[city] = TrainResult(city, "insufficient", message=f"Not enough data to train ({len(temps)} records)")
+            continue
+        path = model_path(city, model_dir)
+        data_hash = data_fingerprint(temps, epochs)
+        if not force and checkpoint_fingerprint(path) == data_hash:
+            results[city] = TrainResult(city, "skipped", path, "Data unchanged since the last checkpoint")
+            continue
+        jobs.append((city, temps, epochs, path, data_hash))
+
+    # Longest series first so the slowest jobs don't start last
+    jobs.sort(key=lambda job: -len(job[1]))
+    workers = max(1, min(workers, len(jobs)))
+    should_stop = cancel.is_set if cancel is not None else None
+    if workers > 1:
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        # Fresh interpreters: forking a process that already ran torch can deadlock its thread pools
+        context = multiprocessing.get_context("spawn")
+        # Leaving the block terminates the workers, also when cancelled mid-run
+        with context.Pool(workers, initializer=_init_worker, initargs=(threads,)) as pool:
+            pending = pool.starmap_async(_train_job, jobs)
+            while not pending.ready():
+                if should_stop is not None and should_stop():
+                    raise TrainingCancelled("training cancelled")
+                pending.wait(0.2)
+            for result in pending.get():
+                results[result.city] = result
+    else:
+        with _thread_limit(TRAIN_THREADS):
+            for job in jobs:
+                results[job[0]] = _train_job(*job, should_stop=should_stop)
+    return {city: results[city] for city in cities}
+
+@timed_stage("predict")
 def predict_next_day(city: str, recent_temps: list):
-    """Load model and predict next value."""
-    model_path = f"ml/models/{city.lower()}_lstm.pth"
-    if not os.path.exists(model_path):
+    """Predict the next value with the city's model (kept loaded; exported artifacts preferred, see ml/inference.py)."""
+    from ml.inference import load_predictor
+    predictor = load_predictor(city)
+    if predictor is None:
         return None
-        
-    checkpoint = torch.load(model_path)
-    model = WeatherLSTM()
-    model.load_state_dict(checkpoint['model_state'])
-    model.eval()
-    
-    mean = checkpoint['mean']
-    std = checkpoint['std']
-    
-    # Normalize input
-    input_seq = (np.array(recent_temps) - mean) / std
-    input_tensor = torch.tensor(input_seq, dtype=torch.float32).unsqueeze(0).unsqueeze(2)
-    
-    with torch.no_grad():
-        pred_norm = model(input_tensor)
-        
-    pred_temp = (pred_norm.item() * std) + mean
-    return pred_temp
+    return float(predictor.predict([recent_temps])[0])
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Index, Text
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from database import Base
@@ -31,3 +31,15 @@ class WeatherRecord(Base):
     # For comparisons and history, these fields are most important
     
     location = relationship("Location", back_populates="records")
+
+    # Per-city history in (timestamp, id) order: range scans and keyset pages (services/history_query.py)
+    __table_args__ = (Index("ix_weather_records_location_time", "location_id", "timestamp", "id"),)
+
+class BackfillState(Base):
+    """Contiguous date range of archive data already loaded for a location (see services/backfill.py)."""
+    __tablename__ = "backfill_state"
+
+    location_id = Column(Integer, ForeignKey("locations.id"), primary_key=True)
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date, nullable=False)  # high-water mark, inclusive
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
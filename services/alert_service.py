@@ -1,47 +1,58 @@
 from apscheduler.schedulers.background import BackgroundScheduler
 from sqlalchemy.orm import Session
-from database import SessionLocal
-from services.weather_service import get_weather_from_wttr, save_weather_data
+from services.weather_service import get_weather_from_wttr, save_weather_data, extract_record_fields
 from rich.console import Console
+from services.metrics import timed_stage
 import atexit
 
 console = Console()
 scheduler = BackgroundScheduler()
 
+@timed_stage("alert_eval")
+def evaluate_condition(data: dict, condition: str):
+    """
+    Evaluate a condition string against a weather payload.
+    Returns (triggered, metric, value), or None if the condition is malformed.
+    """
+    fields = extract_record_fields(data)
+    
+    # Parse values
+    temp = fields['temp_c']
+    humidity = fields['humidity']
+    wind = fields['wind_speed_kmph']
+    
+    # Parse condition string
+    parts = condition.split()
+    if len(parts) != 3:
+        return None
+        
+    metric, operator, limit = parts
+    limit = float(limit)
+    
+    value = 0
+    if metric == "temp": value = temp
+    elif metric == "humidity": value = humidity
+    elif metric == "wind": value = wind
+    
+    triggered = False
+    if operator == ">" and value > limit: triggered = True
+    elif operator == "<" and value < limit: triggered = True
+    elif operator == "==" and value == limit: triggered = True
+    return triggered, metric, value
+
 def check_weather_condition(city: str, condition: str):
     """
     Check if a weather condition is met for a city.
     Condition format: "temp > 30", "humidity < 50", "wind > 20"
     """
-    db = SessionLocal()
     try:
         data = get_weather_from_wttr(city)
         if data:
-            save_weather_data(db, city, data)
-            current = data['current_condition'][0]
-            
-            # Parse values
-            temp = float(current['temp_C'])
-            humidity = float(current['humidity'])
-            wind = float(current['windspeedKmph'])
-            
-            # Parse condition string
-            parts = condition.split()
-            if len(parts) != 3:
+            save_weather_data(None, city, data, skip_unchanged=True, defer=True)
+            result = evaluate_condition(data, condition)
+            if result is None:
                 return
-                
-            metric, operator, limit = parts
-            limit = float(limit)
-            
-            value = 0
-            if metric == "temp": value = temp
-            elif metric == "humidity": value = humidity
-            elif metric == "wind": value = wind
-            
-            triggered = False
-            if operator == ">" and value > limit: triggered = True
-            elif operator == "<" and value < limit: triggered = True
-            elif operator == "==" and value == limit: triggered = True
+            triggered, metric, value = result
             
             if triggered:
                 # In a real app, send email here. For CLI, we print to console/log
@@ -52,8 +63,6 @@ def check_weather_condition(city: str, condition: str):
 
     except Exception as e:
         print(f"Error checking alert: {e}")
-    finally:
-        db.close()
 
 def start_scheduler():
     if not scheduler.running:
@@ -0,0 +1,120 @@
+"""
+Vectorized history analytics.
+
+A city's history is loaded with one SQL query into a columnar DataFrame
+(sorted by timestamp) and kept per (database, city), for the
+ANALYTICS_MAX_FRAMES most recently used cities. Later calls only fetch rows
+newer than the last id seen. Analyses are cached by (city, window, latest record
+id), so repeating a request costs one `max(id)` query.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Dict, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, select
+
+from config import ANALYTICS_MAX_FRAMES, ANALYTICS_FRAME_TTL
+from models import Location, WeatherRecord
+from services.cache import TTLCache
+from services.weather_service import cache_key
+
+METRICS = ("temp_c", "humidity", "wind_speed_kmph")
+COLUMNS = ("id", "timestamp") + METRICS + ("temp_f", "condition_text")
+
+class HistoryAnalysis(NamedTuple):
+    frame: pd.DataFrame        # records in the window, oldest first, plus rolling/anomaly columns
+    daily: pd.DataFrame        # per-day min/max/mean temperature and record count
+    summary: Dict[str, Dict[str, float]]  # metric -> count/mean/min/max/std
+    latest_id: int
+
+# (engine url, city) -> (latest id, full history frame)
+_frames = TTLCache(ttl=ANALYTICS_FRAME_TTL, max_entries=ANALYTICS_MAX_FRAMES)
+# (engine url, city, days, rolling, latest id) -> HistoryAnalysis; the TTL bounds
+# how far the "last N days" window can drift while no new records arrive
+_results = TTLCache(ttl=300, max_entries=256)
+
+def clear_cache():
+    _frames.clear()
+    _results.clear()
+
+def _location_id(city: str):
+    return select(Location.id).where(Location.city == cache_key(city)).scalar_subquery()
+
+def latest_record_id(db, city: str) -> int:
+    """Highest WeatherRecord id for a city (0 when it has no history)."""
+    stmt = select(func.max(WeatherRecord.id)).where(WeatherRecord.location_id == _location_id(city))
+    return db.execute(stmt).scalar() or 0
+
+def _read_records(db, city: str, after_id: int = 0) -> pd.DataFrame:
+    stmt = (
+        select(*(getattr(WeatherRecord, column) for column in COLUMNS))
+        .where(WeatherRecord.location_id == _location_id(city), WeatherRecord.id > after_id)
+        .order_by(WeatherRecord.id)
+    )
+    rows = db.execute(stmt).all()
+    frame = pd.DataFrame.from_records(rows, columns=list(COLUMNS))
+    frame["timestamp"] = pd.to_datetime(frame["timestamp"], utc=True)
+    for column in METRICS + ("temp_f",):
+        frame[column] = frame[column].astype(np.float64)
+    return frame
+
+def load_history(db, city: str) -> Tuple[int, pd.DataFrame]:
+    """(latest id, full history sorted by timestamp) for a city, fetching only new rows."""
+    key = (str(db.get_bind().url), cache_key(city))
+    latest = latest_record_id(db, city)
+    cached = _frames.get(key)
+    if cached is not None and cached[0] == latest:
+        return cached
+    if cached is not None and cached[0] < latest:
+        new_rows = _read_records(db, city, after_id=cached[0])
+        frame = pd.concat([cached[1], new_rows], ignore_index=True) if len(cached[1]) else new_rows
+    else:
+        # First load, or rows were removed: start over
+        frame = _read_records(db, city)
+    frame = frame.sort_values(["timestamp", "id"], kind="stable", ignore_index=True)
+    _frames.set(key, (latest, frame))
+    return latest, frame
+
+def climatology(history: pd.DataFrame) -> pd.Series:
+    """Mean temperature per (month, hour of day) over a city's whole history."""
+    stamps = history["timestamp"].dt
+    return history["temp_c"].groupby([stamps.month, stamps.hour]).mean()
+
+def summarize(frame: pd.DataFrame) -> Dict[str, Dict[str, float]]:
+    stats = frame[list(METRICS)].agg(["count", "mean", "min", "max", "std"])
+    return {
+        metric: {name: (float(value) if pd.notna(value) else None) for name, value in stats[metric].items()}
+        for metric in METRICS
+    }
+
+def _analyze(history: pd.DataFrame, days: int, rolling: str, latest: int) -> HistoryAnalysis:
+    since = pd.Timestamp(datetime.now(timezone.utc) - timedelta(days=days))
+    start = int(history["timestamp"].searchsorted(since, side="left")) if len(history) else 0
+    frame = history.iloc[start:].copy()
+
+    temps = frame.set_index("timestamp")["temp_c"]
+    frame["temp_rolling"] = temps.rolling(rolling, min_periods=1).mean().to_numpy()
+
+    normals = climatology(history)
+    stamps = frame["timestamp"].dt
+    index = pd.MultiIndex.from_arrays([stamps.month, stamps.hour])
+    frame["temp_anomaly"] = frame["temp_c"].to_numpy() - normals.reindex(index).to_numpy()
+
+    daily = temps.resample("D").agg(["min", "max", "mean", "count"])
+    daily = daily[daily["count"] > 0]
+    return HistoryAnalysis(frame, daily, summarize(frame), latest)
+
+def analyze_history(db, city: str, days: int = 30, rolling: str = "24h") -> Optional[HistoryAnalysis]:
+    """
+    Rolling mean, daily min/max, anomalies vs. the city's (month, hour)
+    climatology and per-metric summaries for the last `days` days.
+    Returns None when the city has no records in the window.
+    """
+    latest, history = load_history(db, city)
+    key = (str(db.get_bind().url), cache_key(city), days, rolling, latest)
+    analysis = _results.get(key)
+    if analysis is None:
+        analysis = _analyze(history, days, rolling, latest)
+        _results.set(key, analysis)
+    return analysis if len(analysis.frame) else None
@@ -1,42 +1,83 @@
-import matplotlib.pyplot as plt
-import seaborn as sns
-import pandas as pd
-from sqlalchemy.orm import Session
-from services.weather_service import get_history_stats
+import glob
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Optional
+from sqlalchemy.orm import Session
+from config import CHARTS_DIR, CHART_WORKERS, CHART_PRUNE_GRACE
+from services.analytics_engine import HistoryAnalysis, analyze_history
+from services.chart_renderer import TrendChart, content_hash, render_trend
+from services.weather_service import cache_key
+
+def trend_chart(analysis: HistoryAnalysis, city: str, days: int) -> TrendChart:
+    """Plain-array chart input for an analysis (picklable, hashable by content)."""
+    frame, daily = analysis.frame, analysis.daily
+    return TrendChart(
+        title=f"Temperature Trend - {city.title()} (Last {days} Days)",
+        times=frame["timestamp"].dt.tz_convert(None).to_numpy(),
+        temps=frame["temp_c"].to_numpy(),
+        rolling=frame["temp_rolling"].to_numpy(),
+        days=daily.index.tz_convert(None).to_numpy(),
+        day_min=daily["min"].to_numpy(),
+        day_max=daily["max"].to_numpy(),
+    )
+
+def _chart_path(output_dir: str, city: str, days: int, digest: str) -> str:
+    return os.path.join(output_dir, f"{cache_key(city).replace(' ', '_')}_trend_{days}d_{digest}.png")
 
-def generate_temperature_trend(db: Session, city: str, days: int = 30, output_dir: str = "plots"):
-    """Generate and save a temperature trend chart."""
-    records = get_history_stats(db, city, days)
-    
-    if not records:
-        return None
+def _prune(path: str):
+    """
+    Remove other renders of the same chart (same city and window, other
+    data) once `path` has been current for CHART_PRUNE_GRACE seconds: a
+    concurrent request may have resolved an older render just before `path`
+    appeared and still be serving it.
+    """
+    try:
+        if time.time() - os.path.getmtime(path) < CHART_PRUNE_GRACE:
+            return
+    except OSError:
+        return
+    prefix = path.rsplit("_", 1)[0]
+    for old in glob.glob(glob.escape(prefix) + "_*.png"):
+        if old != path:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
 
-    # Prepare data
-    data = []
-    for r in records:
-        data.append({
-            "Date": r.timestamp,
-            "Temp (°C)": r.temp_c
-        })
-    
-    df = pd.DataFrame(data)
-    
-    # Plotting
-    plt.figure(figsize=(10, 6))
-    sns.set_theme(style="darkgrid")
-    
-    sns.lineplot(data=df, x="Date", y="Temp (°C)", marker="o", color="coral")
-    
-    plt.title(f"Temperature Trend - {city.title()} (Last {days} Days)")
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    
-    # Save
+def generate_temperature_trends(db: Session, cities: Iterable[str], days: int = 30, output_dir: Optional[str] = None,
+                                workers: int = CHART_WORKERS) -> Dict[str, Optional[str]]:
+    """
+    Trend charts for several cities: {city: PNG path, or None without data}.
+
+    Analyses run here (they need the DB session); charts whose data hash
+    already has a file are reused, the rest are rendered in a process pool.
+    """
+    output_dir = output_dir or CHARTS_DIR
     os.makedirs(output_dir, exist_ok=True)
-    filename = f"{city.lower()}_trend_{days}d.png"
-    output_path = os.path.join(output_dir, filename)
-    plt.savefig(output_path)
-    plt.close()
-    
-    return output_path
+    paths, pending = {}, {}
+    for city in cities:
+        analysis = analyze_history(db, city, days)
+        if analysis is None:
+            paths[city] = None
+            continue
+        chart = trend_chart(analysis, city, days)
+        path = _chart_path(output_dir, city, days, content_hash(chart))
+        paths[city] = path
+        if not os.path.exists(path):
+            pending[path] = chart
+
+    if len(pending) > 1 and workers > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending))) as pool:
+            list(pool.map(render_trend, pending.values(), pending.keys()))
+    else:
+        for path, chart in pending.items():
+            render_trend(chart, path)
+    # Reused charts too: superseded renders left within the grace period go on a later call
+    for path in set(paths.values()) - {None}:
+        _prune(path)
+    return paths
+
+def generate_temperature_trend(db: Session, city: str, days: int = 30, output_dir: Optional[str] = None) -> Optional[str]:
+    """Generate and save a temperature trend chart (readings, rolling mean and daily range)."""
+    return generate_temperature_trends(db, [city], days, output_dir)[city]
@@ -0,0 +1,65 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib.parse import quote
+from rich.console import Console
+from typing import Optional, Dict, Any, List
+from config import API_BASE_URL, API_POOL_SIZE
+from services.forecast_table import from_builtins
+
+console = Console()
+
+# One pooled keep-alive session per process, shared by every Streamlit rerun
+_session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=1, pool_maxsize=API_POOL_SIZE)
+_session.mount("http://", _adapter)
+_session.mount("https://", _adapter)
+
+def get_rich_weather_data(city: str, profile: str = "full", timeout: int = 15) -> Optional[Dict[str, Any]]:
+    """
+    Fetch the unified weather payload from the WeatherNow API service.
+    Drop-in replacement for `services.weather_service.get_rich_weather_data`.
+    Returns None when the city is unknown or the API is unreachable.
+    """
+    url = f"{API_BASE_URL.rstrip('/')}/weather/{quote(city, safe='')}/{profile}"
+    try:
+        response = _session.get(url, timeout=timeout)
+        if response.status_code == 404:
+            console.print(f"[yellow]City '{city}' not found. Please check spelling.[/yellow]")
+            return None
+        response.raise_for_status()
+        return from_builtins(response.json())
+    except requests.RequestException as e:
+        console.print(f"[red]WeatherNow API request failed: {str(e)}[/red]")
+        return None
+
+def nearest_location(lat: float, lon: float, timeout: int = 5) -> Optional[Dict[str, Any]]:
+    """Known location near a position (see `services.weather_service.nearest_location`), or None."""
+    try:
+        response = _session.get(f"{API_BASE_URL.rstrip('/')}/coords/nearest", params={"lat": lat, "lon": lon}, timeout=timeout)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.json()
+    except requests.RequestException as e:
+        console.print(f"[yellow]Nearest-location lookup failed: {str(e)}[/yellow]")
+        return None
+
+def add_warm_cities(cities: List[str], timeout: int = 5) -> bool:
+    """Ask the API's cache warmer to keep these cities (e.g. favorites) warm."""
+    try:
+        response = _session.post(f"{API_BASE_URL.rstrip('/')}/warm", json=list(cities), timeout=timeout)
+        response.raise_for_status()
+        return True
+    except requests.RequestException as e:
+        console.print(f"[yellow]Could not register cities for warming: {str(e)}[/yellow]")
+        return False
+
+def search_cities(text: str, limit: int = 10, timeout: int = 5) -> List[Dict[str, Any]]:
+    """City suggestions from the API's offline gazetteer (see `services.gazetteer.search_cities`)."""
+    try:
+        response = _session.get(f"{API_BASE_URL.rstrip('/')}/cities/search", params={"q": text, "limit": limit}, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+    except requests.RequestException as e:
+        console.print(f"[yellow]City search failed: {str(e)}[/yellow]")
+        return []
@@ -0,0 +1,268 @@
+"""
+Historical backfill from the Open-Meteo archive API.
+
+For every city the requested date range is reduced to the part not yet
+loaded (per-location high-water marks in `BackfillState`) and split into
+chunks of `BACKFILL_CHUNK_DAYS`. Chunks are fetched concurrently by a thread
+pool behind a shared rate limiter. They are written in order by a single
+writer, which bulk-inserts `WeatherRecord` rows in batches and moves the
+high-water mark in the same transaction. An interrupted run therefore
+resumes exactly where it stopped.
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from sqlalchemy import insert
+
+from config import (
+    ARCHIVE_URL, BACKFILL_CHUNK_DAYS, BACKFILL_CONCURRENCY, BACKFILL_RATE_LIMIT,
+    BACKFILL_BATCH_SIZE, BACKFILL_LAG_DAYS,
+)
+from services import metrics, weather_service
+from services.openmeteo_schema import ArchiveResponse
+from services.resilience import RateLimiter
+
+HOURLY_VARIABLES = ("temperature_2m", "relative_humidity_2m", "wind_speed_10m", "weather_code")
+SOURCE = "open-meteo-archive"
+
+DateRange = Tuple[date, date]  # inclusive
+
+@dataclass
+class BackfillResult:
+    city: str
+    rows: int = 0
+    requests: int = 0
+    loaded: Optional[DateRange] = None  # covered range after the run
+    error: Optional[str] = None
+    ranges: List[DateRange] = field(default_factory=list)  # ranges fetched this run
+    pending_from: Optional[date] = None  # first day the archive had not filled yet
+
+def default_range(days: int, today: Optional[date] = None) -> DateRange:
+    """The last `days` days available in the archive."""
+    end = (today or date.today()) - timedelta(days=BACKFILL_LAG_DAYS)
+    return end - timedelta(days=days - 1), end
+
+def missing_ranges(wanted: DateRange, loaded: Optional[DateRange]) -> List[DateRange]:
+    """
+    Ranges to fetch so that the contiguous `loaded` range grows to cover
+    `wanted`. The range after the high-water mark comes first (oldest to
+    newest), then the range before the loaded start (newest to oldest), so
+    each stays contiguous with what is already stored. A `wanted` window
+    that does not touch `loaded` also pulls in the gap between them:
+    `BackfillState` can only describe one span.
+    """
+    start, end = wanted
+    if loaded is None:
+        return [wanted] if start <= end else []
+    ranges = []
+    if end > loaded[1]:
+        ranges.append((loaded[1] + timedelta(days=1), end))
+    if start < loaded[0]:
+        ranges.append((start, loaded[0] - timedelta(days=1)))
+    return ranges
+
+def chunk_range(span: DateRange, chunk_days: int, backwards: bool = False) -> List[DateRange]:
+    start, end = span
+    chunks = []
+    cursor = start
+    while cursor <= end:
+        chunk_end = min(end, cursor + timedelta(days=chunk_days - 1))
+        chunks.append((cursor, chunk_end))
+        cursor = chunk_end + timedelta(days=1)
+    return chunks[::-1] if backwards else chunks
+
+def archive_url(lat: float, lon: float, span: DateRange, base_url: Optional[str] = None) -> str:
+    query = {
+        "latitude": lat, "longitude": lon,
+        "start_date": span[0].isoformat(), "end_date": span[1].isoformat(),
+        "hourly": ",".join(HOURLY_VARIABLES), "timezone": "GMT",
+    }
+    return f"{base_url or ARCHIVE_URL}?{urlencode(query, safe=',')}"
+
+def last_complete_day(payload: dict, span: DateRange) -> Optional[date]:
+    """
+    Last day of `span` such that every hour from the start of `span` up to
+    the end of that day has a temperature, or None if the first day is
+    incomplete. The archive lags a few days and returns nulls for hours it
+    has not filled yet.
+    """
+    hourly = payload.get("hourly") or {}
+    times = hourly.get("time") or []
+    temps = hourly.get("temperature_2m") or [None] * len(times)
+    hours: Dict[date, int] = {}
+    gaps = set()
+    for stamp, temp in zip(times, temps):
+        day = datetime.fromisoformat(stamp).date()
+        hours[day] = hours.get(day, 0) + 1
+        if temp is None:
+            gaps.add(day)
+    last, day = None, span[0]
+    while day <= span[1] and hours.get(day, 0) >= 24 and day not in gaps:
+        last, day = day, day + timedelta(days=1)
+    return last
+
+def archive_rows(payload: dict, location_id: int, step_hours: int = 1, until: Optional[date] = None) -> List[dict]:
+    """WeatherRecord rows (dicts for a Core bulk insert) from an archive response, up to `until` inclusive."""
+    hourly = payload.get("hourly") or {}
+    times = hourly.get("time") or []
+    temps = hourly.get("temperature_2m") or [None] * len(times)
+    humidity = hourly.get("relative_humidity_2m") or [None] * len(times)
+    wind = hourly.get("wind_speed_10m") or [None] * len(times)
+    codes = hourly.get("weather_code") or [None] * len(times)
+    rows = []
+    for i in range(0, len(times), step_hours):
+        temp = temps[i]
+        if temp is None:
+            # Hours the archive has not filled yet
+            continue
+        timestamp = datetime.fromisoformat(times[i])
+        if until is not None and timestamp.date() > until:
+            break
+        rows.append({
+            "location_id": location_id,
+            "timestamp": timestamp,
+            "temp_c": temp,
+            "temp_f": round(temp * 9 / 5 + 32, 1),
+            "humidity": humidity[i],
+            "wind_speed_kmph": wind[i],
+            "condition_text": weather_service.get_desc_from_code(codes[i]),
+            "source": SOURCE,
+        })
+    return rows
+
+class Backfiller:
+    """
+    Loads archive history for many cities.
+
+    `fetch` defaults to the shared retrying/circuit-breaking upstream client;
+    `rate_limit` is in requests per second across all workers (0 disables).
+    """
+
+    def __init__(self, db, chunk_days: int = BACKFILL_CHUNK_DAYS, concurrency: int = BACKFILL_CONCURRENCY,
+                 rate_limit: float = BACKFILL_RATE_LIMIT, batch_size: int = BACKFILL_BATCH_SIZE,
+                 step_hours: int = 1, fetch: Optional[Callable[[str], Optional[dict]]] = None,
+                 geocode: Optional[Callable[[str], Optional[dict]]] = None):
+        self.db = db
+        self.chunk_days = max(1, chunk_days)
+        self.concurrency = max(1, concurrency)
+        self.batch_size = max(1, batch_size)
+        self.step_hours = max(1, step_hours)
+        self.limiter = RateLimiter(rate_limit)
+        self.fetch = fetch or self._fetch_archive
+        self.geocode = geocode or weather_service.geocode_city
+
+    @staticmethod
+    def _fetch_archive(url: str) -> Optional[dict]:
+        # Each chunk URL is requested once, so skip conditional-GET bookkeeping
+        return weather_service.make_api_request_with_retry(url, timeout=30, schema=ArchiveResponse, conditional=False)
+
+    def _fetch_chunk(self, url: str) -> Optional[dict]:
+        self.limiter.acquire()
+        with metrics.timed("archive"):
+            return self.fetch(url)
+
+    def _plan(self, city: str, wanted: DateRange) -> Tuple[BackfillResult, Optional[int], List[Tuple[DateRange, bool, str]]]:
+        """Result stub, location id and (chunk, backwards, url) jobs for one city."""
+        from models import BackfillState
+        result = BackfillResult(city)
+        loc = self.geocode(city)
+        if loc is None:
+            result.error = "not found"
+            return result, None, []
+        location = weather_service.get_or_create_location(self.db, city, loc.get("country"))
+        self.db.commit()
+        state = self.db.get(BackfillState, location.id)
+        loaded = (state.start_date, state.end_date) if state is not None else None
+        result.loaded = loaded
+        jobs = []
+        for span in missing_ranges(wanted, loaded):
+            backwards = loaded is not None and span[1] < loaded[0]
+            result.ranges.append(span)
+            for chunk in chunk_range(span, self.chunk_days, backwards):
+                jobs.append((chunk, backwards, archive_url(loc["latitude"], loc["longitude"], chunk)))
+        return result, location.id, jobs
+
+    def _write(self, result: BackfillResult, location_id: int, chunk: DateRange, backwards: bool,
+               payload: dict) -> bool:
+        """
+        Insert one chunk's rows and advance the high-water mark in the same
+        transaction. Only the days the archive has completely filled count:
+        a newer chunk stops at its last complete day, an older chunk (which
+        must join the loaded range at its end) is stored whole or not at all.
+        False when part of the chunk is still missing, so it is fetched again
+        by a later run.
+        """
+        from models import BackfillState, WeatherRecord
+        complete = last_complete_day(payload, chunk)
+        partial = complete != chunk[1]
+        if partial:
+            result.pending_from = chunk[0] if complete is None else complete + timedelta(days=1)
+            if complete is None or backwards:
+                return False
+            chunk = (chunk[0], complete)
+        rows = archive_rows(payload, location_id, self.step_hours, until=chunk[1])
+        with metrics.timed("backfill_write"):
+            for i in range(0, len(rows), self.batch_size):
+                self.db.execute(insert(WeatherRecord), rows[i:i + self.batch_size])
+            state = self.db.get(BackfillState, location_id)
+            if state is None:
+                self.db.add(BackfillState(location_id=location_id, start_date=chunk[0], end_date=chunk[1]))
+            else:
+                state.start_date = min(state.start_date, chunk[0])
+                state.end_date = max(state.end_date, chunk[1])
+            self.db.commit()
+        result.rows += len(rows)
+        result.loaded = (min(chunk[0], result.loaded[0]), max(chunk[1], result.loaded[1])) if result.loaded else chunk
+        metrics.registry.inc(metrics.BACKFILL_ROWS, len(rows))
+        return not partial
+
+    def run(self, cities: Iterable[str], wanted: DateRange,
+            progress: Optional[Callable[[BackfillResult], None]] = None) -> Dict[str, BackfillResult]:
+        """
+        Backfill `wanted` for every city. Chunk downloads overlap (up to
+        `concurrency` in flight, plus a small read-ahead) while writes stay
+        in chunk order, so a failed chunk stops that city at a clean boundary.
+        A chunk the archive has only partly filled stops that direction (newer
+        or older) for the city, leaving the rest for a later run.
+        """
+        results: Dict[str, BackfillResult] = {}
+        window = self.concurrency * 2
+        stopped = set()  # (city, backwards) directions that hit an unfilled chunk
+
+        def jobs() -> Iterator[Tuple[BackfillResult, int, DateRange, bool, str, bool]]:
+            for city in cities:
+                result, location_id, planned = self._plan(city, wanted)
+                results[city] = result
+                if not planned and progress:
+                    progress(result)
+                for index, (chunk, backwards, url) in enumerate(planned):
+                    yield result, location_id, chunk, backwards, url, index == len(planned) - 1
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="backfill") as pool:
+            in_flight = deque()
+            pending = jobs()
+            exhausted = False
+            while True:
+                while not exhausted and len(in_flight) < window:
+                    job = next(pending, None)
+                    if job is None:
+                        exhausted = True
+                        break
+                    in_flight.append((job, pool.submit(self._fetch_chunk, job[4])))
+                if not in_flight:
+                    break
+                (result, location_id, chunk, backwards, url, last), future = in_flight.popleft()
+                if result.error is None and (result.city, backwards) not in stopped:
+                    result.requests += 1
+                    payload = future.result()
+                    if payload is None:
+                        result.error = f"archive request failed for {chunk[0]}..{chunk[1]}"
+                    elif not self._write(result, location_id, chunk, backwards, payload):
+                        stopped.add((result.city, backwards))
+                if last and progress:
+                    progress(result)
+        return results
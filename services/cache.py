@@ -0,0 +1,63 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class TTLCache:
+    """
+    Thread-safe in-process cache with per-entry expiry and LRU eviction.
+
+    Expired entries stay until evicted so `get_stale` can serve them while
+    upstream is unavailable.
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value if it is still fresh, else None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def get_stale(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value even if it has expired (None only when evicted/missing)."""
+        with self._lock:
+            entry = self._entries.get(key)
+        return None if entry is None else entry[1]
+
+    def expires_in(self, key: Hashable) -> float:
+        """Seconds until `key` expires (<= 0 when missing or already stale)."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return 0.0
+        return entry[0] - time.monotonic()
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key) is not None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,134 @@
+import threading
+import time
+from rich.console import Console
+from typing import Callable, Iterable, List, Optional
+from config import (
+    WARMER_INTERVAL, WARMER_BUDGET, WARMER_TOP_VIEWED, WARMER_MAX_FAVORITES, WARMER_FAVORITE_TTL, DEFAULT_FAVORITES,
+)
+from services import weather_service
+from services.city_catalog import ALL_CITIES
+
+console = Console()
+
+_CURATED = {city.lower(): city for city in ALL_CITIES}
+
+class CacheWarmer:
+    """
+    Background thread that keeps the weather cache warm.
+
+    Every `interval` seconds it walks favorites (in the order they were saved)
+    followed by the most-viewed curated cities, and refreshes those whose cache
+    entry would expire before the next cycle. At most `budget` upstream
+    refreshes happen per cycle so warming never floods Open-Meteo.
+
+    Registered favorites are bounded: one not registered again or viewed for
+    `favorite_ttl` seconds is dropped, and beyond `max_favorites` the least
+    recently requested goes first. Pinned favorites (the defaults) stay.
+    """
+
+    def __init__(
+        self,
+        refresh: Callable[[str], Optional[dict]] = weather_service.refresh_rich_weather_data,
+        expires_in: Optional[Callable[[str], float]] = None,
+        interval: int = WARMER_INTERVAL,
+        budget: int = WARMER_BUDGET,
+        top_viewed: int = WARMER_TOP_VIEWED,
+        max_favorites: int = WARMER_MAX_FAVORITES,
+        favorite_ttl: float = WARMER_FAVORITE_TTL,
+    ):
+        self.refresh = refresh
+        # Without a way to inspect the cache (e.g. API mode) every city is refreshed
+        self.expires_in = expires_in or (lambda city: 0.0)
+        self.interval = interval
+        self.budget = budget
+        self.top_viewed = top_viewed
+        self.max_favorites = max_favorites
+        self.favorite_ttl = favorite_ttl
+        # cache key -> [city, last requested (monotonic), view count then], in the order saved
+        self._favorites = {}
+        self._pinned = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add_favorites(self, cities: Iterable[str], pinned: bool = False):
+        """Register (or re-register) favorites; `pinned` ones never expire or get evicted."""
+        now = time.monotonic()
+        with self._lock:
+            for city in cities:
+                key = weather_service.cache_key(city)
+                entry = self._favorites.setdefault(key, [city, now, 0])
+                entry[1], entry[2] = now, weather_service.view_counts[key]
+                if pinned:
+                    self._pinned.add(key)
+            self._evict(now)
+
+    def _evict(self, now: float):
+        """Drop expired favorites, then the least recently requested beyond `max_favorites`."""
+        for key, entry in list(self._favorites.items()):
+            views = weather_service.view_counts[key]
+            if views != entry[2]:
+                # Viewed since the last check: counts as a request
+                entry[1], entry[2] = now, views
+            elif key not in self._pinned and now - entry[1] > self.favorite_ttl:
+                del self._favorites[key]
+        excess = len(self._favorites) - self.max_favorites
+        if excess > 0:
+            unpinned = [key for key in self._favorites if key not in self._pinned]
+            for key in sorted(unpinned, key=lambda key: self._favorites[key][1])[:excess]:
+                del self._favorites[key]
+
+    def priority(self) -> List[str]:
+        """Cities to warm, highest priority first, without duplicates."""
+        with self._lock:
+            self._evict(time.monotonic())
+            order = {key: entry[0] for key, entry in self._favorites.items()}
+        viewed = [
+            _CURATED[key] for key, _ in weather_service.view_counts.most_common()
+            if key in _CURATED
+        ]
+        for city in viewed[:self.top_viewed]:
+            order.setdefault(weather_service.cache_key(city), city)
+        return list(order.values())
+
+    def run_once(self) -> List[str]:
+        """Run a single warming cycle. Returns the cities that were refreshed."""
+        refreshed = []
+        for city in self.priority():
+            if len(refreshed) >= self.budget:
+                break
+            if self.expires_in(city) > self.interval:
+                continue
+            try:
+                if self.refresh(city) is not None:
+                    refreshed.append(city)
+            except Exception as e:
+                console.print(f"[yellow]Cache warming failed for {city}: {e}[/yellow]")
+        return refreshed
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self.run_once()
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="cache-warmer", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+def local_warmer() -> CacheWarmer:
+    """Warmer for the in-process `weather_service` cache, seeded with default favorites."""
+    warmer = CacheWarmer(
+        expires_in=lambda city: weather_service.weather_cache.expires_in(
+            (weather_service.cache_key(city), weather_service.DEFAULT_PROFILE)
+        )
+    )
+    warmer.add_favorites(DEFAULT_FAVORITES, pinned=True)
+    return warmer
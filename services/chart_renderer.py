@@ -0,0 +1,69 @@
+"""
+Headless chart rendering.
+
+Charts are drawn with matplotlib's object-oriented API on an Agg canvas:
+no pyplot, no global figure state, so rendering is safe from threads and
+cheap to run in worker processes. Inputs are plain NumPy arrays (picklable)
+and every chart is written under a name derived from a hash of its data, so
+unchanged charts are never rendered twice.
+"""
+import hashlib
+import os
+import threading
+from typing import NamedTuple
+
+import numpy as np
+
+# Bump when the chart's appearance changes so cached images are re-rendered
+RENDER_VERSION = "1"
+
+class TrendChart(NamedTuple):
+    title: str
+    times: np.ndarray        # datetime64, UTC
+    temps: np.ndarray
+    rolling: np.ndarray
+    days: np.ndarray         # datetime64 day starts (UTC)
+    day_min: np.ndarray
+    day_max: np.ndarray
+
+def content_hash(chart: TrendChart) -> str:
+    digest = hashlib.blake2b(digest_size=10)
+    digest.update(RENDER_VERSION.encode())
+    digest.update(chart.title.encode())
+    for array in chart[1:]:
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()
+
+def render_trend(chart: TrendChart, path: str) -> str:
+    """Draw the trend chart to `path` (PNG). Returns `path`."""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(10, 6))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    # Seaborn "darkgrid" look without touching global rcParams
+    ax.set_facecolor("#EAEAF2")
+    ax.grid(color="white", linewidth=1)
+    ax.set_axisbelow(True)
+    for spine in ax.spines.values():
+        spine.set_visible(False)
+
+    if len(chart.days) > 1:
+        # Band drawn at midday of each day
+        ax.fill_between(chart.days + np.timedelta64(12, "h"), chart.day_min, chart.day_max,
+                        color="coral", alpha=0.15, label="Daily range")
+    ax.plot(chart.times, chart.temps, marker="o", color="coral", label="Temp (°C)")
+    ax.plot(chart.times, chart.rolling, color="steelblue", linewidth=2, label="24h mean")
+    ax.legend()
+    ax.set_title(chart.title)
+    ax.set_xlabel("Date")
+    ax.set_ylabel("Temp (°C)")
+    ax.tick_params(axis="x", labelrotation=45)
+    fig.tight_layout()
+
+    # Per process and thread: two threads may render the same content-addressed chart
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    fig.savefig(tmp_path, format="png")
+    os.replace(tmp_path, path)
+    return path
@@ -0,0 +1,23 @@
+"""Curated list of cities offered in the dashboard search box."""
+
+ALL_CITIES = sorted(set([
+    # India
+    "New Delhi", "Mumbai", "Bangalore", "Hyderabad", "Chennai", "Kolkata", "Pune", "Ahmedabad", "Jaipur", "Surat", 
+    "Lucknow", "Chandigarh", "Goa", "Kochi", "Indore", "Nagpur", "Bhopal", "Visakhapatnam", "Patna", "Vadodara",
+    "Ludhiana", "Agra", "Nashik", "Ranchi", "Raipur", "Meerut", "Rajkot", "Varanasi", "Srinagar", "Aurangabad", 
+    "Amritsar", "Navi Mumbai", "Allahabad", "Howrah", "Jabalpur", "Gwalior", "Vijayawada", "Jodhpur", "Madurai",
+    # USA
+    "New York", "Los Angeles", "Chicago", "Houston", "Phoenix", "Philadelphia", "San Antonio", "San Diego", "Dallas", "San Jose", 
+    "Austin", "Seattle", "Denver", "Boston", "Las Vegas", "Miami", "San Francisco", "Atlanta", "Detroit", "Washington DC",
+    "Nashville", "Portland", "Oklahoma City", "Baltimore", "Louisville", "Milwaukee", "Albuquerque", "Tucson", "Fresno",
+    "Sacramento", "Kansas City", "Mesa", "Charlotte", "Raleigh", "Omaha", "Minneapolis", "Tampa", "New Orleans",
+    # Europe
+    "London", "Paris", "Berlin", "Madrid", "Rome", "Amsterdam", "Vienna", "Lisbon", "Warsaw", "Prague", 
+    "Budapest", "Stockholm", "Oslo", "Copenhagen", "Zurich", "Athens", "Dublin", "Brussels", "Helsinki", "Barcelona", 
+    "Munich", "Milan", "Hamburg", "Naples", "Turin", "Valencia", "Seville", "Frankfurt", "Stuttgart", "Dusseldorf",
+    "Lyon", "Marseille", "Manchester", "Birmingham", "Edinburgh", "Glasgow", "Krakow", "Gdańsk", "Sofia", "Bucharest",
+    # Global
+    "Tokyo", "Dubai", "Singapore", "Sydney", "Beijing", "Seoul", "Bangkok", "Istanbul", "São Paulo", "Toronto", 
+    "Moscow", "Cairo", "Cape Town", "Rio de Janeiro", "Mexico City", "Buenos Aires", "Hong Kong", "Kuala Lumpur",
+    "Manila", "Jakarta", "Ho Chi Minh City", "Shanghai", "Melbourne", "Auckland", "Bora Bora", "Maldives", "Santorini"
+]))
@@ -0,0 +1,36 @@
+"""
+Validators for conditional upstream GETs.
+
+For every URL we remember the ETag/Last-Modified headers (when upstream
+sends them), a digest of the body and the parsed object. The next request
+sends If-None-Match/If-Modified-Since; a 304, or a 200 whose body digest is
+unchanged, reuses the parsed object instead of decoding the payload again.
+"""
+import hashlib
+import re
+from typing import Any, Dict, Mapping, NamedTuple, Optional
+
+# Per-response fields that change on every call without the data changing
+_VOLATILE = re.compile(rb'"generationtime_ms"\s*:\s*[-+0-9.eE]+\s*,?')
+
+class Validators(NamedTuple):
+    etag: Optional[str]
+    last_modified: Optional[str]
+    digest: str
+    data: Any
+
+def content_digest(content: bytes) -> str:
+    """Digest of a JSON body, ignoring volatile fields such as generationtime_ms."""
+    return hashlib.blake2b(_VOLATILE.sub(b"", content), digest_size=16).hexdigest()
+
+def conditional_headers(validators: Optional[Validators]) -> Dict[str, str]:
+    headers = {}
+    if validators is not None:
+        if validators.etag:
+            headers["If-None-Match"] = validators.etag
+        if validators.last_modified:
+            headers["If-Modified-Since"] = validators.last_modified
+    return headers
+
+def from_response(headers: Mapping[str, str], digest: str, data: Any) -> Validators:
+    return Validators(headers.get("ETag"), headers.get("Last-Modified"), digest, data)
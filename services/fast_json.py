@@ -0,0 +1,73 @@
+"""
+JSON encode/decode with the fastest backend available.
+
+orjson is preferred for encoding and msgspec for (optionally schema-typed)
+decoding when installed; otherwise everything falls back to the stdlib.
+"""
+import json
+from datetime import date, datetime
+from typing import Any, Optional, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # pragma: no cover - optional dependency
+    msgspec = None
+
+ENCODER = "orjson" if orjson else ("msgspec" if msgspec else "json")
+DECODER = "msgspec" if msgspec else ("orjson" if orjson else "json")
+
+class DecodeError(ValueError):
+    """Raised when a payload is not valid JSON or does not match its schema."""
+
+_decoders = {}
+
+def _typed_decoder(schema):
+    decoder = _decoders.get(schema)
+    if decoder is None:
+        decoder = _decoders[schema] = msgspec.json.Decoder(type=schema)
+    return decoder
+
+def loads(data: Union[bytes, str], schema: Optional[type] = None) -> Any:
+    """
+    Decode JSON. With msgspec installed and a `schema` (TypedDict) given,
+    validation and type conversion happen in the same pass as parsing.
+    """
+    try:
+        if msgspec is not None:
+            if schema is not None:
+                return _typed_decoder(schema).decode(data)
+            return msgspec.json.decode(data)
+        if orjson is not None:
+            return orjson.loads(data)
+        return json.loads(data)
+    except ValueError as e:
+        # msgspec.DecodeError/ValidationError, orjson.JSONDecodeError and
+        # json.JSONDecodeError all subclass ValueError
+        raise DecodeError(str(e)) from e
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if hasattr(obj, "tolist"):  # NumPy arrays and scalars
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def dumps(obj: Any, indent: bool = False) -> bytes:
+    """Encode to UTF-8 JSON bytes."""
+    if orjson is not None:
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=_default, option=option)
+    if msgspec is not None:
+        raw = msgspec.json.encode(obj, enc_hook=_default)
+        return msgspec.json.format(raw, indent=2) if indent else raw
+    return json.dumps(
+        obj, default=_default, ensure_ascii=False, allow_nan=False,
+        indent=2 if indent else None, separators=None if indent else (",", ":")
+    ).encode("utf-8")
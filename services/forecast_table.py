@@ -0,0 +1,151 @@
+import math
+import numpy as np
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# (output name, Open-Meteo variable, kind) - kind is "str", "float" or "int"
+Field = Tuple[str, str, str]
+
+DAILY_FIELDS: Sequence[Field] = (
+    ("date", "time", "str"),
+    ("code", "weather_code", "int"),
+    ("max_temp", "temperature_2m_max", "float"),
+    ("min_temp", "temperature_2m_min", "float"),
+    ("sunrise", "sunrise", "str"),
+    ("sunset", "sunset", "str"),
+    ("uv_max", "uv_index_max", "float"),
+    ("precip_sum", "precipitation_sum", "float"),
+)
+
+HOURLY_FIELDS: Sequence[Field] = (
+    ("time", "time", "str"),
+    ("temp", "temperature_2m", "float"),
+    ("feels_like", "apparent_temperature", "float"),
+    ("prob", "precipitation_probability", "float"),
+    ("code", "weather_code", "int"),
+)
+
+MINUTELY_FIELDS: Sequence[Field] = (
+    ("time", "time", "str"),
+    ("precip", "precipitation", "float"),
+)
+
+def _to_array(values: Sequence[Any], kind: str) -> np.ndarray:
+    # Strings stay as the original Python objects so pandas can share them;
+    # numbers (including weather codes) are float64 so missing values become NaN.
+    if kind == "str":
+        arr = np.empty(len(values), dtype=object)
+        arr[:] = values
+        return arr
+    return np.array(values, dtype=np.float64)
+
+class ForecastTable:
+    """
+    Columnar forecast series (one NumPy array per field).
+
+    Replaces the old list-of-dicts shape of `data['daily']`, `data['hourly']`
+    and `data['minutely']`. Integer indexing, slicing and iteration still
+    yield plain row dicts, so existing callers keep working, while
+    `to_frame()` hands the arrays to pandas without copying.
+    """
+
+    __slots__ = ("_columns", "_ints", "_length")
+
+    def __init__(self, columns: Dict[str, np.ndarray], ints: Sequence[str] = ()):
+        lengths = {len(col) for col in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"Columns have different lengths: {sorted(lengths)}")
+        self._columns = columns
+        self._ints = frozenset(ints)
+        self._length = lengths.pop() if lengths else 0
+
+    @classmethod
+    def from_upstream(cls, block: Optional[Dict[str, list]], fields: Sequence[Field], limit: Optional[int] = None) -> "ForecastTable":
+        """Build from an Open-Meteo `hourly`/`daily`/`minutely_15` block."""
+        block = block or {}
+        n = len(block.get("time", []))
+        if limit is not None:
+            n = min(n, limit)
+        columns = {
+            name: _to_array(block.get(source, [None] * n)[:n], kind)
+            for name, source, kind in fields
+        }
+        return cls(columns, ints=[name for name, _, kind in fields if kind == "int"])
+
+    @classmethod
+    def from_records(cls, rows: List[Dict[str, Any]], fields: Sequence[Field]) -> "ForecastTable":
+        """Build from the legacy list-of-dicts shape (e.g. a JSON API response)."""
+        columns = {
+            name: _to_array([row.get(name) for row in rows], kind)
+            for name, _, kind in fields
+        }
+        return cls(columns, ints=[name for name, _, kind in fields if kind == "int"])
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self._columns)
+
+    def column(self, name: str) -> np.ndarray:
+        return self._columns[name]
+
+    def _value(self, name: str, value: Any) -> Any:
+        if isinstance(value, np.generic):
+            value = value.item()
+        if isinstance(value, float) and math.isnan(value):
+            return None
+        if name in self._ints:
+            return int(value)
+        return value
+
+    def row(self, i: int) -> Dict[str, Any]:
+        return {name: self._value(name, col[i]) for name, col in self._columns.items()}
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """Legacy list-of-dicts shape (one dict per time step)."""
+        lists = {name: col.tolist() for name, col in self._columns.items()}
+        return [
+            {name: self._value(name, values[i]) for name, values in lists.items()}
+            for i in range(self._length)
+        ]
+
+    def to_frame(self):
+        """Zero-copy pandas DataFrame view of the columns."""
+        import pandas as pd
+        return pd.DataFrame(self._columns, copy=False)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(self._length):
+            yield self.row(i)
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self._columns[key]
+        if isinstance(key, slice):
+            return [self.row(i) for i in range(*key.indices(self._length))]
+        if key < 0:
+            key += self._length
+        if not 0 <= key < self._length:
+            raise IndexError("ForecastTable index out of range")
+        return self.row(key)
+
+    def __repr__(self) -> str:
+        return f"ForecastTable(rows={self._length}, columns={self.columns})"
+
+TABLE_FIELDS = {"daily": DAILY_FIELDS, "hourly": HOURLY_FIELDS, "minutely": MINUTELY_FIELDS}
+
+def to_builtins(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of a unified payload with every ForecastTable turned back into row dicts (JSON-safe)."""
+    return {
+        key: value.to_records() if isinstance(value, ForecastTable) else value
+        for key, value in data.items()
+    }
+
+def from_builtins(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Inverse of `to_builtins`: rebuild columnar tables from a JSON payload."""
+    out = dict(data)
+    for key, fields in TABLE_FIELDS.items():
+        if isinstance(out.get(key), list):
+            out[key] = ForecastTable.from_records(out[key], fields)
+    return out
@@ -0,0 +1,239 @@
+"""
+Offline city gazetteer.
+
+A TSV of cities (GAZETTEER_PATH: the bundled data/gazetteer.tsv, or a
+GeoNames cities15000 extract from `weather.py gazetteer --download`) is
+loaded once into a compact in-memory index:
+
+- every name and alternate name, normalised (case and accents folded), in
+  one sorted array: exact and prefix lookups are a bisect;
+- for typo tolerance, a deletion index mapping each name, and each name with
+  one character removed, to its names (built on first use), so "Londn" or
+  "Lodnon" finds London with a few dict lookups plus an edit-distance check.
+
+Matches are ranked by population, like the geocoding API.
+"""
+import csv
+import io
+import os
+import threading
+import unicodedata
+import zipfile
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from config import GAZETTEER_PATH, GAZETTEER_DOWNLOAD_PATH, GEONAMES_URL
+
+COLUMNS = ("name", "alternate_names", "country_code", "country", "latitude", "longitude", "population", "timezone")
+MIN_FUZZY_LENGTH = 4  # shorter queries only match exactly or by prefix
+
+class City(NamedTuple):
+    name: str
+    country_code: str
+    country: str
+    latitude: float
+    longitude: float
+    population: int
+    timezone: str
+
+    def to_location(self) -> Dict[str, Any]:
+        """Same shape as an Open-Meteo geocoding result."""
+        return {
+            "name": self.name, "latitude": self.latitude, "longitude": self.longitude,
+            "country": self.country, "country_code": self.country_code,
+            "timezone": self.timezone or "auto", "population": self.population,
+        }
+
+def normalize(name: str) -> str:
+    """Lookup key: accents stripped, case folded, punctuation collapsed ("São Paulo" -> "sao paulo")."""
+    decomposed = unicodedata.normalize("NFKD", name)
+    folded = "".join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+    return " ".join("".join(ch if ch.isalnum() else " " for ch in folded).split())
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance (adjacent transpositions count once), or limit + 1 if larger."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+def _deletions(key: str) -> Set[str]:
+    return {key[:i] + key[i + 1:] for i in range(len(key))}
+
+class Gazetteer:
+    def __init__(self, rows: Iterable[Tuple[City, Sequence[str]]]):
+        """`rows`: (city, alternate names) pairs."""
+        self.cities: List[City] = []
+        pairs = []
+        for city, alternates in rows:
+            index = len(self.cities)
+            self.cities.append(city)
+            for key in {normalize(name) for name in (city.name, *alternates)} - {""}:
+                pairs.append((key, index))
+        pairs.sort()
+        # Parallel sorted arrays: normalised name -> city index
+        self._keys = [key for key, _ in pairs]
+        self._rows = [index for _, index in pairs]
+        self._deletes: Optional[Dict[str, List[int]]] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str = GAZETTEER_PATH) -> "Gazetteer":
+        with open(path, encoding="utf-8", newline="") as f:
+            return cls(parse_rows(f))
+
+    def __len__(self) -> int:
+        return len(self.cities)
+
+    def _matching(self, key: str, prefix: bool) -> List[int]:
+        start = bisect_left(self._keys, key)
+        end = start
+        while end < len(self._keys) and (self._keys[end].startswith(key) if prefix else self._keys[end] == key):
+            end += 1
+        return self._rows[start:end]
+
+    def _ranked(self, rows: Iterable[int]) -> List[City]:
+        return [self.cities[row] for row in sorted(set(rows), key=lambda row: -self.cities[row].population)]
+
+    def resolve(self, name: str) -> Optional[City]:
+        """Most populous city called `name` (or known by it), or None."""
+        key = normalize(name)
+        matches = self._ranked(self._matching(key, prefix=False)) if key else []
+        return matches[0] if matches else None
+
+    def prefix(self, text: str, limit: int = 10) -> List[City]:
+        key = normalize(text)
+        return self._ranked(self._matching(key, prefix=True))[:limit] if key else []
+
+    def _deletion_index(self) -> Dict[str, List[int]]:
+        with self._lock:
+            if self._deletes is None:
+                deletes: Dict[str, List[int]] = {}
+                for position, key in enumerate(self._keys):
+                    if len(key) >= MIN_FUZZY_LENGTH - 1:
+                        for variant in {key, *_deletions(key)}:
+                            deletes.setdefault(variant, []).append(position)
+                self._deletes = deletes
+            return self._deletes
+
+    def fuzzy(self, text: str, limit: int = 10, max_distance: int = 1) -> List[City]:
+        """Cities whose name is within one edit of `text`, closest then most populous first."""
+        key = normalize(text)
+        if len(key) < MIN_FUZZY_LENGTH:
+            return []
+        deletes = self._deletion_index()
+        positions = set()
+        # Shared deletions cover substitutions, transpositions, insertions and deletions
+        for variant in (key, *_deletions(key)):
+            positions.update(deletes.get(variant, ()))
+        best: Dict[int, int] = {}
+        for position in positions:
+            distance = edit_distance(key, self._keys[position], max_distance)
+            if distance <= max_distance:
+                row = self._rows[position]
+                best[row] = min(distance, best.get(row, distance))
+        ranked = sorted(best, key=lambda row: (best[row], -self.cities[row].population))
+        return [self.cities[row] for row in ranked[:limit]]
+
+    def search(self, text: str, limit: int = 10) -> List[City]:
+        """Autocomplete: exact matches, then prefix matches (each by population), then typo matches."""
+        key = normalize(text)
+        if not key:
+            return []
+        results = self._ranked(self._matching(key, prefix=False))
+        results += [city for city in self._ranked(self._matching(key, prefix=True)) if city not in results]
+        results = results[:limit]
+        if len(results) < limit:
+            results += [city for city in self.fuzzy(text, limit) if city not in results][:limit - len(results)]
+        return results
+
+def parse_rows(lines: Iterable[str]) -> Iterable[Tuple[City, List[str]]]:
+    for record in csv.DictReader(lines, delimiter="\t", quoting=csv.QUOTE_NONE):
+        alternates = [name for name in (record["alternate_names"] or "").split(",") if name]
+        yield City(
+            record["name"], record["country_code"], record["country"], float(record["latitude"]),
+            float(record["longitude"]), int(record["population"] or 0), record["timezone"],
+        ), alternates
+
+def convert_geonames(cities: Iterable[str], countries: Iterable[str], out) -> int:
+    """
+    Write GeoNames `cities*.txt` rows (with country names from
+    `countryInfo.txt`) as a gazetteer TSV. Only the ASCII spelling is kept
+    as an alternate name, so the index stays small. Returns the row count.
+    """
+    names = {}
+    for line in countries:
+        if line.startswith("#") or not line.strip():
+            continue
+        fields = line.rstrip("\n").split("\t")
+        names[fields[0]] = fields[4]
+    writer = csv.writer(out, delimiter="\t", quoting=csv.QUOTE_NONE, lineterminator="\n")
+    writer.writerow(COLUMNS)
+    count = 0
+    for line in cities:
+        fields = line.rstrip("\n").split("\t")
+        if len(fields) < 18:
+            continue
+        name, ascii_name, code = fields[1], fields[2], fields[8]
+        alternates = ascii_name if ascii_name and ascii_name != name else ""
+        writer.writerow([name, alternates, code, names.get(code, code), fields[4], fields[5], fields[14] or 0, fields[17]])
+        count += 1
+    return count
+
+def download_geonames(path: str = GAZETTEER_DOWNLOAD_PATH, dataset: str = "cities15000", timeout: int = 60) -> int:
+    """Fetch a GeoNames cities extract and store it as a gazetteer TSV. Returns the number of cities."""
+    import requests
+    archive = requests.get(f"{GEONAMES_URL}/{dataset}.zip", timeout=timeout)
+    archive.raise_for_status()
+    countries = requests.get(f"{GEONAMES_URL}/countryInfo.txt", timeout=timeout)
+    countries.raise_for_status()
+    with zipfile.ZipFile(io.BytesIO(archive.content)) as zf:
+        cities = zf.read(f"{dataset}.txt").decode("utf-8").splitlines()
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8", newline="") as out:
+        count = convert_geonames(cities, countries.text.splitlines(), out)
+    os.replace(tmp, path)
+    return count
+
+_gazetteer: Optional[Gazetteer] = None
+_load_lock = threading.Lock()
+
+def get_gazetteer() -> Gazetteer:
+    """The process-wide gazetteer, loaded from GAZETTEER_PATH on first use (empty if the file is missing)."""
+    global _gazetteer
+    if _gazetteer is None:
+        with _load_lock:
+            if _gazetteer is None:
+                try:
+                    _gazetteer = Gazetteer.load()
+                except FileNotFoundError:
+                    _gazetteer = Gazetteer([])
+    return _gazetteer
+
+def set_gazetteer(gazetteer: Optional[Gazetteer]):
+    """Replace the process-wide gazetteer (None reloads from GAZETTEER_PATH on next use)."""
+    global _gazetteer
+    _gazetteer = gazetteer
+
+def lookup(name: str) -> Optional[Dict[str, Any]]:
+    """Geocoding result for an exact (case/accent-insensitive) city name, without any network call."""
+    city = get_gazetteer().resolve(name)
+    return None if city is None else city.to_location()
+
+def search_cities(text: str, limit: int = 10) -> List[Dict[str, Any]]:
+    return [city.to_location() for city in get_gazetteer().search(text, limit)]
+
+def suggest(name: str) -> Optional[str]:
+    """Closest known city name for a misspelling (e.g. "Londn" -> "London"), or None."""
+    matches = get_gazetteer().fuzzy(name, limit=1)
+    return matches[0].name if matches else None
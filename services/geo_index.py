@@ -0,0 +1,144 @@
+"""
+Spatial index over geocoded locations.
+
+Locations are bucketed into lat/lon grid cells about the size of a forecast
+model cell (GEO_CELL_DEG, 0.1° ≈ 11 km), so a nearest-location query only
+looks at the few cells within the tolerance. Coordinates with no known
+location nearby snap to their cell, so requests a few hundred metres apart
+still share one cache key. Cell names ("51.55,-0.15") carry their own
+coordinates, so they never need the index to resolve.
+"""
+import math
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import GEO_CELL_DEG
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180  # along a meridian
+
+Cell = Tuple[int, int]
+
+_COORDINATES = re.compile(r"^(-?\d{1,2}(?:\.\d+)?),(-?\d{1,3}(?:\.\d+)?)$")
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+def grid_cell(lat: float, lon: float, cell_deg: float = GEO_CELL_DEG) -> Cell:
+    return math.floor(lat / cell_deg), math.floor(((lon + 180) % 360 - 180) / cell_deg)
+
+def cell_center(cell: Cell, cell_deg: float = GEO_CELL_DEG) -> Tuple[float, float]:
+    return round((cell[0] + 0.5) * cell_deg, 4), round((cell[1] + 0.5) * cell_deg, 4)
+
+def cell_name(lat: float, lon: float, cell_deg: float = GEO_CELL_DEG) -> str:
+    """Name (and cache key) of the grid cell containing a position, e.g. "51.55,-0.15"."""
+    cell_lat, cell_lon = cell_center(grid_cell(lat, lon, cell_deg), cell_deg)
+    return f"{cell_lat:.2f},{cell_lon:.2f}"
+
+def parse_coordinates(name: str) -> Optional[Tuple[float, float]]:
+    """(lat, lon) of a "lat,lon" name such as a cell name, or None."""
+    match = _COORDINATES.match(name.replace(" ", ""))
+    if match is None:
+        return None
+    lat, lon = float(match.group(1)), float(match.group(2))
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None
+    return lat, lon
+
+class LocationIndex:
+    """
+    Thread-safe grid index of geocoding results (dicts with name, latitude,
+    longitude, ...), also reachable by the names they were looked up under.
+    Past `max_entries` names the least recently used one is forgotten, and
+    its location too once no other name refers to it.
+    """
+
+    def __init__(self, cell_deg: float = GEO_CELL_DEG, max_entries: int = 50000):
+        self.cell_deg = cell_deg
+        self.max_entries = max_entries
+        self._cells: Dict[Cell, List[Dict[str, Any]]] = {}
+        self._names: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._refs: Dict[int, int] = {}  # id(location) -> names pointing at it
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(entries) for entries in self._cells.values())
+
+    def add(self, location: Dict[str, Any], *names: str, spatial: bool = True):
+        """
+        Remember a location under `names` (already normalised keys). With
+        `spatial` it is also indexed for `nearest` queries.
+        """
+        lat, lon = location['latitude'], location['longitude']
+        with self._lock:
+            if spatial:
+                entries = self._cells.setdefault(grid_cell(lat, lon, self.cell_deg), [])
+                existing = next((e for e in entries if (e['latitude'], e['longitude']) == (lat, lon)), None)
+                if existing is None:
+                    entries.append(location)
+                else:
+                    location = existing
+            for name in names:
+                previous = self._names.pop(name, None)
+                if previous is location:
+                    self._names[name] = location
+                    continue
+                self._release(previous)
+                self._names[name] = location
+                self._refs[id(location)] = self._refs.get(id(location), 0) + 1
+            while len(self._names) > self.max_entries:
+                self._release(self._names.popitem(last=False)[1])
+
+    def _release(self, location: Optional[Dict[str, Any]]):
+        """Drop one name's reference to `location`; unreferenced locations leave the grid."""
+        if location is None:
+            return
+        refs = self._refs.pop(id(location), 1) - 1
+        if refs > 0:
+            self._refs[id(location)] = refs
+            return
+        cell = grid_cell(location['latitude'], location['longitude'], self.cell_deg)
+        entries = self._cells.get(cell)
+        if entries is not None:
+            entries[:] = [entry for entry in entries if entry is not location]
+            if not entries:
+                del self._cells[cell]
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            location = self._names.get(name)
+            if location is not None:
+                self._names.move_to_end(name)
+            return location
+
+    def nearest(self, lat: float, lon: float, tolerance_km: float) -> Optional[Dict[str, Any]]:
+        """Closest indexed location within `tolerance_km`, or None."""
+        lat_span = math.ceil(tolerance_km / (KM_PER_DEGREE * self.cell_deg))
+        # Cells narrow towards the poles: widen the longitude search accordingly
+        cos_lat = max(math.cos(math.radians(min(abs(lat) + lat_span * self.cell_deg, 89.9))), 1e-6)
+        lon_span = min(math.ceil(tolerance_km / (KM_PER_DEGREE * cos_lat * self.cell_deg)), int(180 / self.cell_deg))
+        row, col = grid_cell(lat, lon, self.cell_deg)
+        columns = int(round(360 / self.cell_deg))
+        best, best_km = None, tolerance_km
+        with self._lock:
+            for d_row in range(-lat_span, lat_span + 1):
+                for d_col in range(-lon_span, lon_span + 1):
+                    wrapped = (col + d_col + columns // 2) % columns - columns // 2
+                    for entry in self._cells.get((row + d_row, wrapped), ()):
+                        km = haversine_km(lat, lon, entry['latitude'], entry['longitude'])
+                        if km <= best_km:
+                            best, best_km = entry, km
+        return best
+
+    def clear(self):
+        with self._lock:
+            self._cells.clear()
+            self._names.clear()
+            self._refs.clear()
@@ -0,0 +1,214 @@
+"""
+Keyset-paginated, streaming reads of weather history.
+
+Rows are selected as plain column tuples (never ORM objects) and read through
+a cursor in (timestamp, id) order, HISTORY_STREAM_BATCH rows at a time, so
+memory stays flat however long the range is. Pages continue from an opaque
+cursor naming the last row returned instead of an OFFSET, and resampled
+series are aggregated on the fly as the rows stream past.
+"""
+import base64
+import csv
+import io
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import String, and_, or_, select, type_coerce
+from config import HISTORY_STREAM_BATCH
+from models import Location, WeatherRecord
+from services import fast_json
+from services.weather_service import cache_key
+
+FIELDS = ("temp_c", "temp_f", "humidity", "wind_speed_kmph", "condition_text", "source")
+NUMERIC_FIELDS = ("temp_c", "temp_f", "humidity", "wind_speed_kmph")
+RESAMPLE_RULES = {
+    "hourly": lambda ts: ts.replace(minute=0, second=0, microsecond=0),
+    "daily": lambda ts: ts.replace(hour=0, minute=0, second=0, microsecond=0),
+}
+ORDERS = ("desc", "asc")
+STREAM_CHUNK = 200  # rows per chunk written to a streaming response
+
+# Keyset position: the timestamp exactly as stored (SQLite keeps both
+# "YYYY-MM-DD HH:MM:SS" and microsecond forms) plus the record id
+Key = Tuple[str, int]
+
+class HistoryPage(NamedTuple):
+    items: List[Dict[str, Any]]
+    next_cursor: Optional[str]  # None on the last page
+
+def encode_cursor(key: Key) -> str:
+    raw = f"{key[0]}|{key[1]}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Key:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        stamp, record_id = raw.rsplit("|", 1)
+        datetime.fromisoformat(stamp)
+        return stamp, int(record_id)
+    except ValueError:
+        raise ValueError(f"Invalid cursor '{cursor}'")
+
+def parse_fields(spec: Optional[str]) -> Tuple[str, ...]:
+    """Comma-separated field names (default: all of FIELDS)."""
+    if not spec:
+        return FIELDS
+    fields = tuple(dict.fromkeys(name.strip() for name in spec.split(",") if name.strip()))
+    unknown = [name for name in fields if name not in FIELDS]
+    if unknown or not fields:
+        raise ValueError(f"Unknown fields: {', '.join(unknown) or spec!r} (expected some of: {', '.join(FIELDS)})")
+    return fields
+
+def columns(fields: Sequence[str], resample: Optional[str] = None) -> List[str]:
+    """Keys of each item, in order (also the CSV header)."""
+    return (["timestamp", "count"] if resample else ["id", "timestamp"]) + list(fields)
+
+def _stamp(ts: datetime) -> str:
+    return ts.isoformat()
+
+def _rows(db, city: str, since: datetime, fields: Sequence[str], descending: bool,
+          after: Optional[Key], batch_size: int) -> Iterator[Any]:
+    stored = type_coerce(WeatherRecord.timestamp, String)
+    location_id = select(Location.id).where(Location.city == cache_key(city)).scalar_subquery()
+    stmt = (
+        select(WeatherRecord.id, WeatherRecord.timestamp, stored.label("stored"),
+               *(getattr(WeatherRecord, field) for field in fields))
+        .where(WeatherRecord.location_id == location_id, WeatherRecord.timestamp >= since)
+    )
+    if after is not None:
+        stamp, record_id = after
+        if descending:
+            stmt = stmt.where(or_(stored < stamp, and_(stored == stamp, WeatherRecord.id < record_id)))
+        else:
+            stmt = stmt.where(or_(stored > stamp, and_(stored == stamp, WeatherRecord.id > record_id)))
+    if descending:
+        stmt = stmt.order_by(WeatherRecord.timestamp.desc(), WeatherRecord.id.desc())
+    else:
+        stmt = stmt.order_by(WeatherRecord.timestamp, WeatherRecord.id)
+    result = db.execute(stmt.execution_options(yield_per=batch_size))
+    try:
+        yield from result
+    finally:
+        result.close()
+
+def _records(rows, fields: Sequence[str]) -> Iterator[Tuple[Dict[str, Any], Key]]:
+    for row in rows:
+        item = {"id": row.id, "timestamp": _stamp(row.timestamp)}
+        for field in fields:
+            item[field] = getattr(row, field)
+        yield item, (row.stored, row.id)
+
+def _buckets(rows, fields: Sequence[str], resample: str,
+             descending: bool) -> Iterator[Tuple[Dict[str, Any], Key]]:
+    """Mean of numeric fields and most recent text per bucket, emitted once the stream leaves it."""
+    truncate = RESAMPLE_RULES[resample]
+    numeric = [field for field in fields if field in NUMERIC_FIELDS]
+    text = [field for field in fields if field not in NUMERIC_FIELDS]
+    start, last = None, None
+    count, sums, counts, latest = 0, {}, {}, {}
+
+    def bucket():
+        item = {"timestamp": _stamp(start), "count": count}
+        for field in fields:
+            if field in sums:
+                item[field] = round(sums[field] / counts[field], 2) if counts[field] else None
+            else:
+                item[field] = latest.get(field)
+        return item
+
+    for row in rows:
+        row_start = truncate(row.timestamp)
+        if row_start != start:
+            if start is not None:
+                yield bucket(), last
+            start, count = row_start, 0
+            sums, counts, latest = dict.fromkeys(numeric, 0.0), dict.fromkeys(numeric, 0), {}
+        count += 1
+        for field in numeric:
+            value = getattr(row, field)
+            if value is not None:
+                sums[field] += value
+                counts[field] += 1
+        for field in text:
+            # Rows arrive newest first when descending: keep the first, else the last
+            if not descending or field not in latest:
+                latest[field] = getattr(row, field)
+        last = (row.stored, row.id)
+    if start is not None:
+        yield bucket(), last
+
+def window_start(days: int, now: Optional[datetime] = None) -> datetime:
+    """
+    Oldest timestamp in a `days`-day window, truncated to the hour so the
+    window (and anything tagged with it) only moves once an hour.
+    """
+    now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+    return (now - timedelta(days=days)).replace(minute=0, second=0, microsecond=0)
+
+def iter_history(db, city: str, days: int = 7, fields: Sequence[str] = FIELDS, resample: Optional[str] = None,
+                 order: str = "desc", cursor: Optional[str] = None, since: Optional[datetime] = None,
+                 batch_size: int = HISTORY_STREAM_BATCH) -> Iterator[Tuple[Dict[str, Any], str]]:
+    """
+    (item, cursor after it) pairs for a city's history in the last `days`
+    days (from `since` when given, see `window_start`), continuing after
+    `cursor`. Arguments are validated immediately (ValueError); rows are
+    only read as the iterator is consumed.
+    """
+    if days < 1:
+        raise ValueError("days must be at least 1")
+    if resample is not None and resample not in RESAMPLE_RULES:
+        raise ValueError(f"Unknown resample '{resample}' (expected one of: {', '.join(RESAMPLE_RULES)})")
+    if order not in ORDERS:
+        raise ValueError(f"Unknown order '{order}' (expected one of: {', '.join(ORDERS)})")
+    unknown = [field for field in fields if field not in FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    after = decode_cursor(cursor) if cursor else None
+    since = since or window_start(days)
+    descending = order == "desc"
+
+    def generate():
+        rows = _rows(db, city, since, fields, descending, after, batch_size)
+        try:
+            items = _buckets(rows, fields, resample, descending) if resample else _records(rows, fields)
+            for item, key in items:
+                yield item, encode_cursor(key)
+        finally:
+            rows.close()
+
+    return generate()
+
+def history_page(db, city: str, limit: int, **query) -> HistoryPage:
+    """One page of `limit` items; `query` as for `iter_history`."""
+    pairs = iter_history(db, city, **query)
+    try:
+        window = list(islice(pairs, limit + 1))
+    finally:
+        pairs.close()
+    items = [item for item, _ in window[:limit]]
+    next_cursor = window[limit - 1][1] if len(window) > limit else None
+    return HistoryPage(items, next_cursor)
+
+def ndjson_chunks(items: Iterator[Dict[str, Any]], chunk: int = STREAM_CHUNK) -> Iterator[bytes]:
+    """Newline-delimited JSON, `chunk` rows per write."""
+    while True:
+        lines = [fast_json.dumps(item) for item in islice(items, chunk)]
+        if not lines:
+            return
+        yield b"\n".join(lines) + b"\n"
+
+def csv_chunks(items: Iterator[Dict[str, Any]], header: List[str], chunk: int = STREAM_CHUNK) -> Iterator[str]:
+    """CSV with a header row, `chunk` rows per write."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=header, extrasaction="ignore")
+    writer.writeheader()
+    while True:
+        rows = list(islice(items, chunk))
+        writer.writerows(rows)
+        if buffer.tell():
+            yield buffer.getvalue()
+        if not rows:
+            return
+        buffer.seek(0)
+        buffer.truncate()
@@ -0,0 +1,46 @@
+"""
+HTTP caching semantics for the API: entity tags, conditional requests and
+Cache-Control values, so clients, nginx or a CDN can reuse responses.
+"""
+import hashlib
+from typing import Optional
+
+def etag(body: bytes) -> str:
+    """
+    Entity tag over an uncompressed response body. It is weak because the
+    compression middleware may send the same tag with a gzip or brotli
+    content-coding, and a strong tag must differ per coding (RFC 9110 §8.8.3).
+    """
+    return 'W/"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+def version_etag(*parts) -> str:
+    """
+    Weak entity tag over whatever identifies a representation's version
+    (e.g. query parameters and the latest record id), for responses that
+    are streamed before their bytes are known.
+    """
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+    return f'W/"{digest}"'
+
+def etag_matches(if_none_match: Optional[str], tag: str) -> bool:
+    """Weak comparison of an If-None-Match header against `tag` (RFC 9110 §13.1.2)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = tag[2:] if tag.startswith("W/") else tag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if (candidate[2:] if candidate.startswith("W/") else candidate) == opaque:
+            return True
+    return False
+
+def cache_control(max_age: float, stale_while_revalidate: float = 0) -> str:
+    """Shared-cache policy: fresh for `max_age` seconds, then served stale while revalidating."""
+    value = f"public, max-age={max(0, int(max_age))}"
+    if stale_while_revalidate > 0:
+        value += f", stale-while-revalidate={int(stale_while_revalidate)}"
+    return value
+
+# Served when upstream failed and the payload is already outdated
+NO_CACHE = "no-cache"
@@ -0,0 +1,198 @@
+"""
+Lightweight in-process metrics: counters, gauges and latency histograms.
+
+Recording a sample is a perf_counter call plus a short critical section, so
+instrumentation can stay enabled in production. `render_prometheus()` produces
+the text exposition format served at the API's /metrics endpoint and
+`profile_summary()` backs the CLI's --profile flag.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, List, Tuple
+
+# Seconds; covers cache hits (sub-ms) through slow upstream calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+def _labels(labels: Dict[str, str]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _format_labels(labels: Labels, extra: str = "") -> str:
+    parts = [f'{k}="{v}"' for k, v in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class _Histogram:
+    __slots__ = ("counts", "sum", "count", "max")
+
+    def __init__(self, n_buckets: int):
+        self.counts = [0] * (n_buckets + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+class Registry:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._gauges: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, _Histogram]] = {}
+
+    def describe(self, name: str, kind: str, help_text: str):
+        self._help[name] = (kind, help_text)
+
+    def inc(self, name: str, amount: float = 1.0, **labels):
+        key = _labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + amount
+
+    def set_gauge(self, name: str, value: float, **labels):
+        with self._lock:
+            self._gauges.setdefault(name, {})[_labels(labels)] = value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _labels(labels)
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = _Histogram(len(self.buckets))
+            hist.counts[idx] += 1
+            hist.sum += value
+            hist.count += 1
+            if value > hist.max:
+                hist.max = value
+
+    def counter_value(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._counters.get(name, {}).get(_labels(labels), 0.0)
+
+    def label_values(self, name: str, label: str) -> List[str]:
+        """Distinct values of `label` across a counter's series."""
+        with self._lock:
+            return sorted({dict(labels).get(label, "") for labels in self._counters.get(name, {})})
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+    def render_prometheus(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            for kind, store in (("counter", self._counters), ("gauge", self._gauges)):
+                for name in sorted(store):
+                    lines.append(f"# HELP {name} {self._help.get(name, (kind, name))[1]}")
+                    lines.append(f"# TYPE {name} {kind}")
+                    for labels, value in sorted(store[name].items()):
+                        lines.append(f"{name}{_format_labels(labels)} {value:g}")
+            for name in sorted(self._histograms):
+                lines.append(f"# HELP {name} {self._help.get(name, ('histogram', name))[1]}")
+                lines.append(f"# TYPE {name} histogram")
+                for labels, hist in sorted(self._histograms[name].items()):
+                    cumulative = 0
+                    for bound, count in zip(self.buckets + (float("inf"),), hist.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                        le_label = f'le="{le}"'
+                        lines.append(f"{name}_bucket{_format_labels(labels, le_label)} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {hist.sum:.6f}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+    def histogram_summary(self, name: str) -> List[Dict]:
+        """Per-label-set count/total/mean/max of a histogram (seconds)."""
+        with self._lock:
+            series = dict(self._histograms.get(name, {}))
+        return [
+            {
+                "labels": dict(labels), "count": hist.count, "total": hist.sum,
+                "mean": hist.sum / hist.count if hist.count else 0.0, "max": hist.max,
+            }
+            for labels, hist in sorted(series.items(), key=lambda kv: -kv[1].sum)
+        ]
+
+registry = Registry()
+
+STAGE_SECONDS = "weathernow_stage_duration_seconds"
+CACHE_REQUESTS = "weathernow_cache_requests_total"
+UPSTREAM_REQUESTS = "weathernow_upstream_requests_total"
+UPSTREAM_RETRIES = "weathernow_upstream_retries_total"
+CACHE_HIT_RATIO = "weathernow_cache_hit_ratio"
+STALE_SERVED = "weathernow_stale_served_total"
+BREAKER_OPEN = "weathernow_circuit_open"
+REFRESH_UNCHANGED = "weathernow_refresh_unchanged_total"
+DB_WRITES_SKIPPED = "weathernow_db_writes_skipped_total"
+BACKFILL_ROWS = "weathernow_backfill_rows_total"
+WRITE_QUEUE_DEPTH = "weathernow_write_queue_depth"
+DB_WRITES_FLUSHED = "weathernow_db_writes_flushed_total"
+DB_WRITES_DROPPED = "weathernow_db_writes_dropped_total"
+HTTP_NOT_MODIFIED = "weathernow_http_not_modified_total"
+STREAM_SUBSCRIBERS = "weathernow_stream_subscribers"
+STREAM_EVENTS = "weathernow_stream_events_total"
+
+registry.describe(STAGE_SECONDS, "histogram", "Time spent in each hot-path stage")
+registry.describe(CACHE_REQUESTS, "counter", "Cache lookups by cache and result (hit/miss)")
+registry.describe(UPSTREAM_REQUESTS, "counter", "Upstream HTTP requests by endpoint and outcome")
+registry.describe(UPSTREAM_RETRIES, "counter", "Upstream retry attempts by endpoint")
+registry.describe(CACHE_HIT_RATIO, "gauge", "Cache hit ratio since process start")
+registry.describe(STALE_SERVED, "counter", "Expired cache entries served because upstream failed")
+registry.describe(BREAKER_OPEN, "gauge", "1 while the upstream host's circuit breaker is not closed")
+registry.describe(REFRESH_UNCHANGED, "counter", "Refreshes that reused the cached payload because upstream data had not changed")
+registry.describe(DB_WRITES_SKIPPED, "counter", "History writes skipped because the observation was already saved")
+registry.describe(BACKFILL_ROWS, "counter", "Historical records loaded from the archive API")
+registry.describe(WRITE_QUEUE_DEPTH, "gauge", "History records waiting in the write-behind queue")
+registry.describe(DB_WRITES_FLUSHED, "counter", "History records written by the write-behind queue")
+registry.describe(DB_WRITES_DROPPED, "counter", "History records dropped by the write-behind queue, by reason")
+registry.describe(HTTP_NOT_MODIFIED, "counter", "API requests answered 304 Not Modified, by route")
+registry.describe(STREAM_SUBSCRIBERS, "gauge", "Open live-update subscriptions (GET /stream)")
+registry.describe(STREAM_EVENTS, "counter", "Changed-field updates queued for live subscribers")
+
+@contextmanager
+def timed(stage: str):
+    """Record the duration of the enclosed block under `stage`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe(STAGE_SECONDS, time.perf_counter() - start, stage=stage)
+
+def timed_stage(stage: str):
+    """Decorator form of `timed`."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timed(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def record_cache(cache: str, hit: bool):
+    registry.inc(CACHE_REQUESTS, cache=cache, result="hit" if hit else "miss")
+
+def cache_hit_ratio(cache: str) -> float:
+    hits = registry.counter_value(CACHE_REQUESTS, cache=cache, result="hit")
+    misses = registry.counter_value(CACHE_REQUESTS, cache=cache, result="miss")
+    return hits / (hits + misses) if hits + misses else 0.0
+
+def render_prometheus() -> str:
+    for cache in registry.label_values(CACHE_REQUESTS, "cache"):
+        registry.set_gauge(CACHE_HIT_RATIO, cache_hit_ratio(cache), cache=cache)
+    return registry.render_prometheus()
+
+def profile_summary() -> List[Dict]:
+    """Stage timings, slowest total first (used by the CLI --profile flag)."""
+    return [
+        dict(stage=row["labels"].get("stage", ""), **{k: v for k, v in row.items() if k != "labels"})
+        for row in registry.histogram_summary(STAGE_SECONDS)
+    ]
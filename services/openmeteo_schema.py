@@ -0,0 +1,94 @@
+"""
+Typed shapes of the Open-Meteo responses we consume.
+
+Used as decode schemas by `services.fast_json.loads`: with msgspec
+installed the payload is validated and numbers are converted to float
+while parsing. Unknown keys are ignored, every key is optional.
+"""
+from typing import List, Optional, TypedDict, Union
+
+# Values Open-Meteo reports as integers (humidity, AQI) keep their type
+Number = Union[int, float]
+
+class GeocodingResult(TypedDict, total=False):
+    id: int
+    name: str
+    latitude: float
+    longitude: float
+    elevation: float
+    country: str
+    country_code: str
+    admin1: str
+    timezone: str
+    population: int
+
+class GeocodingResponse(TypedDict, total=False):
+    results: List[GeocodingResult]
+    generationtime_ms: float
+
+class ForecastCurrent(TypedDict, total=False):
+    time: str
+    interval: int
+    temperature_2m: Optional[float]
+    relative_humidity_2m: Optional[Number]
+    apparent_temperature: Optional[float]
+    is_day: int
+    weather_code: Optional[int]
+    wind_speed_10m: Optional[float]
+    uv_index: Optional[float]
+    precipitation: Optional[float]
+
+class ForecastHourly(TypedDict, total=False):
+    time: List[str]
+    temperature_2m: List[Optional[float]]
+    weather_code: List[Optional[float]]
+    uv_index: List[Optional[float]]
+    precipitation_probability: List[Optional[float]]
+    apparent_temperature: List[Optional[float]]
+
+class ForecastDaily(TypedDict, total=False):
+    time: List[str]
+    weather_code: List[Optional[float]]
+    temperature_2m_max: List[Optional[float]]
+    temperature_2m_min: List[Optional[float]]
+    sunrise: List[str]
+    sunset: List[str]
+    uv_index_max: List[Optional[float]]
+    precipitation_sum: List[Optional[float]]
+
+class ForecastMinutely(TypedDict, total=False):
+    time: List[str]
+    precipitation: List[Optional[float]]
+
+class ForecastResponse(TypedDict, total=False):
+    latitude: float
+    longitude: float
+    timezone: str
+    utc_offset_seconds: int
+    elevation: float
+    generationtime_ms: float
+    current: ForecastCurrent
+    hourly: ForecastHourly
+    daily: ForecastDaily
+    minutely_15: ForecastMinutely
+
+class AirQualityCurrent(TypedDict, total=False):
+    time: str
+    us_aqi: Optional[Number]
+
+class AirQualityResponse(TypedDict, total=False):
+    latitude: float
+    longitude: float
+    current: AirQualityCurrent
+
+class ArchiveHourly(TypedDict, total=False):
+    time: List[str]
+    temperature_2m: List[Optional[float]]
+    relative_humidity_2m: List[Optional[float]]
+    wind_speed_10m: List[Optional[float]]
+    weather_code: List[Optional[float]]
+
+class ArchiveResponse(TypedDict, total=False):
+    latitude: float
+    longitude: float
+    hourly: ArchiveHourly
@@ -0,0 +1,76 @@
+"""
+Per-caller Open-Meteo query profiles.
+
+Each profile names the forecast sections a caller actually reads, so the
+upstream query only asks for those variables and horizons:
+
+    current  current conditions only (CLI current/compare/batch, /weather/{city}, alerts)
+    48h      current + next 48 hours + 15-minute nowcast
+    7day     current + daily outlook (CLI forecast)
+    full     everything plus air quality (dashboard, /weather/{city}/full)
+
+A cached payload for a wider profile can answer a narrower one (see `covers`).
+"""
+from typing import Dict, FrozenSet, NamedTuple, Optional, Tuple
+from urllib.parse import urlencode
+from services.forecast_table import DAILY_FIELDS, HOURLY_FIELDS, MINUTELY_FIELDS
+
+CURRENT_VARIABLES = (
+    "temperature_2m", "relative_humidity_2m", "apparent_temperature", "is_day",
+    "weather_code", "wind_speed_10m", "uv_index", "precipitation",
+)
+
+# Horizons of the unified payload
+HOURLY_STEPS = 48     # hours, starting at the current hour
+MINUTELY_STEPS = 4    # 15-minute steps, i.e. the next hour
+FORECAST_DAYS = 8     # today + a full 7-day outlook
+
+def _variables(fields) -> str:
+    return ",".join(upstream for _, upstream, _ in fields if upstream != "time")
+
+class QueryProfile(NamedTuple):
+    name: str
+    sections: FrozenSet[str]
+    air_quality: bool = False
+
+    def covers(self, other: "QueryProfile") -> bool:
+        """True if a payload fetched with this profile has everything `other` needs."""
+        return self.sections >= other.sections and (self.air_quality or not other.air_quality)
+
+PROFILES: Dict[str, QueryProfile] = {
+    profile.name: profile for profile in (
+        QueryProfile("current", frozenset()),
+        QueryProfile("48h", frozenset({"hourly", "minutely"})),
+        QueryProfile("7day", frozenset({"daily"})),
+        QueryProfile("full", frozenset({"hourly", "minutely", "daily"}), air_quality=True),
+    )
+}
+DEFAULT_PROFILE = "full"
+
+def get_profile(name: Optional[str]) -> Optional[QueryProfile]:
+    """Profile by name (None selects the default); None for unknown names."""
+    return PROFILES.get(name or DEFAULT_PROFILE)
+
+def covering_profiles(profile: QueryProfile) -> Tuple[QueryProfile, ...]:
+    """Profiles whose payloads can answer `profile`, narrowest (cheapest) first."""
+    wider = [p for p in PROFILES.values() if p.covers(profile)]
+    return tuple(sorted(wider, key=lambda p: (len(p.sections), p.air_quality)))
+
+def forecast_params(profile: QueryProfile, timezone: str = "auto") -> Dict[str, str]:
+    """Query parameters for the forecast endpoint (latitude/longitude added by the caller)."""
+    params = {"current": ",".join(CURRENT_VARIABLES)}
+    if "hourly" in profile.sections:
+        params["hourly"] = _variables(HOURLY_FIELDS)
+        params["forecast_hours"] = str(HOURLY_STEPS)
+    if "minutely" in profile.sections:
+        params["minutely_15"] = _variables(MINUTELY_FIELDS)
+        params["forecast_minutely_15"] = str(MINUTELY_STEPS)
+    if "daily" in profile.sections:
+        params["daily"] = _variables(DAILY_FIELDS)
+        params["forecast_days"] = str(FORECAST_DAYS)
+    params["timezone"] = timezone
+    return params
+
+def forecast_url(base_url: str, lat: float, lon: float, profile: QueryProfile, timezone: str = "auto") -> str:
+    query = urlencode({"latitude": lat, "longitude": lon, **forecast_params(profile, timezone)}, safe=",/")
+    return f"{base_url}?{query}"
@@ -0,0 +1,137 @@
+"""
+Retry/backoff helpers and per-host circuit breakers for upstream calls.
+"""
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional
+from urllib.parse import urlparse
+
+# Upstream statuses worth retrying (rate limited or transient server errors)
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+def full_jitter_delay(attempt: int, base: float, cap: float, rnd: Callable[[float, float], float] = random.uniform) -> float:
+    """AWS-style "full jitter" backoff: uniform in [0, min(cap, base * 2**attempt)]."""
+    return rnd(0, min(cap, base * (2 ** attempt)))
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date)."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+class CircuitBreaker:
+    """
+    Classic closed/open/half-open breaker.
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    `allow()` returns False for `reset_timeout` seconds. Then a single probe
+    request is let through (half-open): success closes the circuit, failure
+    opens it again.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if self.clock() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            # Half-open: exactly one probe at a time
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = self.clock()
+
+class BreakerRegistry:
+    """One CircuitBreaker per upstream host."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def for_url(self, url: str) -> CircuitBreaker:
+        host = urlparse(url).netloc
+        with self._lock:
+            breaker = self._breakers.get(host)
+            if breaker is None:
+                breaker = self._breakers[host] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return breaker
+
+    def states(self) -> Dict[str, str]:
+        with self._lock:
+            return {host: breaker.state for host, breaker in self._breakers.items()}
+
+    def reset(self):
+        with self._lock:
+            self._breakers.clear()
+
+class RateLimiter:
+    """Token bucket shared by worker threads: `acquire()` blocks until a request may be sent."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            self.sleep(wait)
@@ -0,0 +1,211 @@
+"""
+Live weather subscriptions (GET /stream).
+
+Clients subscribe to a set of cities. One background poller fetches each
+distinct subscribed city once per STREAM_POLL_INTERVAL through the shared
+weather cache, diffs the result against the last snapshot and hands only the
+changed fields to that city's subscribers, so upstream load follows the
+number of distinct cities rather than connected clients. Changes waiting for
+a subscriber are merged per city: a slow client holds at most one snapshot
+per city, never a growing backlog.
+"""
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Set
+
+from rich.console import Console
+from config import STREAM_POLL_INTERVAL, STREAM_HEARTBEAT, STREAM_MAX_SUBSCRIBERS
+from services import fast_json, metrics, weather_service
+
+console = Console()
+
+SNAPSHOT_FIELDS = ("temp_c", "temp_f", "humidity", "wind_speed_kmph", "condition_text")
+
+def snapshot(data: dict) -> Dict[str, Any]:
+    """Fields pushed to subscribers for one weather payload."""
+    fields = weather_service.extract_record_fields(data)
+    current = {field: fields[field] for field in SNAPSHOT_FIELDS}
+    current["observed_at"] = (data.get("current") or {}).get("observed_at")
+    current["stale"] = bool(data.get("stale"))
+    return current
+
+def changed_fields(previous: Optional[Dict[str, Any]], current: Dict[str, Any]) -> Dict[str, Any]:
+    if previous is None:
+        return dict(current)
+    return {field: value for field, value in current.items() if previous.get(field) != value}
+
+class Subscription:
+    """One client's cities and the changes not yet sent to it."""
+
+    def __init__(self, cities: Dict[str, str], loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.cities = cities  # cache key -> name as requested
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._loop = loop
+        self._ready = asyncio.Event() if loop is not None else None
+
+    def push(self, key: str, changes: Dict[str, Any]):
+        """Merge changes for a city (called from the poller thread)."""
+        with self._lock:
+            self._pending.setdefault(key, {}).update(changes)
+        if self._loop is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._ready.set)
+            except RuntimeError:
+                pass  # event loop closed: the client is gone
+
+    def drain(self) -> Dict[str, Dict[str, Any]]:
+        """Changes since the last drain, by city name."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return {self.cities[key]: changes for key, changes in pending.items()}
+
+    async def wait(self, timeout: float) -> Dict[str, Dict[str, Any]]:
+        """Like `drain`, first waiting up to `timeout` seconds for a change (empty on timeout)."""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._ready.clear()
+        return self.drain()
+
+class SubscriptionHub:
+    """Subscriptions by city plus the poller thread that feeds them."""
+
+    def __init__(self, fetch: Optional[Callable[[str], Optional[dict]]] = None,
+                 interval: float = STREAM_POLL_INTERVAL, max_subscribers: int = STREAM_MAX_SUBSCRIBERS):
+        # Through the cache: a city other clients or the warmer keep fresh costs no upstream call.
+        # Polling is not a view, so it does not raise the city's warming priority.
+        self.fetch = fetch or (lambda city: weather_service.get_rich_weather_data(city, "current", count=False))
+        self.interval = interval
+        self.max_subscribers = max_subscribers
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._names: Dict[str, str] = {}
+        self._snapshots: Dict[str, Dict[str, Any]] = {}
+        self._count = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return self._count
+
+    def cities(self) -> List[str]:
+        """Distinct subscribed cities (what one poll fetches)."""
+        with self._lock:
+            return list(self._names.values())
+
+    def subscribe(self, cities: Iterable[str],
+                  loop: Optional[asyncio.AbstractEventLoop] = None) -> Optional[Subscription]:
+        """New subscription, primed with the latest known state; None when at STREAM_MAX_SUBSCRIBERS."""
+        wanted = {weather_service.cache_key(city): city.strip() for city in cities}
+        with self._lock:
+            if self._count >= self.max_subscribers:
+                return None
+            subscription = Subscription(wanted, loop)
+            new_city = False
+            for key, name in wanted.items():
+                self._subscribers.setdefault(key, set()).add(subscription)
+                self._names.setdefault(key, name)
+                if key in self._snapshots:
+                    subscription.push(key, self._snapshots[key])
+                else:
+                    new_city = True
+            self._count += 1
+            count = self._count
+        metrics.registry.set_gauge(metrics.STREAM_SUBSCRIBERS, count)
+        if new_city:
+            self._wake.set()  # poll now rather than at the next interval
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """Forget a subscription (idempotent). Cities nobody watches any more stop being polled."""
+        with self._lock:
+            removed = False
+            for key in subscription.cities:
+                subscribers = self._subscribers.get(key)
+                if subscribers is None or subscription not in subscribers:
+                    continue
+                removed = True
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[key]
+                    self._names.pop(key, None)
+                    self._snapshots.pop(key, None)
+            if removed:
+                self._count -= 1
+            count = self._count
+        metrics.registry.set_gauge(metrics.STREAM_SUBSCRIBERS, count)
+
+    def poll_once(self) -> Dict[str, Dict[str, Any]]:
+        """Fetch every subscribed city once and push what changed. Returns {city: changed fields}."""
+        with self._lock:
+            cities = dict(self._names)
+        changed = {}
+        for key, name in cities.items():
+            try:
+                data = self.fetch(name)
+                current = snapshot(data) if data else None
+            except Exception as e:
+                console.print(f"[yellow]Live update failed for {name}: {e}[/yellow]")
+                continue
+            if current is None:
+                continue
+            with self._lock:
+                subscribers = self._subscribers.get(key)
+                if not subscribers:
+                    continue  # everyone left while we were fetching
+                changes = changed_fields(self._snapshots.get(key), current)
+                if not changes:
+                    continue
+                self._snapshots[key] = current
+                for subscription in subscribers:
+                    subscription.push(key, changes)
+                metrics.registry.inc(metrics.STREAM_EVENTS, len(subscribers))
+            changed[name] = changes
+        return changed
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self._wake.clear()
+            self.poll_once()
+            self._wake.wait(self.interval)
+
+    def start(self) -> "SubscriptionHub":
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._loop, name="subscription-poller", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+def sse_event(event_id: int, city: str, changes: Dict[str, Any]) -> bytes:
+    payload = fast_json.dumps({"city": city, "changes": changes})
+    return f"id: {event_id}\nevent: weather\ndata: ".encode() + payload + b"\n\n"
+
+async def event_stream(hub: SubscriptionHub, subscription: Subscription,
+                       heartbeat: float = STREAM_HEARTBEAT) -> AsyncIterator[bytes]:
+    """Server-sent events for one subscription until the client disconnects."""
+    event_id = 0
+    try:
+        yield b"retry: 5000\n\n"
+        while True:
+            updates = await subscription.wait(heartbeat)
+            if not updates:
+                yield b": keep-alive\n\n"
+                continue
+            for city, changes in updates.items():
+                event_id += 1
+                yield sse_event(event_id, city, changes)
+    finally:
+        hub.unsubscribe(subscription)
+
+subscription_hub = SubscriptionHub()
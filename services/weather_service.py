@@ -1,176 +1,467 @@
 import requests
+from requests.adapters import HTTPAdapter
 import logging
+import threading
 import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlparse
 from rich.console import Console
-from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
+from config import (
+    WEATHER_CACHE_TTL, UPSTREAM_POOL_SIZE, UPSTREAM_VALIDATOR_TTL, GEOCODING_URL, FORECAST_URL, AIR_QUALITY_URL,
+    UPSTREAM_BACKOFF_BASE, UPSTREAM_BACKOFF_CAP, UPSTREAM_RETRY_BUDGET,
+    BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT, GEO_SNAP_KM, GEOCODE_LOCAL_FIRST, WARMER_MAX_VIEWED,
+)
+from services.cache import TTLCache
+from services.geo_index import LocationIndex, cell_name, parse_coordinates
+from services.conditional import content_digest, conditional_headers, from_response
+from services.resilience import BreakerRegistry, RETRYABLE_STATUSES, full_jitter_delay, parse_retry_after
+from services.forecast_table import ForecastTable, DAILY_FIELDS, HOURLY_FIELDS, MINUTELY_FIELDS, to_builtins
+from services.query_profiles import QueryProfile, DEFAULT_PROFILE, HOURLY_STEPS, MINUTELY_STEPS, get_profile, covering_profiles, forecast_url
+from services import fast_json, gazetteer, metrics
+from services.openmeteo_schema import GeocodingResponse, ForecastResponse, AirQualityResponse
 
 console = Console()
 
-def make_api_request_with_retry(url: str, timeout: int = 10, max_retries: int = 3) -> Optional[Dict[Any, Any]]:
+# Shared keep-alive connection pool for all Open-Meteo hosts
+_session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=UPSTREAM_POOL_SIZE)
+_session.mount("https://", _adapter)
+_session.mount("http://", _adapter)
+# Ask for compressed bodies explicitly (urllib3 decodes gzip/deflate transparently)
+_session.headers["Accept-Encoding"] = "gzip, deflate"
+
+# Fail fast per upstream host while it is erroring
+circuit_breakers = BreakerRegistry(BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT)
+
+# Validators (ETag, Last-Modified, body digest) and parsed bodies by upstream URL
+upstream_validators = TTLCache(ttl=UPSTREAM_VALIDATOR_TTL, max_entries=4096)
+
+# Unified payloads keyed by (normalised city name, query profile name)
+weather_cache = TTLCache(ttl=WEATHER_CACHE_TTL)
+# Geocoding results by name and by position (coordinate lookups, see get_weather_for_coords)
+location_index = LocationIndex()
+# How often each city has been requested (drives cache warming priority), in
+# least recently viewed order and capped at WARMER_MAX_VIEWED cities
+view_counts = Counter()
+_views_lock = threading.Lock()
+
+def cache_key(city: str) -> str:
+    return city.strip().lower()
+
+def make_api_request_with_retry(url: str, timeout: int = 10, max_retries: int = 3, schema: Optional[type] = None,
+                                conditional: bool = True) -> Optional[Dict[Any, Any]]:
+    """
+    Make API request with retry logic and jittered exponential backoff.
+    See `fetch_json` (this returns only the decoded body).
+    """
+    return fetch_json(url, timeout, max_retries, schema, conditional)[0]
+
+def fetch_json(url: str, timeout: int = 10, max_retries: int = 3, schema: Optional[type] = None,
+               conditional: bool = True) -> Tuple[Optional[Dict[Any, Any]], bool]:
     """
-    Make API request with retry logic and exponential backoff.
+    Conditional GET with retry logic and jittered exponential backoff.
+
+    Timeouts, connection errors, 429 and 5xx responses are retried (honouring
+    Retry-After) while the whole call stays within UPSTREAM_RETRY_BUDGET
+    seconds. Other 4xx responses fail immediately. Each host has a circuit
+    breaker: while it is open, calls return None without touching the network.
+
+    Requests carry If-None-Match/If-Modified-Since from the previous response
+    to the same URL. A 304, or a body identical to the last one, returns the
+    previously decoded object without parsing.
     
     Args:
         url: API endpoint URL
         timeout: Request timeout in seconds
-        max_retries: Maximum number of retry attempts
+        max_retries: Maximum number of attempts
+        schema: Optional TypedDict (see services.openmeteo_schema) to validate against while decoding
+        conditional: Remember validators for this URL; pass False for one-off requests
+            (e.g. archive chunks) so large payloads don't sit in `upstream_validators`
         
     Returns:
-        JSON response or None on failure
+        (JSON response or None on failure, False if it is unchanged since the last call)
     """
+    endpoint = _endpoint_name(url)
+    breaker = circuit_breakers.for_url(url)
+    deadline = time.monotonic() + UPSTREAM_RETRY_BUDGET
+    previous = upstream_validators.get(url) if conditional else None
+
     for attempt in range(max_retries):
+        if not breaker.allow():
+            metrics.registry.inc(metrics.UPSTREAM_REQUESTS, endpoint=endpoint, outcome="circuit_open")
+            console.print(f"[yellow]Skipping {endpoint} request: upstream is failing (circuit open)[/yellow]")
+            return None, True
+        if attempt:
+            metrics.registry.inc(metrics.UPSTREAM_RETRIES, endpoint=endpoint)
+
+        retry_after = None
         try:
-            response = requests.get(url, timeout=timeout)
-            response.raise_for_status()
-            return response.json()
-        except requests.Timeout:
-            if attempt < max_retries - 1:
-                wait_time = 2 ** attempt  # Exponential backoff: 1s, 2s, 4s
-                console.print(f"[yellow]API timeout - retrying in {wait_time}s (attempt {attempt + 1}/{max_retries})[/yellow]")
-                time.sleep(wait_time)
+            response = _session.get(url, headers=conditional_headers(previous),
+                                    timeout=min(timeout, max(0.5, deadline - time.monotonic())))
+            if response.status_code == 304 and previous is not None:
+                breaker.record_success()
+                metrics.registry.inc(metrics.UPSTREAM_REQUESTS, endpoint=endpoint, outcome="not_modified")
+                upstream_validators.set(url, previous)
+                return previous.data, False
+            if response.status_code in RETRYABLE_STATUSES:
+                breaker.record_failure()
+                reason = f"HTTP {response.status_code}"
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                metrics.registry.inc(metrics.UPSTREAM_REQUESTS, endpoint=endpoint, outcome=f"http_{response.status_code}")
             else:
-                console.print(f"[red]API timeout after {max_retries} attempts[/red]")
-                return None
+                response.raise_for_status()
+                breaker.record_success()
+                digest = content_digest(response.content)
+                if previous is not None and previous.digest == digest:
+                    metrics.registry.inc(metrics.UPSTREAM_REQUESTS, endpoint=endpoint, outcome="unchanged")
+                    upstream_validators.set(url, previous._replace(etag=response.headers.get("ETag"),
+                                                                   last_modified=response.headers.get("Last-Modified")))
+                    return previous.data, False
+                data = fast_json.loads(response.content, schema)
+                metrics.registry.inc(metrics.UPSTREAM_REQUESTS, endpoint=endpoint, outcome="ok")
+                if conditional:
+                    upstream_validators.set(url, from_response(response.headers, digest, data))
+                return data, True
+        except requests.Timeout:
+            breaker.record_failure()
+            reason = "timeout"
+            metrics.registry.inc(metrics.UPSTREAM_REQUESTS, endpoint=endpoint, outcome="timeout")
+        except requests.ConnectionError as e:
+            breaker.record_failure()
+            reason = f"connection error ({e.__class__.__name__})"
+            metrics.registry.inc(metrics.UPSTREAM_REQUESTS, endpoint=endpoint, outcome="connection_error")
+        except requests.HTTPError as e:
+            # The host answered; the request itself is wrong, so retrying won't help
+            breaker.record_success()
+            metrics.registry.inc(metrics.UPSTREAM_REQUESTS, endpoint=endpoint, outcome="http_error")
+            console.print(f"[red]API request failed: {str(e)}[/red]")
+            return None, True
         except requests.RequestException as e:
+            # Broken body, bad encoding, redirect loop...: the host is misbehaving (and a
+            # half-open probe must always report back, or the circuit never closes)
+            breaker.record_failure()
+            metrics.registry.inc(metrics.UPSTREAM_REQUESTS, endpoint=endpoint, outcome="error")
             console.print(f"[red]API request failed: {str(e)}[/red]")
-            return None
-    return None
+            return None, True
+        except fast_json.DecodeError as e:
+            metrics.registry.inc(metrics.UPSTREAM_REQUESTS, endpoint=endpoint, outcome="invalid")
+            console.print(f"[red]Invalid API response: {str(e)}[/red]")
+            return None, True
+
+        if attempt == max_retries - 1:
+            console.print(f"[red]API {reason} after {max_retries} attempts[/red]")
+            return None, True
+        wait_time = full_jitter_delay(attempt, UPSTREAM_BACKOFF_BASE, UPSTREAM_BACKOFF_CAP)
+        if retry_after is not None:
+            wait_time = max(wait_time, retry_after)
+        if time.monotonic() + wait_time >= deadline:
+            console.print(f"[red]API {reason} - retry budget of {UPSTREAM_RETRY_BUDGET:g}s exhausted[/red]")
+            return None, True
+        console.print(f"[yellow]API {reason} - retrying in {wait_time:.1f}s (attempt {attempt + 1}/{max_retries})[/yellow]")
+        time.sleep(wait_time)
+    return None, True
+
+def _endpoint_name(url: str) -> str:
+    """Short metrics label for an upstream URL, e.g. 'forecast' or 'air-quality'."""
+    return urlparse(url).path.rstrip("/").rsplit("/", 1)[-1] or "upstream"
+
+def _resolve_profile(profile: str) -> QueryProfile:
+    resolved = get_profile(profile)
+    if resolved is None:
+        raise ValueError(f"Unknown query profile '{profile}'")
+    return resolved
+
+def count_view(key: str, max_entries: int = WARMER_MAX_VIEWED):
+    """Count one request for a city (cache key), forgetting the least recently viewed beyond `max_entries`."""
+    with _views_lock:
+        view_counts[key] = view_counts.pop(key, 0) + 1
+        while len(view_counts) > max_entries:
+            del view_counts[next(iter(view_counts))]
 
-def get_rich_weather_data(city: str):
+def get_rich_weather_data(city: str, profile: str = DEFAULT_PROFILE, count: bool = True):
     """
-    Fetch comprehensive weather data from Open-Meteo (Forecast + AQI).
+    Fetch weather data from Open-Meteo (Forecast + AQI) for a query profile
+    (see services.query_profiles; "current" for current conditions only).
+    Results are served from `weather_cache` while fresh, including entries
+    fetched for a wider profile. Answered requests count as views unless
+    `count` is False (background callers such as the stream poller).
     Returns a unified dictionary or None on error.
     """
+    with metrics.timed("get_rich_weather_data"):
+        wanted = _resolve_profile(profile)
+        key = cache_key(city)
+        data = _cached(key, wanted, weather_cache.get)
+        metrics.record_cache("weather", data is not None)
+        if data is None:
+            data = refresh_rich_weather_data(city, wanted.name)
+        if data is None:
+            # Upstream failing (e.g. circuit open): an outdated answer beats none
+            stale = _cached(key, wanted, weather_cache.get_stale)
+            if stale is not None:
+                metrics.registry.inc(metrics.STALE_SERVED, cache="weather")
+                console.print(f"[yellow]Serving cached (stale) weather data for {city}[/yellow]")
+                data = dict(stale, stale=True)
+        if data is not None and count:
+            # Unknown names and typos never get here, so they are not counted
+            count_view(key)
+        return data
+
+def cache_expires_in(city: str, profile: str = DEFAULT_PROFILE) -> float:
+    """Seconds until the freshest cached payload that answers `profile` for a city expires (<= 0 if none)."""
+    key = cache_key(city)
+    candidates = covering_profiles(_resolve_profile(profile))
+    return max((weather_cache.expires_in((key, candidate.name)) for candidate in candidates), default=0.0)
+
+def _cached(key: str, profile: QueryProfile, lookup):
+    for candidate in covering_profiles(profile):
+        data = lookup((key, candidate.name))
+        if data is not None:
+            return data
+    return None
+
+def refresh_rich_weather_data(city: str, profile: str = DEFAULT_PROFILE):
+    """Fetch from upstream and replace the cached payload (does not count as a view)."""
+    data = _fetch_rich_weather_data(city, profile)
+    if data is not None:
+        weather_cache.set((cache_key(city), profile), data)
+    return data
+
+def geocode_city(city: str) -> Optional[Dict[str, Any]]:
+    """Best Open-Meteo geocoding match for a city name (name, latitude, longitude, country, timezone) or None."""
+    return _geocode(city)[0]
+
+def _geocode(city: str) -> Tuple[Optional[Dict[str, Any]], bool]:
+    coordinates = parse_coordinates(city)
+    if coordinates is not None:
+        # Cell names (and other "lat,lon" names) resolve from themselves
+        lat, lon = coordinates
+        return {"name": f"{lat:.2f},{lon:.2f}", "latitude": lat, "longitude": lon,
+                "country": "", "timezone": "auto"}, False
+    key = cache_key(city)
+    known = location_index.get(key)
+    metrics.record_cache("geocode", known is not None)
+    if known is not None:
+        return known, False
+    if GEOCODE_LOCAL_FIRST:
+        # Offline gazetteer: known city names never reach the geocoding API
+        local = gazetteer.lookup(city)
+        metrics.record_cache("gazetteer", local is not None)
+        if local is not None:
+            location_index.add(local, key, cache_key(local['name']))
+            return local, False
+    geo_url = f"{GEOCODING_URL}?name={city}&count=1&language=en&format=json"
+    with metrics.timed("geocode"):
+        geo_res, changed = fetch_json(geo_url, timeout=10, schema=GeocodingResponse)
+    if geo_res is None:
+        console.print(f"[red]Could not reach the geocoding service for '{city}'[/red]")
+        return None, changed
+    if not geo_res.get('results'):
+        hint = gazetteer.suggest(city)
+        hint = f" Did you mean {hint}?" if hint else " Please check spelling."
+        console.print(f"[yellow]City '{city}' not found.{hint}[/yellow]")
+        return None, changed
+    loc = geo_res['results'][0]
+    location_index.add(loc, key, cache_key(loc['name']))
+    return loc, changed
+
+def nearest_location(lat: float, lon: float, tolerance_km: float = GEO_SNAP_KM) -> Optional[Dict[str, Any]]:
+    """Closest already geocoded location within `tolerance_km` of a position, or None."""
+    return location_index.nearest(lat, lon, tolerance_km)
+
+def get_weather_for_coords(lat: float, lon: float, profile: str = DEFAULT_PROFILE):
+    """
+    Weather for a position without any geocoding call. A known location within
+    GEO_SNAP_KM answers with its payload (and cache entry); otherwise the
+    position snaps to its grid cell, which names the payload (e.g. "51.55,-0.15").
+    """
+    known = nearest_location(lat, lon)
+    if known is not None:
+        return get_rich_weather_data(known['name'], profile)
+    return get_rich_weather_data(cell_name(lat, lon), profile)
+
+def _fetch_rich_weather_data(city: str, profile: str = DEFAULT_PROFILE):
+    """Query geocoding, forecast and (if the profile needs it) AQI endpoints and build the unified payload."""
     try:
+        query = _resolve_profile(profile)
         # 1. Geocoding with retry logic
-        geo_url = f"https://geocoding-api.open-meteo.com/v1/search?name={city}&count=1&language=en&format=json"
-        geo_res = make_api_request_with_retry(geo_url, timeout=10)
-        
-        if not geo_res or not geo_res.get('results'):
-            console.print(f"[yellow]City '{city}' not found. Please check spelling.[/yellow]")
+        loc, geo_changed = _geocode(city)
+        if loc is None:
             return None
             
-        loc = geo_res['results'][0]
         lat, lon = loc['latitude'], loc['longitude']
         client_timezone = loc.get('timezone', 'auto')
         
-        # 2. Weather API (Current + Daily + Hourly + Minutely)
-        w_url = (
-            f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}"
-            "&current=temperature_2m,relative_humidity_2m,apparent_temperature,is_day,weather_code,wind_speed_10m,uv_index,precipitation"
-            "&hourly=temperature_2m,weather_code,uv_index,precipitation_probability,apparent_temperature"
-            "&daily=weather_code,temperature_2m_max,temperature_2m_min,sunrise,sunset,uv_index_max,precipitation_sum"
-            "&minutely_15=precipitation"
-            "&forecast_days=8"  # Fetch 8 days to ensure full 7-day outlook
-            f"&timezone={client_timezone}"
-        )
-        w_res = make_api_request_with_retry(w_url, timeout=10)
+        # 2. Weather API (current + only the sections the profile needs)
+        w_url = forecast_url(FORECAST_URL, lat, lon, query, client_timezone)
+        with metrics.timed("forecast"):
+            w_res, changed = fetch_json(w_url, timeout=10, schema=ForecastResponse)
         if not w_res:
             console.print(f"[red]Failed to fetch weather data for {loc['name']}[/red]")
             return None
         
         # 3. Air Quality API (with fallback if it fails)
-        aqi_url = f"https://air-quality-api.open-meteo.com/v1/air-quality?latitude={lat}&longitude={lon}&current=us_aqi"
-        aqi_res = make_api_request_with_retry(aqi_url, timeout=10)
-        # Fallback to 0 if AQI API fails (non-critical data)
-        if not aqi_res:
-            console.print(f"[yellow]Could not fetch air quality data (using default)[/yellow]")
-            aqi_res = {'current': {'us_aqi': 0}}
+        aqi = None
+        if query.air_quality:
+            aqi_url = f"{AIR_QUALITY_URL}?latitude={lat}&longitude={lon}&current=us_aqi"
+            with metrics.timed("air_quality"):
+                aqi_res, aqi_changed = fetch_json(aqi_url, timeout=10, schema=AirQualityResponse)
+            changed = changed or aqi_changed
+            # Fallback to 0 if AQI API fails (non-critical data)
+            if not aqi_res:
+                console.print(f"[yellow]Could not fetch air quality data (using default)[/yellow]")
+                aqi_res = {'current': {'us_aqi': 0}}
+            aqi = aqi_res.get('current', {}).get('us_aqi', 0)
         
+        # Not-changed fast path: every upstream answer matches the last one, reuse its payload
+        if not (changed or geo_changed):
+            previous = weather_cache.get_stale((cache_key(city), query.name))
+            if previous is not None:
+                metrics.registry.inc(metrics.REFRESH_UNCHANGED, profile=query.name)
+                return previous
+
         # 4. Construct Unified Data Object
-        data = {
-            "city": loc['name'],
-            "country": loc.get('country', ''),
-            "lat": lat,
-            "lon": lon,
-            "timezone": client_timezone,
-            "current": {
-                "temp": w_res['current']['temperature_2m'],
-                "feels_like": w_res['current']['apparent_temperature'],
-                "humidity": w_res['current']['relative_humidity_2m'],
-                "wind_speed": w_res['current']['wind_speed_10m'],
-                "uv_index": w_res.get('current', {}).get('uv_index', 0),
-                "is_day": w_res['current']['is_day'],
-                "weather_code": w_res['current']['weather_code'],
-                "aqi": aqi_res.get('current', {}).get('us_aqi', 0),
-                "precip": w_res['current']['precipitation']
-            },
-            "daily": [],
-            "hourly": [],
-            "minutely": []
-        }
-        
-        # Process Daily (7 Days)
-        daily = w_res['daily']
-        for i in range(len(daily['time'])):
-            data['daily'].append({
-                "date": daily['time'][i],
-                "code": daily['weather_code'][i],
-                "max_temp": daily['temperature_2m_max'][i],
-                "min_temp": daily['temperature_2m_min'][i],
-                "sunrise": daily['sunrise'][i],
-                "sunset": daily['sunset'][i],
-                "uv_max": daily['uv_index_max'][i],
-                "precip_sum": daily['precipitation_sum'][i]
-            })
-            
-        # Process Hourly (Next 48 Hours)
-        hourly = w_res['hourly']
-        current_hour_idx = 0 
-        # Find current hour index roughly
-        now_str = datetime.now().isoformat()
-        # Simple slice: assume start is close to 0 or match time. 
-        # API returns from 00:00 of requested day. logic: just take first 48 from now if possible, or just first 48 returned
-        # Better: just take first 48 items returned, as API handles "current" context if we asked for past days? API defaults to today.
-        
-        for i in range(min(48, len(hourly['time']))):
-            data['hourly'].append({
-                "time": hourly['time'][i],
-                "temp": hourly['temperature_2m'][i],
-                "feels_like": hourly['apparent_temperature'][i],
-                "prob": hourly['precipitation_probability'][i],
-                "code": hourly['weather_code'][i]
-            })
-            
-        # Process Minutely (Next 60 mins - 4 steps of 15 min)
-        if 'minutely_15' in w_res:
-            mins = w_res['minutely_15']
-            for i in range(min(4, len(mins['time']))):
-                 data['minutely'].append({
-                     "time": mins['time'][i],
-                     "precip": mins['precipitation'][i]
-                 })
-            
+        with metrics.timed("shape"):
+            data = {
+                "city": loc['name'],
+                "country": loc.get('country', ''),
+                "lat": lat,
+                "lon": lon,
+                "timezone": client_timezone,
+                "profile": query.name,
+                "current": {
+                    "observed_at": w_res['current'].get('time'),
+                    "temp": w_res['current']['temperature_2m'],
+                    "feels_like": w_res['current']['apparent_temperature'],
+                    "humidity": w_res['current']['relative_humidity_2m'],
+                    "wind_speed": w_res['current']['wind_speed_10m'],
+                    "uv_index": w_res.get('current', {}).get('uv_index', 0),
+                    "is_day": w_res['current']['is_day'],
+                    "weather_code": w_res['current']['weather_code'],
+                    "aqi": aqi,
+                    "precip": w_res['current']['precipitation']
+                },
+            }
+            if "daily" in query.sections:
+                data["daily"] = ForecastTable.from_upstream(w_res.get('daily'), DAILY_FIELDS)
+            if "hourly" in query.sections:
+                # Next 48 hours from the current hour
+                data["hourly"] = ForecastTable.from_upstream(w_res.get('hourly'), HOURLY_FIELDS, limit=HOURLY_STEPS)
+            if "minutely" in query.sections:
+                # Next 60 mins - 4 steps of 15 min
+                data["minutely"] = ForecastTable.from_upstream(w_res.get('minutely_15'), MINUTELY_FIELDS, limit=MINUTELY_STEPS)
+
         return data
         
     except Exception as e:
         console.print(f"[red]Error fetching data: {e}[/red]")
         return None
 
-# Keep legacy function for DB compatibility
-def get_weather_from_wttr(city: str):
-    return get_rich_weather_data(city)
+# Keep legacy function for DB compatibility (current conditions only)
+def get_weather_from_wttr(city: str, profile: str = "current"):
+    return get_rich_weather_data(city, profile)
+
+# WMO weather interpretation codes used by Open-Meteo
+WMO_DESCRIPTIONS = {
+    0: "Clear sky", 1: "Mainly clear", 2: "Partly cloudy", 3: "Overcast",
+    45: "Fog", 48: "Depositing rime fog",
+    51: "Light drizzle", 53: "Drizzle", 55: "Dense drizzle", 56: "Freezing drizzle", 57: "Dense freezing drizzle",
+    61: "Slight rain", 63: "Rain", 65: "Heavy rain", 66: "Freezing rain", 67: "Heavy freezing rain",
+    71: "Slight snow", 73: "Snow", 75: "Heavy snow", 77: "Snow grains",
+    80: "Rain showers", 81: "Heavy rain showers", 82: "Violent rain showers",
+    85: "Snow showers", 86: "Heavy snow showers",
+    95: "Thunderstorm", 96: "Thunderstorm with hail", 99: "Thunderstorm with heavy hail",
+}
 
 def get_desc_from_code(code):
-    return "Variable"
+    try:
+        return WMO_DESCRIPTIONS.get(int(code), "Variable")
+    except (TypeError, ValueError):
+        return "Variable"
+
+def extract_record_fields(weather_data: dict) -> Dict[str, Any]:
+    """
+    Map a weather payload onto WeatherRecord columns.
+    Accepts the unified Open-Meteo payload and the legacy wttr.in shape.
+    """
+    if 'current_condition' in weather_data:
+        curr = weather_data['current_condition'][0]
+        return {
+            "temp_c": float(curr['temp_C']),
+            "temp_f": float(curr['temp_F']),
+            "humidity": float(curr['humidity']),
+            "wind_speed_kmph": float(curr['windspeedKmph']),
+            "condition_text": curr['weatherDesc'][0]['value'],
+            "source": "wttr.in",
+        }
+    curr = weather_data['current']
+    temp_c = float(curr['temp'])
+    return {
+        "temp_c": temp_c,
+        "temp_f": round(temp_c * 9 / 5 + 32, 1),
+        "humidity": float(curr['humidity']),
+        "wind_speed_kmph": float(curr['wind_speed']),
+        "condition_text": get_desc_from_code(curr.get('weather_code')),
+        "source": "open-meteo",
+    }
+
+def get_or_create_location(db, city: str, country: Optional[str] = None):
+    from models import Location
+    key = cache_key(city)
+    location = db.query(Location).filter(Location.city == key).first()
+    if location is None:
+        location = Location(city=key, country=country)
+        db.add(location)
+        db.flush()
+    return location
+
+# Observation time of the last record saved per city (see save_weather_data)
+_last_saved_observation: Dict[str, str] = {}
 
 # Helper functions for CLI tool
-def save_weather_data(db, city: str, weather_data: dict):
-    """Save weather data to database (placeholder for CLI compatibility)."""
-    # This would integrate with database.py model if needed
-    # For now, just return success since dashboard doesn't use DB
-    return True
+@metrics.timed_stage("db_write")
+def save_weather_data(db, city: str, weather_data: dict, skip_unchanged: bool = False, defer: bool = False):
+    """
+    Save the current conditions of a weather payload as a WeatherRecord.
+    With `skip_unchanged`, an observation already saved by this process is
+    not written again (returns None). With `defer`, the record is queued for
+    the write-behind writer (services.write_behind) and None is returned
+    without touching the database; `db` may then be None.
+    """
+    from models import WeatherRecord
+    key = cache_key(city)
+    observed_at = weather_data.get('current', {}).get('observed_at')
+    if skip_unchanged and observed_at is not None and _last_saved_observation.get(key) == observed_at:
+        metrics.registry.inc(metrics.DB_WRITES_SKIPPED)
+        return None
+    if defer:
+        from services.write_behind import write_queue
+        if write_queue.submit(city, weather_data.get('country'), extract_record_fields(weather_data)) and observed_at is not None:
+            _last_saved_observation[key] = observed_at
+        return None
+    location = get_or_create_location(db, city, weather_data.get('country'))
+    record = WeatherRecord(location_id=location.id, **extract_record_fields(weather_data))
+    db.add(record)
+    db.commit()
+    if observed_at is not None:
+        _last_saved_observation[key] = observed_at
+    return record
 
 def get_history_stats(db, city: str, days: int = 7):
-    """Get historical weather stats from database (placeholder for CLI compatibility)."""
-    # This would query the database for historical records
-    # For now, return empty list since we're using API-only approach
-    return []
+    """Weather records for a city from the last `days` days, newest first."""
+    from models import Location, WeatherRecord
+    since = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=days)
+    return (
+        db.query(WeatherRecord)
+        .join(Location, WeatherRecord.location_id == Location.id)
+        .filter(Location.city == cache_key(city), WeatherRecord.timestamp >= since)
+        .order_by(WeatherRecord.timestamp.desc(), WeatherRecord.id.desc())
+        .all()
+    )
 
 def export_history_to_file(db, city: str, output_file: str):
     """Export weather history to CSV/JSON file."""
-    import json
     import pandas as pd
     
     # Get historical data (placeholder - would use actual DB)
@@ -181,8 +472,8 @@ def export_history_to_file(db, city: str, output_file: str):
     
     try:
         if output_file.endswith('.json'):
-            with open(output_file, 'w') as f:
-                json.dump(data, f, indent=2)
+            with open(output_file, 'wb') as f:
+                f.write(fast_json.dumps(to_builtins(data), indent=True))
         elif output_file.endswith('.csv'):
             # Convert to DataFrame for CSV export
             df = pd.DataFrame([data['current']])
@@ -0,0 +1,145 @@
+"""
+Write-behind buffer for weather history.
+
+Request handlers and CLI loops enqueue observations instead of committing
+them. A single writer thread drains the bounded queue and writes each group
+(up to WRITE_BATCH_SIZE records, or whatever arrived within
+WRITE_FLUSH_INTERVAL seconds) in one bulk transaction. When the queue is
+full the record is dropped and counted rather than blocking the caller.
+Pending records are flushed on `stop()` and at interpreter exit.
+"""
+import atexit
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from rich.console import Console
+from config import WRITE_QUEUE_SIZE, WRITE_FLUSH_INTERVAL, WRITE_BATCH_SIZE
+from services import metrics
+
+console = Console()
+
+class PendingRecord(NamedTuple):
+    city: str
+    country: Optional[str]
+    fields: Dict[str, Any]     # WeatherRecord columns (see extract_record_fields)
+    timestamp: datetime        # naive UTC, taken when the observation was queued
+
+class WriteBehindQueue:
+    def __init__(self, session_factory: Optional[Callable] = None, max_size: int = WRITE_QUEUE_SIZE,
+                 flush_interval: float = WRITE_FLUSH_INTERVAL, batch_size: int = WRITE_BATCH_SIZE):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.batch_size = max(1, batch_size)
+        self._queue = queue.Queue(maxsize=max_size)
+        self._submitted = 0
+        self._done = 0
+        self._progress = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+        self._atexit = False
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def submit(self, city: str, country: Optional[str], fields: Dict[str, Any]) -> bool:
+        """Queue one record without waiting for the database. False if it was dropped (queue full)."""
+        record = PendingRecord(city, country, fields, datetime.now(timezone.utc).replace(tzinfo=None))
+        self.start()
+        with self._progress:
+            try:
+                self._queue.put_nowait(record)
+            except queue.Full:
+                metrics.registry.inc(metrics.DB_WRITES_DROPPED, reason="queue_full")
+                return False
+            self._submitted += 1
+        metrics.registry.set_gauge(metrics.WRITE_QUEUE_DEPTH, self.depth())
+        return True
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every record queued so far has been written (or dropped). False on timeout."""
+        with self._progress:
+            target = self._submitted
+            if self._thread is None or not self._thread.is_alive():
+                return self._done >= target
+            return self._progress.wait_for(lambda: self._done >= target, timeout)
+
+    def _next_batch(self) -> List[PendingRecord]:
+        try:
+            batch = [self._queue.get(timeout=0.2)]
+        except queue.Empty:
+            return []
+        # Group whatever arrives within the flush interval into one transaction;
+        # while stopping, take what is already queued without waiting
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = 0 if self._stop.is_set() else deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: List[PendingRecord]):
+        from sqlalchemy import insert
+        from models import WeatherRecord
+        from services.weather_service import get_or_create_location
+        if self.session_factory is None:
+            from database import SessionLocal
+            self.session_factory = SessionLocal
+        db = self.session_factory()
+        try:
+            with metrics.timed("db_flush"):
+                location_ids = {}
+                for record in batch:
+                    if record.city not in location_ids:
+                        location_ids[record.city] = get_or_create_location(db, record.city, record.country).id
+                rows = [
+                    dict(record.fields, location_id=location_ids[record.city], timestamp=record.timestamp)
+                    for record in batch
+                ]
+                db.execute(insert(WeatherRecord), rows)
+                db.commit()
+            metrics.registry.inc(metrics.DB_WRITES_FLUSHED, len(batch))
+        except Exception as e:
+            db.rollback()
+            metrics.registry.inc(metrics.DB_WRITES_DROPPED, len(batch), reason="error")
+            console.print(f"[red]Failed to write {len(batch)} weather records: {e}[/red]")
+        finally:
+            db.close()
+
+    def _loop(self):
+        while True:
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+                with self._progress:
+                    self._done += len(batch)
+                    self._progress.notify_all()
+                metrics.registry.set_gauge(metrics.WRITE_QUEUE_DEPTH, self.depth())
+            elif self._stop.is_set():
+                return
+
+    def start(self) -> "WriteBehindQueue":
+        with self._progress:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._loop, name="write-behind", daemon=True)
+                self._thread.start()
+                if not self._atexit:
+                    # Daemon threads die with the interpreter: write what is left first
+                    atexit.register(self.stop)
+                    self._atexit = True
+        return self
+
+    def stop(self, timeout: Optional[float] = 10.0):
+        """Write everything still queued, then stop the writer thread."""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._stop.set()
+        thread.join(timeout)
+
+write_queue = WriteBehindQueue()
@@ -1,5 +1,52 @@
 import sys
 import os
+import shutil
+import tempfile
+
+import pytest
 
 # Add the project root to sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+_db_dir = None
+
+def pytest_configure(config):
+    # Runs before any test module imports config/database: the whole session
+    # (and CLI subprocesses, which inherit the environment) uses a throwaway
+    # database instead of data/weather_data.db
+    global _db_dir
+    _db_dir = tempfile.mkdtemp(prefix="weathernow-tests-")
+    os.environ["WEATHER_DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'weather_data.db')}"
+
+def pytest_unconfigure(config):
+    if _db_dir is not None:
+        shutil.rmtree(_db_dir, ignore_errors=True)
+
+@pytest.fixture
+def session_factory():
+    """Session factory for a fresh in-memory database with every table, shared by all threads."""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+    from database import Base
+    import models  # noqa: F401 - registers the ORM tables on Base.metadata
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+@pytest.fixture
+def db(session_factory):
+    """A session on `session_factory`'s database (modules override it to seed data)."""
+    db = session_factory()
+    yield db
+    db.close()
+
+@pytest.fixture(scope="session", autouse=True)
+def test_database():
+    """Tables in the session's throwaway database (the app only creates them in its lifespan)."""
+    import database
+    # Imported before pytest_configure (e.g. by a plugin), it would still point at the real file
+    assert database.DATABASE_URL == os.environ["WEATHER_DATABASE_URL"]
+    database.init_db()
+    yield database.DATABASE_URL
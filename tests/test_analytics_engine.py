@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta
+
+import pytest
+from models import Location, WeatherRecord
+from services import analytics_engine
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    analytics_engine.clear_cache()
+
+def seed(db, temps, start=None, step_hours=6):
+    location = db.query(Location).filter(Location.city == "london").first()
+    if location is None:
+        location = Location(city="london")
+        db.add(location)
+        db.commit()
+    start = start or datetime.utcnow() - timedelta(hours=step_hours * (len(temps) - 1))
+    for i, temp in enumerate(temps):
+        db.add(WeatherRecord(location_id=location.id, timestamp=start + timedelta(hours=step_hours * i),
+                             temp_c=temp, temp_f=temp * 9 / 5 + 32, humidity=50 + i, wind_speed_kmph=10,
+                             condition_text="Cloudy"))
+    db.commit()
+
+def test_analysis_is_vectorized_and_cached(db):
+    seed(db, [10, 12, 14, 16, 8, 10, 12, 14])
+
+    analysis = analytics_engine.analyze_history(db, "London", days=7)
+    assert list(analysis.frame["temp_c"]) == [10, 12, 14, 16, 8, 10, 12, 14]
+    assert analysis.summary["temp_c"]["mean"] == 12.0
+    assert analysis.summary["temp_c"]["min"] == 8.0 and analysis.summary["humidity"]["max"] == 57.0
+    assert analysis.daily["count"].sum() == 8
+    assert (analysis.daily["min"] <= analysis.daily["max"]).all()
+    # 24h rolling mean over 6-hourly readings: the 4th value averages the first four
+    assert analysis.frame["temp_rolling"].iloc[3] == 13.0
+    assert analysis.frame["temp_anomaly"].notna().all()
+
+    # Same latest id: served from cache
+    assert analytics_engine.analyze_history(db, "London", days=7) is analysis
+    assert analytics_engine.analyze_history(db, "Paris") is None
+
+def test_new_records_are_loaded_incrementally(db, monkeypatch):
+    seed(db, [10, 11, 12])
+    first = analytics_engine.analyze_history(db, "London", days=7)
+
+    reads = []
+    original = analytics_engine._read_records
+    monkeypatch.setattr(analytics_engine, "_read_records",
+                        lambda db, city, after_id=0: reads.append(after_id) or original(db, city, after_id))
+    seed(db, [20], start=datetime.utcnow())
+
+    second = analytics_engine.analyze_history(db, "London", days=7)
+    assert reads == [first.latest_id]
+    assert len(second.frame) == 4 and second.frame["temp_c"].iloc[-1] == 20
+    assert second.latest_id > first.latest_id
+
+def test_history_frames_are_bounded(db, monkeypatch):
+    monkeypatch.setattr(analytics_engine, "_frames", analytics_engine.TTLCache(ttl=60, max_entries=2))
+    seed(db, [10, 11])
+    for city in ("Paris", "Tokyo", "London"):
+        analytics_engine.load_history(db, city)
+
+    # Only the two most recently used cities stay in memory
+    assert len(analytics_engine._frames) == 2
+    assert (str(db.get_bind().url), "paris") not in analytics_engine._frames
+    latest, frame = analytics_engine.load_history(db, "London")
+    assert list(frame["temp_c"]) == [10, 11]
@@ -0,0 +1,93 @@
+import pytest
+from fastapi.testclient import TestClient
+import api.main as api_main
+from services import weather_service
+
+SAMPLE = {
+    "city": "London", "country": "United Kingdom", "lat": 51.5, "lon": -0.12, "timezone": "Europe/London",
+    "current": {"temp": 12.0, "feels_like": 10.5, "humidity": 80, "wind_speed": 14.0, "uv_index": 1,
+                "is_day": 1, "weather_code": 3, "aqi": 20, "precip": 0.0},
+    "daily": [], "hourly": [], "minutely": []
+}
+
+@pytest.fixture
+def client():
+    return TestClient(api_main.app)
+
+def test_full_weather_endpoint(client, monkeypatch):
+    monkeypatch.setattr(api_main, "get_rich_weather_data", lambda city, profile: SAMPLE if city == "London" else None)
+
+    res = client.get("/weather/London/full")
+    assert res.status_code == 200
+    assert res.json()["current"]["temp"] == 12.0
+
+    assert client.get("/weather/Nowhere/full").status_code == 404
+    assert client.get("/weather/London/hourly").status_code == 404
+
+def test_coordinate_endpoints(client, monkeypatch):
+    monkeypatch.setattr(api_main, "get_weather_for_coords", lambda lat, lon, profile: SAMPLE)
+    monkeypatch.setattr(api_main, "nearest_location",
+                        lambda lat, lon: {"name": "London", "latitude": 51.5, "longitude": -0.12} if lat > 50 else None)
+
+    assert client.get("/coords/weather", params={"lat": 51.51, "lon": -0.13}).json()["city"] == "London"
+    assert client.get("/coords/weather", params={"lat": 91, "lon": 0}).status_code == 422
+    assert client.get("/coords/nearest", params={"lat": 51.51, "lon": -0.13}).json()["name"] == "London"
+    assert client.get("/coords/nearest", params={"lat": 10, "lon": 10}).status_code == 404
+
+def test_current_weather_endpoint(client, monkeypatch):
+    monkeypatch.setattr(api_main, "get_weather_from_wttr", lambda city: SAMPLE)
+    monkeypatch.setattr(api_main, "save_weather_data", lambda db, city, data, **kwargs: None)
+
+    res = client.get("/weather/London")
+    assert res.status_code == 200
+    assert res.json()["temp_c"] == 12.0 and res.json()["condition"] == "Overcast"
+
+def test_warm_endpoint_validates_cities(client, monkeypatch):
+    monkeypatch.setattr(api_main.warmer, "add_favorites", lambda cities: None)
+    assert client.post("/warm", json=["Paris", " "]).status_code == 200
+    assert client.post("/warm", json=[]).status_code == 422
+    assert client.post("/warm", json=["City"] * 21).status_code == 422
+    assert client.post("/warm", json=["x" * 101]).status_code == 422
+
+def test_rich_weather_data_is_cached(monkeypatch):
+    calls = []
+    def fake_fetch(city, profile):
+        calls.append(city)
+        return SAMPLE
+    monkeypatch.setattr(weather_service, "_fetch_rich_weather_data", fake_fetch)
+    weather_service.weather_cache.clear()
+
+    assert weather_service.get_rich_weather_data("London") == SAMPLE
+    assert weather_service.get_rich_weather_data(" london ") == SAMPLE
+    assert calls == ["London"]
+
+def test_weather_responses_are_cacheable(client, monkeypatch):
+    data = dict(SAMPLE, hourly=[{"time": f"2026-01-01T{h:02d}:00", "temp": 10.0 + h} for h in range(24)] * 4)
+    monkeypatch.setattr(api_main, "get_rich_weather_data", lambda city, profile: data)
+    monkeypatch.setattr(api_main, "cache_expires_in", lambda city, profile: 120.4)
+
+    res = client.get("/weather/London/full")
+    etag = res.headers["etag"]
+    assert res.headers["cache-control"] == f"public, max-age=120, stale-while-revalidate={api_main.WEATHER_CACHE_TTL}"
+    assert res.headers["content-encoding"] == "gzip"
+    # One tag for the gzip and identity bodies: it has to be weak
+    identity = client.get("/weather/London/full", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in identity.headers
+    assert identity.headers["etag"] == etag and etag.startswith('W/"')
+
+    res = client.get("/weather/London/full", headers={"If-None-Match": etag})
+    assert res.status_code == 304 and res.content == b"" and res.headers["etag"] == etag
+
+    # Upstream changed: new tag, full body
+    data["current"] = dict(SAMPLE["current"], temp=13.0)
+    res = client.get("/weather/London/full", headers={"If-None-Match": etag})
+    assert res.status_code == 200 and res.headers["etag"] != etag
+
+    # Stale fallbacks must be revalidated
+    data["stale"] = True
+    assert client.get("/weather/London/full").headers["cache-control"] == "no-cache"
+
+def test_city_search_endpoint(client):
+    res = client.get("/cities/search", params={"q": "Londn", "limit": 2})
+    assert [(c["name"], c["country"]) for c in res.json()] == [("London", "United Kingdom"), ("London", "Canada")]
+    assert client.get("/cities/search", params={"q": "x", "limit": 500}).status_code == 422
@@ -0,0 +1,119 @@
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import func, select
+from benchmarks.openmeteo_stub import StubServer
+from models import BackfillState, WeatherRecord
+from services import backfill, weather_service
+from services.resilience import RateLimiter
+
+@pytest.fixture
+def stub(monkeypatch):
+    with StubServer() as server:
+        env = server.env()
+        monkeypatch.setattr(weather_service, "GEOCODING_URL", env["OPEN_METEO_GEOCODING_URL"])
+        monkeypatch.setattr(backfill, "ARCHIVE_URL", env["OPEN_METEO_ARCHIVE_URL"])
+        yield server
+
+def record_count(db) -> int:
+    return db.execute(select(func.count(WeatherRecord.id))).scalar()
+
+def test_missing_ranges_and_chunks():
+    d = date(2024, 1, 1)
+    wanted = (d, d + timedelta(days=99))
+    assert backfill.missing_ranges(wanted, None) == [wanted]
+    assert backfill.missing_ranges(wanted, wanted) == []
+    loaded = (d + timedelta(days=30), d + timedelta(days=59))
+    assert backfill.missing_ranges(wanted, loaded) == [
+        (d + timedelta(days=60), d + timedelta(days=99)),
+        (d, d + timedelta(days=29)),
+    ]
+    # Disjoint windows also fetch the gap, so the loaded span stays contiguous
+    january = (date(2024, 1, 1), date(2024, 1, 31))
+    june = (date(2024, 6, 1), date(2024, 6, 30))
+    assert backfill.missing_ranges(june, january) == [(date(2024, 2, 1), date(2024, 6, 30))]
+    assert backfill.missing_ranges(january, june) == [(date(2024, 1, 1), date(2024, 5, 31))]
+    chunks = backfill.chunk_range(wanted, 30, backwards=True)
+    assert chunks[0] == (d + timedelta(days=90), d + timedelta(days=99)) and chunks[-1][0] == d
+    assert sum((end - start).days + 1 for start, end in chunks) == 100
+
+def test_backfill_loads_only_missing_days(db, stub):
+    today = date(2024, 6, 30)
+    runner = backfill.Backfiller(db, chunk_days=10, concurrency=3, rate_limit=0, batch_size=100)
+    results = runner.run(["London", "Paris", "Nowhere"], backfill.default_range(30, today))
+
+    assert results["Nowhere"].error == "not found"
+    london = results["London"]
+    assert london.requests == 3 and london.rows == 30 * 24
+    assert london.loaded == backfill.default_range(30, today)
+    assert record_count(db) == 2 * 30 * 24
+    assert len(db.execute(select(BackfillState)).all()) == 2
+
+    # Rerun: nothing to fetch
+    stub.reset_counters()
+    again = runner.run(["London", "Paris"], backfill.default_range(30, today))
+    assert stub.calls["archive"] == 0 and again["London"].rows == 0
+    assert record_count(db) == 2 * 30 * 24
+
+    # Longer window a day later: only the new day and the older days are fetched
+    wider = backfill.default_range(45, today + timedelta(days=1))
+    extended = runner.run(["London"], wider)["London"]
+    assert extended.rows == 15 * 24 and extended.loaded == wider
+    assert stub.calls["archive"] == 3  # 1 newer day + 14 older days in chunks of 10
+
+def test_disjoint_window_fills_the_gap(db, stub):
+    runner = backfill.Backfiller(db, chunk_days=30, concurrency=2, rate_limit=0, step_hours=24)
+    runner.run(["London"], (date(2024, 1, 1), date(2024, 1, 31)))
+    result = runner.run(["London"], (date(2024, 6, 1), date(2024, 6, 30)))["London"]
+
+    assert result.ranges == [(date(2024, 2, 1), date(2024, 6, 30))]
+    assert result.loaded == (date(2024, 1, 1), date(2024, 6, 30))
+    state = db.execute(select(BackfillState)).scalar_one()
+    assert (state.start_date, state.end_date) == result.loaded
+    # One (daily-sampled) row for every day from January to June
+    assert record_count(db) == (date(2024, 6, 30) - date(2024, 1, 1)).days + 1
+
+def test_failed_chunk_keeps_high_water_mark_contiguous(db, stub):
+    today = date(2024, 6, 30)
+    calls = []
+
+    def flaky_fetch(url):
+        calls.append(url)
+        return None if len(calls) == 2 else backfill.Backfiller._fetch_archive(url)
+
+    runner = backfill.Backfiller(db, chunk_days=10, concurrency=1, rate_limit=0, fetch=flaky_fetch)
+    result = runner.run(["London"], backfill.default_range(30, today))["London"]
+    assert result.error and result.rows == 10 * 24
+    state = db.execute(select(BackfillState)).scalar_one()
+    assert (state.end_date - state.start_date).days == 9
+
+def test_unfilled_days_are_fetched_again(db, stub):
+    wanted = backfill.default_range(30, date(2024, 6, 30))
+    last_day = wanted[1].isoformat()
+
+    def lagging_fetch(url):
+        # The archive has not filled the final day yet
+        payload = backfill.Backfiller._fetch_archive(url)
+        hourly = payload["hourly"]
+        hourly["temperature_2m"] = [None if stamp.startswith(last_day) else temp
+                                    for stamp, temp in zip(hourly["time"], hourly["temperature_2m"])]
+        return payload
+
+    lagging = backfill.Backfiller(db, chunk_days=10, concurrency=2, rate_limit=0, fetch=lagging_fetch)
+    result = lagging.run(["London"], wanted)["London"]
+    assert result.error is None and result.pending_from == wanted[1]
+    assert result.loaded == (wanted[0], wanted[1] - timedelta(days=1)) and result.rows == 29 * 24
+
+    stub.reset_counters()
+    again = backfill.Backfiller(db, chunk_days=10, concurrency=2, rate_limit=0).run(["London"], wanted)["London"]
+    assert again.ranges == [(wanted[1], wanted[1])] and stub.calls["archive"] == 1
+    assert again.rows == 24 and again.loaded == wanted
+    assert record_count(db) == 30 * 24
+
+def test_rate_limiter_spaces_requests():
+    now = [0.0]
+    limiter = RateLimiter(2, clock=lambda: now[0], sleep=lambda seconds: now.__setitem__(0, now[0] + seconds))
+    for _ in range(5):
+        limiter.acquire()
+    # Burst of 2, then one token every 0.5s
+    assert now[0] == pytest.approx(1.5)
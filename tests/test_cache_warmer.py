@@ -0,0 +1,65 @@
+from services import weather_service
+from services.cache_warmer import CacheWarmer
+
+def test_priority_favorites_then_most_viewed(monkeypatch):
+    monkeypatch.setattr(weather_service, "view_counts", weather_service.Counter({"tokyo": 5, "paris": 9, "smallville": 50}))
+    warmer = CacheWarmer(refresh=lambda city: {}, top_viewed=5)
+    warmer.add_favorites(["London", "Paris"])
+
+    # Uncurated cities are ignored, favorites are not duplicated
+    assert warmer.priority() == ["London", "Paris", "Tokyo"]
+
+def test_run_once_respects_budget_and_fresh_entries(monkeypatch):
+    monkeypatch.setattr(weather_service, "view_counts", weather_service.Counter())
+    refreshed = []
+    warmer = CacheWarmer(
+        refresh=lambda city: refreshed.append(city) or {},
+        expires_in=lambda city: 1000.0 if city == "London" else 0.0,
+        interval=60,
+        budget=2,
+    )
+    warmer.add_favorites(["London", "Paris", "Tokyo", "Berlin"])
+
+    assert warmer.run_once() == ["Paris", "Tokyo"]
+    assert refreshed == ["Paris", "Tokyo"]
+
+def test_favorites_expire_and_are_capped(monkeypatch):
+    views = weather_service.Counter()
+    monkeypatch.setattr(weather_service, "view_counts", views)
+    clock = [1000.0]
+    monkeypatch.setattr("services.cache_warmer.time.monotonic", lambda: clock[0])
+    warmer = CacheWarmer(refresh=lambda city: {}, top_viewed=0, max_favorites=3, favorite_ttl=60)
+    warmer.add_favorites(["London"], pinned=True)
+    warmer.add_favorites(["Paris", "Oslo"])
+
+    # Viewing Paris keeps it; Oslo was never requested again
+    clock[0] += 50
+    views["paris"] += 1
+    assert warmer.priority() == ["London", "Paris", "Oslo"]
+    clock[0] += 20
+    assert warmer.priority() == ["London", "Paris"]
+
+    # Beyond the cap the least recently requested unpinned favorite goes first
+    warmer.add_favorites(["Rome"])
+    clock[0] += 1
+    warmer.add_favorites(["Lima"])
+    assert warmer.priority() == ["London", "Rome", "Lima"]
+
+def test_only_answered_requests_count_and_counts_are_bounded(monkeypatch):
+    views = weather_service.Counter()
+    monkeypatch.setattr(weather_service, "view_counts", views)
+    monkeypatch.setattr(weather_service, "refresh_rich_weather_data",
+                        lambda city, profile: None if city == "Londno" else {"city": city})
+    monkeypatch.setattr(weather_service, "weather_cache", weather_service.TTLCache(ttl=60))
+
+    assert weather_service.get_rich_weather_data("Londno") is None
+    assert weather_service.get_rich_weather_data("Paris") is not None
+    # Background polling is not a view
+    assert weather_service.get_rich_weather_data("Oslo", count=False) is not None
+    assert dict(views) == {"paris": 1}
+
+    weather_service.count_view("tokyo", max_entries=2)
+    weather_service.count_view("paris", max_entries=2)
+    weather_service.count_view("rome", max_entries=2)
+    # The least recently viewed city is forgotten first
+    assert dict(views) == {"paris": 2, "rome": 1}
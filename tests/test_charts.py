@@ -0,0 +1,75 @@
+import os
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+import api.main as api_main
+from database import get_db
+from models import Location, WeatherRecord
+from services import analytics_engine, analytics_service, chart_renderer
+
+@pytest.fixture
+def db(db):
+    analytics_engine.clear_cache()
+    now = datetime.utcnow()
+    for name in ("london", "paris"):
+        location = Location(city=name)
+        db.add(location)
+        db.flush()
+        for i in range(12):
+            db.add(WeatherRecord(location_id=location.id, timestamp=now - timedelta(hours=6 * i), temp_c=10 + i % 4,
+                                 temp_f=50, humidity=60, wind_speed_kmph=8, condition_text="Cloudy"))
+    db.commit()
+    return db
+
+def test_charts_render_in_parallel_and_are_content_addressed(db, tmp_path):
+    paths = analytics_service.generate_temperature_trends(db, ["London", "Paris", "Nowhere"], days=7,
+                                                          output_dir=str(tmp_path), workers=2)
+    assert paths["Nowhere"] is None
+    assert all(open(paths[city], "rb").read(8) == b"\x89PNG\r\n\x1a\n" for city in ("London", "Paris"))
+    mtime = os.path.getmtime(paths["London"])
+
+    # Unchanged data: same file, not rendered again
+    again = analytics_service.generate_temperature_trends(db, ["London"], days=7, output_dir=str(tmp_path))
+    assert again["London"] == paths["London"] and os.path.getmtime(paths["London"]) == mtime
+
+    # New data: new name; the old render outlives the grace period of the new one, then goes
+    db.add(WeatherRecord(location_id=1, timestamp=datetime.utcnow(), temp_c=30, temp_f=86, humidity=60,
+                         wind_speed_kmph=8, condition_text="Sunny"))
+    db.commit()
+    updated = analytics_service.generate_temperature_trend(db, "London", days=7, output_dir=str(tmp_path))
+    assert updated != paths["London"] and os.path.exists(paths["London"])
+    os.utime(updated, (mtime - 120, mtime - 120))
+    assert analytics_service.generate_temperature_trend(db, "London", days=7, output_dir=str(tmp_path)) == updated
+    assert not os.path.exists(paths["London"]) and os.path.exists(paths["Paris"])
+
+def test_chart_endpoint(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(analytics_service, "CHARTS_DIR", str(tmp_path))
+    api_main.app.dependency_overrides[get_db] = lambda: db
+    try:
+        client = TestClient(api_main.app)
+        res = client.get("/charts/London?days=7")
+        assert res.status_code == 200 and res.headers["content-type"] == "image/png"
+        assert client.get("/charts/Nowhere").status_code == 404
+    finally:
+        api_main.app.dependency_overrides.clear()
+
+def test_concurrent_renders_use_separate_temp_files(tmp_path, monkeypatch):
+    times = np.arange("2026-01-01T00", "2026-01-02T00", dtype="datetime64[h]")
+    temps = np.linspace(5, 10, len(times))
+    days = np.array(["2026-01-01"], dtype="datetime64[D]")
+    chart = chart_renderer.TrendChart("London", times, temps, temps, days, np.array([5.0]), np.array([10.0]))
+    path = str(tmp_path / f"{chart_renderer.content_hash(chart)}.png")
+
+    sources, replace = [], os.replace
+    monkeypatch.setattr(chart_renderer.os, "replace", lambda src, dst: sources.append(src) or replace(src, dst))
+    threads = [threading.Thread(target=chart_renderer.render_trend, args=(chart, path)) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(sources)) == 2
+    assert open(path, "rb").read(8) == b"\x89PNG\r\n\x1a\n"
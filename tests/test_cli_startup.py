@@ -0,0 +1,13 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+def test_cli_import_does_not_load_heavy_dependencies():
+    code = (
+        "import sys, weather; "
+        "print(','.join(m for m in ('pandas', 'matplotlib', 'seaborn', 'torch', 'apscheduler', 'sqlalchemy') if m in sys.modules))"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == ""
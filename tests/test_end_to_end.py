@@ -0,0 +1,90 @@
+import pytest
+from benchmarks.openmeteo_stub import StubServer
+from services import weather_service
+
+@pytest.fixture
+def stub(monkeypatch):
+    with StubServer() as server:
+        env = server.env()
+        monkeypatch.setattr(weather_service, "GEOCODING_URL", env["OPEN_METEO_GEOCODING_URL"])
+        monkeypatch.setattr(weather_service, "FORECAST_URL", env["OPEN_METEO_FORECAST_URL"])
+        monkeypatch.setattr(weather_service, "AIR_QUALITY_URL", env["OPEN_METEO_AIR_QUALITY_URL"])
+        # Exercise the geocoding API; see test_gazetteer_cities_skip_geocoding
+        monkeypatch.setattr(weather_service, "GEOCODE_LOCAL_FIRST", False)
+        weather_service.weather_cache.clear()
+        weather_service.location_index.clear()
+        yield server
+    weather_service.weather_cache.clear()
+    weather_service.location_index.clear()
+
+def test_rich_weather_data_against_stub(stub):
+    data = weather_service.get_rich_weather_data("London")
+
+    assert data["city"] == "London"
+    assert len(data["hourly"]) == 48 and len(data["daily"]) == 8 and len(data["minutely"]) == 4
+    assert isinstance(data["current"]["aqi"], int)
+    assert dict(stub.calls) == {"geocoding": 1, "forecast": 1, "air_quality": 1}
+
+    # Served from cache the second time
+    weather_service.get_rich_weather_data("london")
+    assert sum(stub.calls.values()) == 3
+
+    assert weather_service.get_rich_weather_data("Nowhere") is None
+
+def test_query_profiles_trim_upstream_requests(stub):
+    data = weather_service.get_rich_weather_data("Tokyo", "current")
+
+    assert data["profile"] == "current" and data["current"]["aqi"] is None
+    assert "hourly" not in data and "daily" not in data
+    assert dict(stub.calls) == {"geocoding": 1, "forecast": 1}
+
+    # Tokyo is geocoded once; the wider profile only costs a forecast call
+    week = weather_service.get_rich_weather_data("Tokyo", "7day")
+    assert len(week["daily"]) == 8 and "hourly" not in week
+    assert dict(stub.calls) == {"geocoding": 1, "forecast": 2}
+
+    # A cached wider profile answers narrower ones without going upstream
+    weather_service.get_rich_weather_data("Paris", "full")
+    calls = sum(stub.calls.values())
+    assert len(weather_service.get_rich_weather_data("Paris", "48h")["hourly"]) == 48
+    assert weather_service.get_rich_weather_data("Paris", "current")["profile"] == "full"
+    assert sum(stub.calls.values()) == calls
+
+@pytest.mark.parametrize("etags", [True, False])
+def test_unchanged_refresh_reuses_parsed_payload(stub, etags):
+    stub.etags = etags
+    weather_service.upstream_validators.clear()
+    first = weather_service.refresh_rich_weather_data("London", "current")
+    stub.reset_counters()
+
+    # Same data upstream: served by a 304 (ETag) or an identical body digest
+    assert weather_service.refresh_rich_weather_data("London", "current") is first
+    assert dict(stub.calls) == {"forecast": 1}
+    assert stub.responses[304] == (1 if etags else 0)
+    assert stub.bytes_sent["forecast"] < 100 if etags else stub.bytes_sent["forecast"] > 0
+
+def test_nearby_coordinates_share_one_lookup(stub):
+    london = weather_service.get_rich_weather_data("London", "current")
+    stub.reset_counters()
+
+    # A few hundred metres from a known location: its cached payload, no geocoding
+    nearby = weather_service.get_weather_for_coords(london["lat"] + 0.003, london["lon"] - 0.004, "current")
+    assert nearby is london and sum(stub.calls.values()) == 0
+
+    # Unknown area: both positions snap to one grid cell and one forecast call
+    first = weather_service.get_weather_for_coords(10.0112, 20.0131, "current")
+    second = weather_service.get_weather_for_coords(10.0141, 20.0162, "current")
+    assert second is first and first["city"] == "10.05,20.05"
+    assert dict(stub.calls) == {"forecast": 1}
+
+    # The cell name resolves without the location index (e.g. after it evicted it)
+    weather_service.location_index.clear()
+    refreshed = weather_service.refresh_rich_weather_data("10.05,20.05", "current")
+    assert refreshed["lat"] == 10.05 and refreshed["lon"] == 20.05
+    assert dict(stub.calls) == {"forecast": 2}
+
+def test_gazetteer_cities_skip_geocoding(stub, monkeypatch):
+    monkeypatch.setattr(weather_service, "GEOCODE_LOCAL_FIRST", True)
+    data = weather_service.get_rich_weather_data("sao paulo", "current")
+    assert data["city"] == "São Paulo" and data["lat"] == -23.5475
+    assert dict(stub.calls) == {"forecast": 1}
@@ -0,0 +1,35 @@
+import pytest
+from datetime import datetime
+from services import fast_json
+from services.openmeteo_schema import ForecastResponse
+
+PAYLOAD = b'{"latitude": 51.5, "current": {"temperature_2m": 12, "relative_humidity_2m": 80}, "hourly": {"time": ["2026-01-01T00:00"], "temperature_2m": [null]}, "extra": 1}'
+
+@pytest.mark.parametrize("backend", ["default", "orjson", "msgspec", "stdlib"])
+def test_roundtrip(monkeypatch, backend):
+    # Each accelerator is optional: disable the others to cover every fallback
+    if backend != "default" and getattr(fast_json, backend, True) is None:
+        pytest.skip(f"{backend} not installed")
+    if backend in ("msgspec", "stdlib"):
+        monkeypatch.setattr(fast_json, "orjson", None)
+    if backend in ("orjson", "stdlib"):
+        monkeypatch.setattr(fast_json, "msgspec", None)
+
+    data = fast_json.loads(PAYLOAD, ForecastResponse)
+    assert data["current"]["temperature_2m"] == 12
+    assert data["hourly"]["temperature_2m"] == [None]
+
+    encoded = fast_json.dumps({"when": datetime(2026, 1, 1, 12, 0), "data": data}, indent=True)
+    assert fast_json.loads(encoded)["when"].startswith("2026-01-01T12:00")
+
+    with pytest.raises(fast_json.DecodeError):
+        fast_json.loads(b'{"latitude": ')
+
+@pytest.mark.skipif(fast_json.msgspec is None, reason="msgspec not installed")
+def test_schema_validates_and_converts_in_one_pass():
+    data = fast_json.loads(PAYLOAD, ForecastResponse)
+    assert isinstance(data["current"]["temperature_2m"], float)
+    assert "extra" not in data
+
+    with pytest.raises(fast_json.DecodeError):
+        fast_json.loads(b'{"hourly": {"temperature_2m": ["hot"]}}', ForecastResponse)
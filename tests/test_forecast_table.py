@@ -0,0 +1,31 @@
+import numpy as np
+from services.forecast_table import ForecastTable, HOURLY_FIELDS, to_builtins, from_builtins
+
+HOURLY = {
+    "time": ["2026-01-01T00:00", "2026-01-01T01:00", "2026-01-01T02:00"],
+    "temperature_2m": [5.1, 4.8, None],
+    "apparent_temperature": [3.0, 2.5, 2.1],
+    "precipitation_probability": [10, 20, 30],
+    "weather_code": [3, 61, None],
+}
+
+def test_compat_rows_match_legacy_shape():
+    table = ForecastTable.from_upstream(HOURLY, HOURLY_FIELDS, limit=2)
+
+    assert len(table) == 2
+    assert table[0] == {"time": "2026-01-01T00:00", "temp": 5.1, "feels_like": 3.0, "prob": 10.0, "code": 3}
+    assert table[-1]["code"] == 61
+    assert [row["time"] for row in table] == HOURLY["time"][:2]
+    assert table[:1] == table.to_records()[:1]
+
+    full = ForecastTable.from_upstream(HOURLY, HOURLY_FIELDS)
+    assert full[2]["temp"] is None and full[2]["code"] is None
+
+def test_to_frame_shares_memory_and_builtins_roundtrip():
+    table = ForecastTable.from_upstream(HOURLY, HOURLY_FIELDS)
+    df = table.to_frame()
+    assert np.shares_memory(df["temp"].to_numpy(), table["temp"])
+
+    payload = to_builtins({"city": "X", "hourly": table})
+    assert payload["hourly"] == table.to_records()
+    assert from_builtins(payload)["hourly"].to_records() == table.to_records()
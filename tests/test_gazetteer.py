@@ -0,0 +1,57 @@
+import io
+
+import pytest
+from services import gazetteer
+from services.city_catalog import ALL_CITIES
+from services.gazetteer import City, Gazetteer
+
+@pytest.fixture(scope="module")
+def bundled():
+    return Gazetteer.load()
+
+def test_every_dashboard_city_resolves_offline(bundled):
+    assert [city for city in ALL_CITIES if bundled.resolve(city) is None] == []
+    assert bundled.resolve("Bangalore").name == "Bengaluru"
+    assert bundled.resolve("  SAO PAULO ").name == "São Paulo"
+    # Namesakes: the most populous wins, as with the geocoding API
+    assert bundled.resolve("London").country_code == "GB"
+    assert bundled.resolve("Hyderabad").country_code == "IN"
+    assert bundled.resolve("Smallville") is None
+
+def test_prefix_and_typo_search(bundled):
+    assert [city.country_code for city in bundled.prefix("lond")] == ["GB", "CA"]
+    assert bundled.prefix("") == []
+
+    for typo in ("Londn", "Lonndon", "Lindon", "Lodnon"):
+        assert bundled.fuzzy(typo)[0].name == "London", typo
+    assert bundled.fuzzy("Zurch")[0].name == "Zurich"
+    assert bundled.fuzzy("Rme") == []  # too short to guess
+    assert bundled.fuzzy("Lnodno") == []  # more than one edit away
+
+    assert [city.name for city in bundled.search("Pari", 3)] == ["Paris", "Paris"]
+    assert bundled.search("Munchen", 1)[0].name == "Munich"
+
+def test_custom_gazetteer_and_lookup(monkeypatch):
+    small = Gazetteer([
+        (City("Springfield", "US", "United States", 39.80, -89.64, 114394, "America/Chicago"), []),
+        (City("Springfield", "US", "United States", 37.22, -93.30, 169176, "America/Chicago"), ["Spfd"]),
+    ])
+    monkeypatch.setattr(gazetteer, "_gazetteer", small)
+    location = gazetteer.lookup("springfield")
+    assert location["latitude"] == 37.22 and location["timezone"] == "America/Chicago"
+    assert gazetteer.lookup("SPFD") == location
+    assert gazetteer.suggest("Springfeld") == "Springfield"
+    assert [c["population"] for c in gazetteer.search_cities("spr")] == [169176, 114394]
+
+def test_convert_geonames():
+    cities = [
+        "2643743\tLondon\tLondon\tLondres,Londra\t51.50853\t-0.12574\tP\tPPLC\tGB\t\tENG\tGLA\t\t\t8961989\t\t25\tEurope/London\t2023-01-01",
+        "3448439\tSão Paulo\tSao Paulo\t\t-23.5475\t-46.63611\tP\tPPLA\tBR\t\t27\t\t\t\t10021295\t\t769\tAmerica/Sao_Paulo\t2023-01-01",
+    ]
+    countries = ["#ISO\tISO3\tISO-Numeric\tfips\tCountry", "GB\tGBR\t826\tUK\tUnited Kingdom", "BR\tBRA\t076\tBR\tBrazil"]
+    out = io.StringIO()
+    assert gazetteer.convert_geonames(cities, countries, out) == 2
+
+    converted = Gazetteer(gazetteer.parse_rows(io.StringIO(out.getvalue())))
+    assert converted.resolve("sao paulo").country == "Brazil"
+    assert converted.resolve("London").population == 8961989
@@ -0,0 +1,43 @@
+from services.geo_index import LocationIndex, cell_name, haversine_km, parse_coordinates
+
+def test_nearest_within_tolerance():
+    index = LocationIndex(cell_deg=0.1)
+    index.add({"name": "London", "latitude": 51.5085, "longitude": -0.1257}, "london")
+    index.add({"name": "Suva", "latitude": -18.1416, "longitude": 178.4415}, "suva")
+    index.add({"name": "Taveuni", "latitude": -16.85, "longitude": 179.99}, "taveuni")
+    index.add({"name": "Longyearbyen", "latitude": 78.2232, "longitude": 15.6267}, "longyearbyen")
+
+    assert index.nearest(51.51, -0.12, 5)["name"] == "London"
+    assert index.nearest(51.60, -0.12, 5) is None
+    assert index.nearest(-16.85, -179.99, 5)["name"] == "Taveuni"  # across the antimeridian
+    assert index.nearest(78.22, 15.80, 5)["name"] == "Longyearbyen"  # narrow cells near the pole
+    assert index.get("london")["name"] == "London" and len(index) == 4
+
+    index.add({"name": "Grid", "latitude": 40.05, "longitude": -3.05}, "grid", spatial=False)
+    assert index.get("grid") is not None and index.nearest(40.05, -3.05, 5) is None
+
+def test_least_recently_used_names_are_evicted():
+    index = LocationIndex(cell_deg=0.1, max_entries=3)
+    london = {"name": "London", "latitude": 51.5085, "longitude": -0.1257}
+    index.add(london, "london", "londres", "london")
+    index.add({"name": "Paris", "latitude": 48.8534, "longitude": 2.3488}, "paris")
+    assert index.get("london") is not None
+
+    index.add({"name": "Rome", "latitude": 41.8919, "longitude": 12.5113}, "rome")
+    # "londres" was the least recently used name; London itself stays under "london"
+    assert index.get("londres") is None and index.get("london") is not None and len(index) == 3
+
+    index.add({"name": "Oslo", "latitude": 59.9127, "longitude": 10.7461}, "oslo")
+    # Paris lost its only name, so it also leaves the grid
+    assert index.get("paris") is None and index.nearest(48.85, 2.35, 5) is None
+    assert [index.get(name)["name"] for name in ("london", "rome", "oslo")] == ["London", "Rome", "Oslo"]
+    assert len(index) == 3
+
+def test_cell_names_carry_their_coordinates():
+    name = cell_name(51.51, -0.12)
+    assert name == "51.55,-0.15" and parse_coordinates(name) == (51.55, -0.15)
+    assert parse_coordinates("-33.9, 151.2") == (-33.9, 151.2)
+    assert parse_coordinates("london") is None and parse_coordinates("95,10") is None
+
+def test_haversine_km():
+    assert abs(haversine_km(51.5074, -0.1278, 48.8566, 2.3522) - 343.5) < 1
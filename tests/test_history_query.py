@@ -0,0 +1,110 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+import api.main as api_main
+from database import get_db
+from models import Location, WeatherRecord
+from services import history_query
+
+@pytest.fixture
+def db(db):
+    london, paris = Location(city="london"), Location(city="paris")
+    db.add_all([london, paris])
+    db.flush()
+    start = (datetime.now(timezone.utc) - timedelta(hours=5)).replace(tzinfo=None, minute=0, second=0, microsecond=0)
+    for i in range(24):
+        stamp = start + timedelta(minutes=10 * i, microseconds=i)
+        db.add(WeatherRecord(location_id=london.id, timestamp=stamp, temp_c=float(i), humidity=50.0,
+                             condition_text=f"c{i}", source="test"))
+    # Same instant twice (ties broken by id), one row stamped by the database, another city
+    db.add(WeatherRecord(location_id=london.id, timestamp=start, temp_c=100.0, source="test"))
+    db.add(WeatherRecord(location_id=london.id, temp_c=5.0, source="test"))
+    db.add(WeatherRecord(location_id=paris.id, timestamp=start, temp_c=1.0, source="test"))
+    db.commit()
+    return db
+
+def all_pages(db, limit, **query):
+    items, cursor = [], None
+    while True:
+        page = history_query.history_page(db, "London", limit, cursor=cursor, **query)
+        items += page.items
+        if page.next_cursor is None:
+            return items
+        cursor = page.next_cursor
+
+def test_keyset_pages_cover_every_row_once(db):
+    full = history_query.history_page(db, "London", 1000).items
+    assert len(full) == 26
+    keys = [(item["timestamp"], item["id"]) for item in full]
+    assert keys == sorted(keys, reverse=True)
+
+    for limit in (1, 7, 26):
+        assert all_pages(db, limit) == full
+        assert all_pages(db, limit, order="asc") == full[::-1]
+
+    page = history_query.history_page(db, "London", 3, fields=("temp_c",))
+    assert set(page.items[0]) == {"id", "timestamp", "temp_c"}
+    assert history_query.history_page(db, "Nowhere", 10) == history_query.HistoryPage([], None)
+
+def test_resampled_buckets(db):
+    buckets = all_pages(db, 1000, resample="hourly", order="asc", fields=("temp_c", "condition_text"))
+    assert sum(bucket["count"] for bucket in buckets) == 26
+    # First hour: readings 0..5 plus the duplicate stamped 100
+    first = buckets[0]
+    assert first["count"] == 7 and first["temp_c"] == round((sum(range(6)) + 100) / 7, 2)
+    assert first["condition_text"] == "c5"
+
+    assert all_pages(db, 1, resample="hourly", order="asc", fields=("temp_c", "condition_text")) == buckets
+    assert all_pages(db, 2, resample="hourly", fields=("temp_c", "condition_text")) == buckets[::-1]
+    assert len(all_pages(db, 10, resample="daily")) in (1, 2)
+
+def test_invalid_queries(db):
+    with pytest.raises(ValueError):
+        history_query.parse_fields("temp_c,location_id")
+    with pytest.raises(ValueError):
+        history_query.iter_history(db, "London", resample="weekly")
+    with pytest.raises(ValueError):
+        history_query.iter_history(db, "London", cursor="not-a-cursor")
+
+def test_history_endpoint_pages_and_streams(db, monkeypatch):
+    api_main.app.dependency_overrides[get_db] = lambda: db
+    try:
+        client = TestClient(api_main.app)
+        page = client.get("/history/London", params={"limit": 10, "fields": "temp_c"}).json()
+        assert len(page["items"]) == 10 and page["next_cursor"]
+        rest = client.get("/history/London", params={"limit": 100, "fields": "temp_c",
+                                                     "cursor": page["next_cursor"]}).json()
+        assert len(rest["items"]) == 16 and rest["next_cursor"] is None
+
+        res = client.get("/history/London", params={"format": "ndjson", "order": "asc"})
+        assert res.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in res.text.splitlines()]
+        assert [line["id"] for line in lines] == [item["id"] for item in reversed(page["items"] + rest["items"])]
+
+        res = client.get("/history/London", params={"format": "csv", "resample": "hourly", "fields": "temp_c"})
+        rows = list(csv.DictReader(io.StringIO(res.text)))
+        assert list(rows[0]) == ["timestamp", "count", "temp_c"]
+        assert sum(int(row["count"]) for row in rows) == 26
+
+        # Streams are revalidated against the newest record
+        params = {"format": "ndjson", "fields": "temp_c"}
+        etag = client.get("/history/London", params=params).headers["etag"]
+        assert client.get("/history/London", params=params, headers={"If-None-Match": etag}).status_code == 304
+        db.add(WeatherRecord(location_id=1, temp_c=6.0, source="test"))
+        db.commit()
+        assert client.get("/history/London", params=params, headers={"If-None-Match": etag}).status_code == 200
+        # ... and against the start of the window, which moves with time
+        etag = client.get("/history/London", params=params).headers["etag"]
+        later = history_query.window_start(7) + timedelta(hours=1)
+        monkeypatch.setattr(history_query, "window_start", lambda days: later)
+        assert client.get("/history/London", params=params, headers={"If-None-Match": etag}).status_code == 200
+
+        assert client.get("/history/London", params={"fields": "nope"}).status_code == 422
+        assert client.get("/history/London", params={"cursor": "%%%"}).status_code == 422
+        assert client.get("/history/London", params={"format": "xml"}).status_code == 422
+    finally:
+        api_main.app.dependency_overrides.clear()
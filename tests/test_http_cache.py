@@ -0,0 +1,17 @@
+from services import http_cache
+
+def test_etag_matching():
+    tag = http_cache.etag(b'{"temp":12.0}')
+    assert tag == http_cache.etag(b'{"temp":12.0}') != http_cache.etag(b'{"temp":12.5}')
+    assert http_cache.etag_matches(tag, tag)
+    assert tag.startswith('W/"') and http_cache.etag_matches(f'"other", {tag[2:]}', tag)
+    assert http_cache.etag_matches("*", tag)
+    assert not http_cache.etag_matches(None, tag) and not http_cache.etag_matches('"other"', tag)
+
+    weak = http_cache.version_etag("london", 42)
+    assert weak.startswith('W/"') and weak != http_cache.version_etag("london", 43)
+    assert http_cache.etag_matches(weak[2:], weak)
+
+def test_cache_control():
+    assert http_cache.cache_control(299.7, 600) == "public, max-age=299, stale-while-revalidate=600"
+    assert http_cache.cache_control(-5) == "public, max-age=0"
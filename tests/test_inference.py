@@ -0,0 +1,46 @@
+import os
+import time
+
+import numpy as np
+import pytest
+import torch
+from ml import inference, train
+from ml.model import WeatherLSTM
+
+@pytest.fixture
+def model_dir(tmp_path):
+    inference.clear_cache()
+    torch.manual_seed(0)
+    torch.save({'model_state': WeatherLSTM().state_dict(), 'mean': 15.0, 'std': 5.0, 'data_hash': "x"},
+               train.model_path("London", str(tmp_path)))
+    yield str(tmp_path)
+    inference.clear_cache()
+
+def test_exported_artifacts_match_eager_predictions(model_dir):
+    sequences = [[10.0, 12.0, 14.0], [20.0, 19.0, 18.5]]
+    eager = inference.load_predictor("London", model_dir)
+    assert eager.kind == "eager"
+    expected = eager.predict(sequences)
+
+    inference.export_model("London", quantize=False, model_dir=model_dir)
+    script = inference.load_predictor("London", model_dir)
+    assert script.kind == "script"
+    np.testing.assert_allclose(script.predict(sequences), expected, atol=1e-4)
+
+    inference.export_model("London", quantize=True, model_dir=model_dir)
+    int8 = inference.load_predictor("London", model_dir)
+    assert int8.kind == "int8" and inference.load_predictor("London", model_dir) is int8
+    np.testing.assert_allclose(int8.predict(sequences), expected, atol=0.1)
+
+    assert inference.load_predictor("London", model_dir, backend="eager").kind == "eager"
+    assert inference.load_predictor("Paris", model_dir) is None
+
+def test_artifacts_older_than_checkpoint_are_ignored(model_dir):
+    inference.export_model("London", quantize=True, model_dir=model_dir)
+    assert inference.load_predictor("London", model_dir).kind == "int8"
+
+    # Retrained after the export: serve the new checkpoint until re-exported
+    checkpoint = train.model_path("London", model_dir)
+    later = time.time() + 5
+    os.utime(checkpoint, (later, later))
+    assert inference.load_predictor("London", model_dir).kind == "eager"
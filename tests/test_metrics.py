@@ -0,0 +1,17 @@
+from services.metrics import Registry, STAGE_SECONDS, CACHE_REQUESTS
+
+def test_histogram_and_counters_render_as_prometheus_text():
+    registry = Registry(buckets=(0.01, 0.1))
+    registry.observe(STAGE_SECONDS, 0.005, stage="geocode")
+    registry.observe(STAGE_SECONDS, 0.05, stage="geocode")
+    registry.inc(CACHE_REQUESTS, cache="weather", result="hit")
+    registry.inc(CACHE_REQUESTS, cache="weather", result="hit")
+
+    text = registry.render_prometheus()
+    assert 'weathernow_cache_requests_total{cache="weather",result="hit"} 2' in text
+    assert 'weathernow_stage_duration_seconds_bucket{stage="geocode",le="0.01"} 1' in text
+    assert 'weathernow_stage_duration_seconds_bucket{stage="geocode",le="+Inf"} 2' in text
+    assert 'weathernow_stage_duration_seconds_count{stage="geocode"} 2' in text
+
+    [summary] = registry.histogram_summary(STAGE_SECONDS)
+    assert summary["count"] == 2 and summary["max"] == 0.05
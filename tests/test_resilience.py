@@ -0,0 +1,101 @@
+import time
+from email.utils import formatdate
+
+import pytest
+from benchmarks.openmeteo_stub import StubServer
+from services import metrics, weather_service
+from services.resilience import CircuitBreaker, full_jitter_delay, parse_retry_after
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_circuit_breaker_transitions():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    # After the reset timeout a single probe goes through
+    clock.now = 10
+    assert breaker.allow() and not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    clock.now = 20
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+def test_backoff_helpers():
+    assert full_jitter_delay(10, 0.5, 4, rnd=lambda lo, hi: hi) == 4
+    assert full_jitter_delay(1, 0.5, 4, rnd=lambda lo, hi: hi) == 1
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    assert 0 < parse_retry_after(formatdate(time.time() + 30, usegmt=True)) <= 30
+
+@pytest.fixture
+def failing_stub(monkeypatch):
+    with StubServer() as server:
+        env = server.env()
+        monkeypatch.setattr(weather_service, "GEOCODING_URL", env["OPEN_METEO_GEOCODING_URL"])
+        monkeypatch.setattr(weather_service, "FORECAST_URL", env["OPEN_METEO_FORECAST_URL"])
+        monkeypatch.setattr(weather_service, "AIR_QUALITY_URL", env["OPEN_METEO_AIR_QUALITY_URL"])
+        monkeypatch.setattr(weather_service, "UPSTREAM_BACKOFF_BASE", 0.01)
+        monkeypatch.setattr(weather_service, "UPSTREAM_BACKOFF_CAP", 0.02)
+        monkeypatch.setattr(weather_service, "GEOCODE_LOCAL_FIRST", False)
+        weather_service.weather_cache.clear()
+        weather_service.location_index.clear()
+        weather_service.circuit_breakers.reset()
+        yield server
+    weather_service.weather_cache.clear()
+    weather_service.circuit_breakers.reset()
+
+def test_breaker_opens_and_stale_data_is_served(failing_stub):
+    fresh = weather_service.get_rich_weather_data("London")
+    assert fresh is not None and "stale" not in fresh
+
+    # Expire the entry, then make every upstream call fail
+    weather_service.weather_cache.set((weather_service.cache_key("London"), "full"), fresh, ttl=-1)
+    failing_stub.error_rate = 1.0
+    failing_stub.reset_counters()
+
+    stale = weather_service.get_rich_weather_data("London")
+    assert stale["stale"] is True and stale["city"] == "London"
+    assert metrics.registry.counter_value(metrics.STALE_SERVED, cache="weather") >= 1
+
+    # Enough consecutive 500s open the circuit; further calls never reach the stub
+    for _ in range(3):
+        weather_service.refresh_rich_weather_data("Paris")
+    assert set(weather_service.circuit_breakers.states().values()) == {"open"}
+    calls = sum(failing_stub.calls.values())
+    assert weather_service.refresh_rich_weather_data("Tokyo") is None
+    assert sum(failing_stub.calls.values()) == calls
+
+def test_probe_failing_with_other_request_errors_reopens_circuit(monkeypatch):
+    url = "http://upstream.test/v1/forecast"
+    weather_service.circuit_breakers.reset()
+    breaker = weather_service.circuit_breakers.for_url(url)
+    clock = FakeClock()
+    breaker.clock = clock
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+
+    def broken_body(*args, **kwargs):
+        raise weather_service.requests.exceptions.ChunkedEncodingError("connection broken mid-body")
+    monkeypatch.setattr(weather_service._session, "get", broken_body)
+
+    # The half-open probe fails: the circuit opens again instead of waiting on the probe forever
+    clock.now = breaker.reset_timeout
+    assert weather_service.make_api_request_with_retry(url, conditional=False) is None
+    assert breaker.state == "open"
+    clock.now += breaker.reset_timeout
+    assert breaker.allow()
+    weather_service.circuit_breakers.reset()
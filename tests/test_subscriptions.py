@@ -0,0 +1,76 @@
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+import api.main as api_main
+from services import subscriptions
+from services.subscriptions import SubscriptionHub
+
+def payload(temp, code=3):
+    return {"city": "X", "current": {"temp": temp, "humidity": 80, "wind_speed": 10.0, "weather_code": code,
+                                     "observed_at": "2026-01-01T10:00"}}
+
+@pytest.fixture
+def upstream():
+    state = {"london": payload(12.0), "paris": payload(18.0, code=0), "calls": []}
+    def fetch(city):
+        state["calls"].append(city)
+        return state[city.lower()]
+    return state, fetch
+
+def test_one_fetch_per_city_and_only_changes_fan_out(upstream):
+    state, fetch = upstream
+    hub = SubscriptionHub(fetch)
+    clients = [hub.subscribe(["London"]) for _ in range(100)]
+    both = hub.subscribe(["london", "Paris"])
+    assert hub.subscriber_count() == 101 and sorted(hub.cities()) == ["London", "Paris"]
+
+    hub.poll_once()
+    assert sorted(state["calls"]) == ["London", "Paris"]
+    first = clients[0].drain()
+    assert first["London"]["temp_c"] == 12.0 and first["London"]["condition_text"] == "Overcast"
+    assert set(both.drain()) == {"london", "Paris"}
+
+    # Nothing changed upstream: nothing to send
+    assert hub.poll_once() == {} and clients[0].drain() == {}
+
+    state["london"] = payload(13.0)
+    hub.poll_once()
+    assert clients[0].drain() == {"London": {"temp_c": 13.0, "temp_f": 55.4}}
+    # A client that has not read yet gets one merged snapshot, not a backlog
+    assert clients[-1].drain()["London"] == dict(first["London"], temp_c=13.0, temp_f=55.4)
+    assert both.drain() == {"london": {"temp_c": 13.0, "temp_f": 55.4}}
+
+    # Late subscribers start from the current state; cities nobody watches are dropped
+    assert hub.subscribe(["London"]).drain()["London"]["temp_c"] == 13.0
+    hub.unsubscribe(both)
+    hub.unsubscribe(both)
+    assert hub.cities() == ["London"] and hub.subscriber_count() == 101
+
+def test_event_stream_sends_events_and_heartbeats(upstream):
+    state, fetch = upstream
+    hub = SubscriptionHub(fetch)
+
+    async def scenario():
+        subscription = hub.subscribe(["London"], asyncio.get_running_loop())
+        stream = subscriptions.event_stream(hub, subscription, heartbeat=0.05)
+        assert await stream.__anext__() == b"retry: 5000\n\n"
+        await asyncio.get_running_loop().run_in_executor(None, hub.poll_once)
+        event = await stream.__anext__()
+        assert await stream.__anext__() == b": keep-alive\n\n"
+        await stream.aclose()
+        return event
+
+    event = asyncio.run(scenario()).decode()
+    lines = event.strip().split("\n")
+    assert lines[:2] == ["id: 1", "event: weather"]
+    data = json.loads(lines[2][len("data: "):])
+    assert data["city"] == "London" and data["changes"]["temp_c"] == 12.0
+    assert hub.subscriber_count() == 0 and hub.cities() == []
+
+def test_stream_endpoint_limits(monkeypatch):
+    client = TestClient(api_main.app)
+    assert client.get("/stream", params={"cities": ""}).status_code == 422
+    monkeypatch.setattr(api_main.subscription_hub, "max_subscribers", 0)
+    assert client.get("/stream", params={"cities": "London,Paris"}).status_code == 503
@@ -0,0 +1,104 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+import torch
+from fastapi.testclient import TestClient
+import api.main as api_main
+from ml import train
+from ml.jobs import TrainingQueue
+from models import Location, WeatherRecord
+
+def add_records(db, city: str, count: int, offset: float = 0.0):
+    location = db.query(Location).filter(Location.city == city).first()
+    if location is None:
+        location = Location(city=city)
+        db.add(location)
+        db.flush()
+    now = datetime.utcnow()
+    for i in range(count):
+        db.add(WeatherRecord(location_id=location.id, timestamp=now - timedelta(hours=i), temp_c=10 + (i % 7) + offset,
+                             temp_f=50, humidity=60, wind_speed_kmph=8, condition_text="Cloudy"))
+    db.commit()
+
+@pytest.fixture
+def db(db):
+    add_records(db, "london", 40)
+    add_records(db, "paris", 30)
+    add_records(db, "oslo", 4)
+    return db
+
+def test_train_all_skips_unchanged_cities(db, tmp_path):
+    model_dir = str(tmp_path)
+    results = train.train_all(db, epochs=2, workers=2, model_dir=model_dir)
+
+    assert {city: r.status for city, r in results.items()} == {"london": "trained", "oslo": "insufficient", "paris": "trained"}
+    assert sorted(os.listdir(model_dir)) == ["london_lstm.pth", "paris_lstm.pth"]  # no temp files left behind
+    mtime = os.path.getmtime(results["paris"].path)
+
+    add_records(db, "london", 1, offset=5)
+    again = train.train_all(db, ["London", "Paris"], epochs=2, workers=1, model_dir=model_dir)
+    assert again["London"].status == "trained" and again["Paris"].status == "skipped"
+    assert os.path.getmtime(results["paris"].path) == mtime
+
+    assert train.train_all(db, ["Paris"], epochs=2, force=True, model_dir=model_dir)["Paris"].status == "trained"
+
+def test_training_queue_via_api(db, session_factory, tmp_path, monkeypatch):
+    queue = TrainingQueue(session_factory=session_factory, workers=1, model_dir=str(tmp_path))
+    monkeypatch.setattr(api_main, "training_queue", queue)
+    client = TestClient(api_main.app)
+
+    response = client.post("/train", json={"cities": ["London", "Oslo"], "epochs": 2})
+    assert response.status_code == 202
+    job = queue.wait(response.json()["id"], timeout=60)
+    assert job["status"] == "done"
+
+    body = client.get(f"/train/{job['id']}").json()
+    assert body["results"]["London"]["status"] == "trained"
+    assert body["results"]["Oslo"]["status"] == "insufficient"
+    assert client.get("/train").json()[0]["id"] == job["id"]
+    assert client.get("/train/missing").status_code == 404
+
+    # Rejected before anything is queued
+    for invalid in ({"epochs": 0}, {"epochs": -5}, {"epochs": api_main.TRAIN_MAX_EPOCHS + 1},
+                    {"cities": []}, {"cities": ["London"] * (api_main.TRAIN_MAX_CITIES + 1)}):
+        assert client.post("/train", json=invalid).status_code == 422
+    assert len(queue.jobs()) == 1
+    with pytest.raises(ValueError):
+        train.train_all(db, ["London"], epochs=0, model_dir=str(tmp_path))
+    queue.stop(timeout=5)
+
+def test_stop_interrupts_running_job(db, session_factory, tmp_path):
+    queue = TrainingQueue(session_factory=session_factory, workers=1, model_dir=str(tmp_path))
+    job = queue.submit(["London"], epochs=10 ** 7)
+    while queue.get(job["id"])["status"] != "running":
+        time.sleep(0.01)
+    time.sleep(0.2)  # well into the epochs
+
+    started = time.monotonic()
+    queue.stop(timeout=5)
+    assert time.monotonic() - started < 5
+    job = queue.get(job["id"])
+    assert job["status"] == "failed" and "shutdown" in job["error"]
+    assert not os.path.exists(train.model_path("London", str(tmp_path)))
+
+def test_in_process_training_caps_torch_threads(db, tmp_path, monkeypatch):
+    seen = []
+    fit = train._fit
+    monkeypatch.setattr(train, "_fit", lambda *args: seen.append(torch.get_num_threads()) or fit(*args))
+    monkeypatch.setattr(train, "TRAIN_THREADS", 1)
+    before = torch.get_num_threads()
+
+    train.train_all(db, ["London"], epochs=1, workers=1, model_dir=str(tmp_path))
+    assert seen == [1] and torch.get_num_threads() == before
+
+def test_cancel_terminates_training_processes(db, tmp_path):
+    cancel = threading.Event()
+    threading.Timer(0.5, cancel.set).start()
+    started = time.monotonic()
+    with pytest.raises(train.TrainingCancelled):
+        train.train_all(db, ["London", "Paris"], epochs=10 ** 7, workers=2, model_dir=str(tmp_path), cancel=cancel)
+    assert time.monotonic() - started < 30
+    assert os.listdir(str(tmp_path)) == []
@@ -3,6 +3,7 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from database import Base
 from models import Location, WeatherRecord
+from services import weather_service
 from services.weather_service import save_weather_data, get_history_stats
 from datetime import datetime
 
@@ -41,6 +42,17 @@ def test_save_weather_data(db):
     assert record.temp_c == 25.0
     assert record.condition_text == "Sunny"
 
+def test_save_open_meteo_payload(db):
+    data = {"country": "United Kingdom", "current": {"temp": 12.5, "humidity": 80, "wind_speed": 20.0, "weather_code": 61}}
+
+    record = save_weather_data(db, " London ", data)
+
+    assert record.temp_f == 54.5 and record.condition_text == "Slight rain" and record.source == "open-meteo"
+    # Stored under the cache key, so any spelling of the city reads the same history
+    location = db.query(Location).one()
+    assert (location.city, location.country) == ("london", "United Kingdom")
+    assert [r.id for r in get_history_stats(db, "LONDON", days=1)] == [record.id]
+
 def test_get_history_stats(db):
     # Seed data
     loc = Location(city="london")
@@ -54,3 +66,16 @@ def test_get_history_stats(db):
     stats = get_history_stats(db, "London", days=1)
     assert len(stats) == 1
     assert stats[0].temp_c == 10
+
+def test_save_skips_unchanged_observation(db, monkeypatch):
+    monkeypatch.setattr(weather_service, "_last_saved_observation", {})
+    data = {
+        "city": "Paris", "country": "France",
+        "current": {"observed_at": "2026-01-01T12:00", "temp": 8.0, "humidity": 70, "wind_speed": 12.0, "weather_code": 3},
+    }
+
+    assert save_weather_data(db, "Paris", data, skip_unchanged=True) is not None
+    assert save_weather_data(db, "paris", data, skip_unchanged=True) is None
+    save_weather_data(db, "Paris", dict(data, current=dict(data["current"], observed_at="2026-01-01T12:15")), skip_unchanged=True)
+
+    assert len(get_history_stats(db, "Paris", days=1)) == 2
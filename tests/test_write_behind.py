@@ -0,0 +1,86 @@
+import math
+import threading
+import time
+
+from sqlalchemy import func, select
+from models import Location, WeatherRecord
+from services import metrics, weather_service, write_behind
+from services.write_behind import WriteBehindQueue
+
+FIELDS = {"temp_c": 12.0, "temp_f": 53.6, "humidity": 80.0, "wind_speed_kmph": 14.0,
+          "condition_text": "Overcast", "source": "open-meteo"}
+
+def record_count(db) -> int:
+    return db.execute(select(func.count(WeatherRecord.id))).scalar()
+
+def test_records_are_written_in_batches(db, session_factory):
+    writes = WriteBehindQueue(session_factory, flush_interval=0.05, batch_size=100)
+    flushed = metrics.registry.counter_value(metrics.DB_WRITES_FLUSHED)
+    for i in range(250):
+        assert writes.submit("london" if i % 2 else "paris", "GB", dict(FIELDS, temp_c=float(i)))
+    assert writes.flush(timeout=10)
+
+    assert record_count(db) == 250 and db.query(Location).count() == 2
+    assert metrics.registry.counter_value(metrics.DB_WRITES_FLUSHED) - flushed == 250
+    assert writes.depth() == 0
+    writes.stop()
+
+def test_full_queue_drops_and_stop_flushes(db, session_factory):
+    writing, release = threading.Event(), threading.Event()
+
+    def slow_session():
+        writing.set()
+        release.wait(5)  # database stalled (e.g. a long write lock)
+        return session_factory()
+
+    writes = WriteBehindQueue(slow_session, max_size=2, flush_interval=0, batch_size=1)
+    dropped = metrics.registry.counter_value(metrics.DB_WRITES_DROPPED, reason="queue_full")
+    assert writes.submit("london", None, FIELDS)
+    assert writing.wait(5)
+    # One record in the stalled writer, two queued, the rest dropped without blocking
+    assert [writes.submit("london", None, FIELDS) for _ in range(4)] == [True, True, False, False]
+    assert metrics.registry.counter_value(metrics.DB_WRITES_DROPPED, reason="queue_full") - dropped == 2
+    assert writes.depth() == 2 and not writes.flush(timeout=0.05)
+
+    release.set()
+    writes.stop()
+    assert record_count(db) == 3
+
+def test_stop_drains_in_full_batches(db, session_factory):
+    sessions, writing, release = [], threading.Event(), threading.Event()
+
+    def counting_session():
+        sessions.append(1)
+        if len(sessions) == 1:
+            writing.set()
+            release.wait(5)
+        return session_factory()
+
+    writes = WriteBehindQueue(counting_session, flush_interval=0, batch_size=100)
+    assert writes.submit("london", None, FIELDS) and writing.wait(5)
+    for _ in range(250):
+        assert writes.submit("london", None, FIELDS)
+
+    # Records still queued when stop() is called keep filling whole batches
+    stopping = threading.Thread(target=writes.stop)
+    stopping.start()
+    while not writes._stop.is_set():
+        time.sleep(0.01)
+    release.set()
+    stopping.join(10)
+
+    assert record_count(db) == 251
+    assert len(sessions) == 1 + math.ceil(250 / 100)
+
+def test_deferred_save_skips_the_database_in_the_caller(db, session_factory, monkeypatch):
+    writes = WriteBehindQueue(session_factory, flush_interval=0.01)
+    monkeypatch.setattr(write_behind, "write_queue", writes)
+    payload = {"city": "London", "country": "United Kingdom",
+               "current": {"observed_at": "2026-01-01T10:00", "temp": 12.0, "humidity": 80, "wind_speed": 14.0,
+                           "weather_code": 3}}
+
+    assert weather_service.save_weather_data(None, "London", payload, defer=True) is None
+    writes.flush(timeout=5)
+    record = db.execute(select(WeatherRecord)).scalar_one()
+    assert record.temp_c == 12.0 and record.condition_text == "Overcast" and record.timestamp is not None
+    writes.stop()
@@ -1,17 +1,49 @@
 import typer
+from typing import List
 from rich.console import Console
 from rich.table import Table
 from rich.panel import Panel
 from rich.text import Text
-from database import engine, get_db, Base
-from services.weather_service import get_weather_from_wttr, save_weather_data, get_history_stats
+from services.weather_service import (
+    get_weather_from_wttr, get_rich_weather_data, get_desc_from_code, extract_record_fields,
+    save_weather_data, get_history_stats, export_history_to_file,
+)
 
-# Initialize Database
-Base.metadata.create_all(bind=engine)
+# Heavy dependencies (pandas, matplotlib, torch, apscheduler, SQLAlchemy) are
+# imported inside the commands that use them to keep CLI startup fast.
 
 app = typer.Typer()
 console = Console()
 
+@app.callback()
+def main(ctx: typer.Context, profile: bool = typer.Option(False, "--profile", help="Print per-stage timings on exit.")):
+    """WeatherNow command line interface."""
+    if profile:
+        ctx.call_on_close(print_profile)
+
+def print_profile():
+    from services.metrics import profile_summary, cache_hit_ratio
+    rows = profile_summary()
+    if not rows:
+        return
+    table = Table(title="Profile")
+    table.add_column("Stage", style="cyan")
+    table.add_column("Calls", justify="right")
+    table.add_column("Total (ms)", justify="right", style="magenta")
+    table.add_column("Mean (ms)", justify="right")
+    table.add_column("Max (ms)", justify="right")
+    for row in rows:
+        table.add_row(row['stage'], str(row['count']), f"{row['total'] * 1000:.1f}",
+                      f"{row['mean'] * 1000:.1f}", f"{row['max'] * 1000:.1f}")
+    console.print(table)
+    console.print(f"[dim]Weather cache hit ratio: {cache_hit_ratio('weather'):.0%}[/dim]")
+
+def open_db():
+    """Database session for commands that read or write history (creates tables on first use)."""
+    from database import init_db, get_db
+    init_db()
+    return next(get_db())
+
 @app.command()
 def current(city: str):
     """Get the current weather for a specific city."""
@@ -21,17 +53,17 @@ def current(city: str):
         return
 
     # 2. Save to DB (Auto-save)
-    db = next(get_db())
+    db = open_db()
     save_weather_data(db, city, data)
 
     # 3. Display
     try:
-        current_condition = data['current_condition'][0]
-        temp_c = current_condition['temp_C']
-        temp_f = current_condition['temp_F']
-        desc = current_condition['weatherDesc'][0]['value']
-        humidity = current_condition['humidity']
-        wind_speed = current_condition['windspeedKmph']
+        fields = extract_record_fields(data)
+        temp_c = fields['temp_c']
+        temp_f = fields['temp_f']
+        desc = fields['condition_text']
+        humidity = fields['humidity']
+        wind_speed = fields['wind_speed_kmph']
         
         # Determine color based on temperature
         temp_color = "cyan"
@@ -60,10 +92,11 @@ def current(city: str):
 @app.command()
 def history(city: str, days: int = 7):
     """View historical weather data for a city."""
-    db = next(get_db())
-    records = get_history_stats(db, city, days)
+    from services.analytics_engine import analyze_history
+    db = open_db()
+    analysis = analyze_history(db, city, days)
     
-    if not records:
+    if analysis is None:
         console.print(f"[yellow]No history found for {city}. Try running 'current {city}' first.[/yellow]")
         return
 
@@ -73,31 +106,25 @@ def history(city: str, days: int = 7):
     table.add_column("Condition", style="green")
     table.add_column("Wind (km/h)", style="blue")
 
-    # Metrics for potential summary
-    temps = []
-
-    for record in records:
-        ts = record.timestamp.strftime("%Y-%m-%d %H:%M")
-        table.add_row(ts, str(record.temp_c), record.condition_text, str(record.wind_speed_kmph))
-        temps.append(record.temp_c)
+    frame = analysis.frame.iloc[::-1]  # newest first
+    times = frame["timestamp"].dt.strftime("%Y-%m-%d %H:%M")
+    for ts, temp, condition, wind in zip(times, frame["temp_c"], frame["condition_text"], frame["wind_speed_kmph"]):
+        table.add_row(ts, str(temp), condition, str(wind))
 
     console.print(table)
     
-    if temps:
-        avg_temp = sum(temps) / len(temps)
-        min_temp = min(temps)
-        max_temp = max(temps)
-        console.print(Panel(
-            f"Avg: {avg_temp:.1f}°C | Min: {min_temp}°C | Max: {max_temp}°C",
-            title="Summary",
-            border_style="green"
-        ))
+    temp = analysis.summary["temp_c"]
+    console.print(Panel(
+        f"Avg: {temp['mean']:.1f}°C | Min: {temp['min']}°C | Max: {temp['max']}°C",
+        title="Summary",
+        border_style="green"
+    ))
 
 @app.command()
-def forecast(city: str):
-    """Get a 3-day forecast for a specific city."""
+def forecast(city: str, days: int = 3):
+    """Get a daily forecast (up to 7 days) for a specific city."""
     # Forecast data is not currently saved to DB structure, keeping as pure API call for now
-    data = get_weather_from_wttr(city)
+    data = get_rich_weather_data(city, "7day")
     if not data:
         return
 
@@ -108,33 +135,14 @@ def forecast(city: str):
     table.add_column("Condition", style="green")
 
     try:
-        for day in data['weather']:
-            date = day['date']
-            max_temp = day['maxtempC']
-            min_temp = day['mintempC']
-            
-            # Try to get noon condition
-            condition = "N/A"
-            if 'hourly' in day:
-                # wttr.in hourly data: 0=000, 1=300, 2=600, 3=900, 4=1200
-                hourly = day['hourly']
-                mid_index = len(hourly) // 2
-                if mid_index < len(hourly):
-                     condition = hourly[mid_index]['weatherDesc'][0]['value']
-            
-            table.add_row(date, f"{max_temp}°C", f"{min_temp}°C", condition)
+        for day in data['daily'][:max(1, min(days, 7))]:
+            condition = get_desc_from_code(day['code'])
+            table.add_row(day['date'], f"{day['max_temp']}°C", f"{day['min_temp']}°C", condition)
 
         console.print(table)
     except Exception as e:
         console.print(f"[bold red]Error parsing forecast data:[/bold red] {e}")
 
-from typing import List
-import pandas as pd
-from services.weather_service import export_history_to_file
-from services.analytics_service import generate_temperature_trend
-from services.alert_service import add_alert_job
-from ml.train import train_model, predict_next_day
-
 @app.command()
 def compare(cities: List[str]):
     """Compare weather multiple cities side-by-side."""
@@ -149,24 +157,26 @@ def compare(cities: List[str]):
     table.add_column("Humidity", style="blue")
     table.add_column("Wind", style="yellow")
 
-    db = next(get_db())
+    from database import init_db
+    init_db()  # history is written by the write-behind queue (flushed at exit)
     comparisons = []
 
     with console.status("[bold green]Fetching data...[/bold green]"):
         for city in cities:
             data = get_weather_from_wttr(city)
             if data:
-                save_weather_data(db, city, data)
+                # Written in the background while the next city is fetched
+                save_weather_data(None, city, data, defer=True)
                 
                 try:
-                    curr = data['current_condition'][0]
+                    fields = extract_record_fields(data)
                     comparisons.append({
                         "city": city.title(),
-                        "temp_c": float(curr['temp_C']),
-                        "temp_f": float(curr['temp_F']),
-                        "desc": curr['weatherDesc'][0]['value'],
-                        "humidity": curr['humidity'],
-                        "wind": curr['windspeedKmph']
+                        "temp_c": fields['temp_c'],
+                        "temp_f": fields['temp_f'],
+                        "desc": fields['condition_text'],
+                        "humidity": fields['humidity'],
+                        "wind": fields['wind_speed_kmph']
                     })
                 except:
                     pass
@@ -204,7 +214,7 @@ def compare(cities: List[str]):
 @app.command()
 def export_history(city: str, output: str = "weather.csv"):
     """Export weather history to CSV or JSON."""
-    db = next(get_db())
+    db = open_db()
     success = export_history_to_file(db, city, output)
     
     if success:
@@ -216,6 +226,8 @@ def export_history(city: str, output: str = "weather.csv"):
 def batch(input_file: str, output: str = "report.csv"):
     """Process multiple cities from a file and export results."""
     import os
+    import time
+    import pandas as pd
     if not os.path.exists(input_file):
         console.print(f"[red]Input file not found: {input_file}[/red]")
         return
@@ -228,25 +240,25 @@ def batch(input_file: str, output: str = "report.csv"):
         return
 
     results = []
-    db = next(get_db())
+    from database import init_db
+    init_db()  # history is written by the write-behind queue (flushed at exit)
     
     with console.status(f"[bold green]Processing {len(cities)} cities...[/bold green]"):
         for city in cities:
             data = get_weather_from_wttr(city)
             if data:
-                save_weather_data(db, city, data)
+                save_weather_data(None, city, data, defer=True)
                 try:
-                    curr = data['current_condition'][0]
+                    fields = extract_record_fields(data)
                     results.append({
                         "city": city,
-                        "temp_c": curr['temp_C'],
-                        "condition": curr['weatherDesc'][0]['value'],
-                        "humidity": curr['humidity']
+                        "temp_c": fields['temp_c'],
+                        "condition": fields['condition_text'],
+                        "humidity": fields['humidity']
                     })
                 except:
                     pass
             # Avoid rate limiting
-            import time
             time.sleep(1) 
 
     if results:
@@ -257,19 +269,83 @@ def batch(input_file: str, output: str = "report.csv"):
         console.print("[red]No data collected.[/red]")
 
 @app.command()
-def analyze(city: str, days: int = 30):
-    """Generate temperature trend chart for a city."""
-    db = next(get_db())
-    with console.status(f"[bold green]Generating analysis for {city}...[/bold green]"):
-        path = generate_temperature_trend(db, city, days)
+def analyze(
+    cities: List[str],
+    days: int = 30,
+    workers: int = typer.Option(None, help="Render processes (default: CHART_WORKERS)."),
+    open_chart: bool = typer.Option(True, "--open/--no-open", help="Open the chart when analyzing a single city."),
+):
+    """Generate temperature trend charts for one or more cities."""
+    from config import CHART_WORKERS
+    from services.analytics_service import generate_temperature_trends
+    db = open_db()
+    label = cities[0] if len(cities) == 1 else f"{len(cities)} cities"
+    with console.status(f"[bold green]Generating analysis for {label}...[/bold green]"):
+        paths = generate_temperature_trends(db, cities, days, workers=workers or CHART_WORKERS)
     
-    if path:
-        console.print(f"[bold green]Analysis saved to:[/bold green] {path}")
-        # Automatically open the image on Windows
-        import os
-        os.startfile(os.path.abspath(path))
-    else:
-        console.print(f"[bold red]Not enough data to analyze for {city}.[/bold red]")
+    for city, path in paths.items():
+        if path:
+            console.print(f"[bold green]Analysis for {city} saved to:[/bold green] {path}")
+        else:
+            console.print(f"[bold red]Not enough data to analyze for {city}.[/bold red]")
+
+    path = paths[cities[0]] if len(cities) == 1 else None
+    if path and open_chart:
+        # Opens with the platform's default image viewer
+        typer.launch(path)
+
+@app.command()
+def backfill(
+    cities: List[str] = typer.Argument(None),
+    days: int = typer.Option(365, help="How many days of history to hold (ending a few days ago)."),
+    from_file: str = typer.Option(None, "--from-file", help="File with one city per line."),
+    chunk_days: int = typer.Option(None, help="Days per archive request (default: BACKFILL_CHUNK_DAYS)."),
+    concurrency: int = typer.Option(None, help="Parallel archive requests (default: BACKFILL_CONCURRENCY)."),
+    rate_limit: float = typer.Option(None, help="Archive requests per second, 0 = unlimited (default: BACKFILL_RATE_LIMIT)."),
+    step_hours: int = typer.Option(1, help="Keep one record every N hours."),
+):
+    """Load historical weather from the Open-Meteo archive. Reruns only fetch missing days."""
+    from config import BACKFILL_CHUNK_DAYS, BACKFILL_CONCURRENCY, BACKFILL_RATE_LIMIT
+    from services.backfill import Backfiller, default_range
+    cities = list(cities or [])
+    if from_file:
+        try:
+            with open(from_file, 'r') as f:
+                cities += [line.strip() for line in f if line.strip()]
+        except OSError as e:
+            console.print(f"[red]Cannot read {from_file}: {e}[/red]")
+            return
+    if not cities:
+        console.print("[red]No cities given.[/red]")
+        return
+
+    db = open_db()
+    backfiller = Backfiller(
+        db,
+        chunk_days=chunk_days or BACKFILL_CHUNK_DAYS,
+        concurrency=concurrency or BACKFILL_CONCURRENCY,
+        rate_limit=BACKFILL_RATE_LIMIT if rate_limit is None else rate_limit,
+        step_hours=step_hours,
+    )
+    wanted = default_range(days)
+    console.print(f"[dim]Backfilling {wanted[0]} .. {wanted[1]}[/dim]")
+    with console.status(f"[bold green]Backfilling {len(cities)} cities...[/bold green]") as status:
+        results = backfiller.run(cities, wanted, progress=lambda r: status.update(f"[bold green]Backfilled {r.city}[/bold green]"))
+
+    table = Table(title="Backfill")
+    table.add_column("City", style="cyan")
+    table.add_column("Requests", justify="right")
+    table.add_column("Rows", justify="right", style="green")
+    table.add_column("Loaded range")
+    table.add_column("Status")
+    for city in cities:
+        result = results.get(city)
+        if result is None:
+            continue
+        loaded = f"{result.loaded[0]} .. {result.loaded[1]}" if result.loaded else "-"
+        state = f"[red]{result.error}[/red]" if result.error else ("up to date" if not result.ranges else "ok")
+        table.add_row(city, str(result.requests), str(result.rows), loaded, state)
+    console.print(table)
 
 @app.command()
 def alert(city: str, condition: str):
@@ -279,6 +355,7 @@ def alert(city: str, condition: str):
     Metrics: temp, humidity, wind
     Example: alert "London" "temp > 25"
     """
+    from services.alert_service import add_alert_job
     job_id = add_alert_job(city, condition, interval_minutes=15) # Check every 15m
     console.print(f"[bold green]Alert set for {city}: {condition}[/bold green]")
     console.print(f"Checking every 15 minutes. Keep this terminal open (or run as service) to receive alerts.")
@@ -288,10 +365,99 @@ def alert(city: str, condition: str):
     # For a real background service, we'd need a separate runner.
     # Here we just acknowledge the setup.
 
+@app.command()
+def train_all(
+    cities: List[str] = typer.Argument(None, help="Cities to train (default: every city with history)."),
+    epochs: int = 100,
+    workers: int = typer.Option(None, help="Training processes (default: TRAIN_WORKERS)."),
+    force: bool = typer.Option(False, "--force", help="Retrain even if a city's data is unchanged."),
+    export: bool = typer.Option(False, "--export", help="Export retrained models for fast inference (see export-models)."),
+):
+    """Train LSTM models for many cities in parallel, skipping unchanged ones."""
+    from config import TRAIN_WORKERS
+    from ml.train import train_all as run_training
+    db = open_db()
+    with console.status("[bold green]Training models...[/bold green]"):
+        results = run_training(db, cities or None, epochs=epochs, workers=workers or TRAIN_WORKERS, force=force)
+        if export:
+            from ml.inference import export_model
+            for city, result in results.items():
+                if result.status == "trained":
+                    export_model(city)
+    if not results:
+        console.print("[yellow]No cities with history to train.[/yellow]")
+        return
+
+    styles = {"trained": "green", "skipped": "dim", "insufficient": "yellow", "failed": "red"}
+    table = Table(title="Model Training")
+    table.add_column("City", style="cyan")
+    table.add_column("Status")
+    table.add_column("Details")
+    for city, result in results.items():
+        style = styles.get(result.status, "white")
+        table.add_row(city, f"[{style}]{result.status}[/{style}]", result.message)
+    console.print(table)
+
+@app.command()
+def export_models(
+    cities: List[str] = typer.Argument(None, help="Cities to export (default: every trained city)."),
+    quantize: bool = typer.Option(True, "--quantize/--no-quantize", help="Dynamic int8 quantization of the LSTM/Linear layers."),
+):
+    """Export trained models to TorchScript for low-latency CPU inference."""
+    import glob
+    import os
+    from config import MODEL_DIR
+    from ml.inference import export_model
+    if not cities:
+        cities = [os.path.basename(path)[:-len("_lstm.pth")] for path in sorted(glob.glob(os.path.join(MODEL_DIR, "*_lstm.pth")))]
+    if not cities:
+        console.print("[yellow]No trained models found. Run train-all first.[/yellow]")
+        return
+    for city in cities:
+        path = export_model(city, quantize=quantize)
+        if path:
+            console.print(f"[green]Exported {city}:[/green] {path}")
+        else:
+            console.print(f"[red]No trained model for {city}.[/red]")
+
+@app.command()
+def gazetteer(
+    query: str = typer.Argument(None, help="City name or prefix to look up (typos allowed)."),
+    download: bool = typer.Option(False, "--download", help="Replace the bundled city list with GeoNames cities15000."),
+    limit: int = 10,
+):
+    """Search the offline city gazetteer, or download a larger one."""
+    from config import GAZETTEER_DOWNLOAD_PATH
+    from services.gazetteer import download_geonames, get_gazetteer, set_gazetteer, Gazetteer
+    if download:
+        try:
+            with console.status("Downloading GeoNames cities..."):
+                count = download_geonames()
+        except Exception as e:
+            console.print(f"[red]Gazetteer download failed: {e}[/red]")
+            return
+        set_gazetteer(Gazetteer.load(GAZETTEER_DOWNLOAD_PATH))
+        console.print(f"[green]Saved {count} cities to {GAZETTEER_DOWNLOAD_PATH}[/green]")
+    if not query:
+        if not download:
+            console.print(f"[dim]{len(get_gazetteer())} cities in the offline gazetteer.[/dim]")
+        return
+    matches = get_gazetteer().search(query, limit)
+    if not matches:
+        console.print(f"[yellow]No city matches '{query}'.[/yellow]")
+        return
+    table = Table(title=f"Cities matching '{query}'")
+    for column in ("City", "Country", "Lat", "Lon", "Population"):
+        table.add_column(column)
+    for city in matches:
+        table.add_row(city.name, city.country, f"{city.latitude:.4f}", f"{city.longitude:.4f}", f"{city.population:,}")
+    console.print(table)
+
 @app.command()
 def predict(city: str, train: bool = False):
     """Predict tomorrow's temperature using LSTM."""
-    db = next(get_db())
+    from ml.train import train_model, predict_next_day
+    db = open_db()
     
     if train:
         with console.status(f"[bold green]Training model for {city}...[/bold green]"):
@@ -304,7 +470,8 @@ def predict(city: str, train: bool = False):
 
     # Check if model exists, if not, try to train
     import os
-    if not os.path.exists(f"ml/models/{city.lower()}_lstm.pth"):
+    from ml.train import model_path
+    if not os.path.exists(model_path(city)):
         console.print(f"[yellow]No model found for {city}. Training now...[/yellow]")
         with console.status(f"[bold green]Training model for {city}...[/bold green]"):
             path, msg = train_model(db, city)